@@ -49,6 +49,13 @@ class Settings(BaseSettings):
     # OMIE
     omie_app_key: Optional[str] = None
     omie_app_secret: Optional[str] = None
+    omie_max_workers: int = 4
+
+    # RD Station Marketing
+    rd_marketing_max_workers: int = 4
+
+    # Pipedrive
+    pipedrive_max_workers: int = 4
 
     # Silbeck
     silbeck_token: Optional[str] = None
@@ -71,6 +78,10 @@ class Settings(BaseSettings):
     # Hotmart
     hotmart_basic_auth: Optional[str] = None
     hotmart_days_to_fetch: int = 365
+    hotmart_window_days: int = 30
+    hotmart_status_groups: int = 1
+    hotmart_max_workers: int = 4
+    hotmart_requests_per_minute: int = 400
 
     # ClickUp
     clickup_bearer_token: Optional[str] = None
@@ -187,6 +198,36 @@ class Settings(BaseSettings):
     backoffice_endpoint: Optional[str] = None
     backoffice_auth_token: Optional[str] = None
 
+    # Métricas (Prometheus) do worker; 0 desativa o exportador
+    metrics_port: int = 9108
+
+    # Profiling por amostragem das execuções (também via parâmetro `profile` dos flows)
+    profile_runs: bool = False
+
+    # Converte colunas antigas para LowCardinality em todo run_ddl (ALTER em produção a cada
+    # flow). Desligado: a migração roda uma vez via scripts/migrate_low_cardinality.py
+    clickhouse_migrate_low_cardinality: bool = False
+
+    # Insert via Arrow (insert_arrow), escolhido automaticamente para DataFrames com colunas
+    # pd.ArrowDtype: linhas por INSERT e compressão do buffer IPC (lz4, zstd ou vazio para nenhuma)
+    clickhouse_arrow_insert: bool = True
+    clickhouse_arrow_block_rows: int = 1000000
+    clickhouse_arrow_compression: str = "lz4"
+
+    # Tipo da coluna `data` nas tabelas blob (String ou JSON, ClickHouse >= 24.8)
+    blob_data_type: str = "String"
+
+    # Cache de tokens de autenticação no worker: validade quando a API não informa
+    # expires_in e antecedência da renovação antes de expirar (segundos)
+    token_cache_default_ttl: int = 1800
+    token_cache_refresh_margin: int = 120
+    # Diretório local do worker onde os tokens ficam entre execuções (cada flow run é um
+    # processo); vazio mantém o cache só na memória do processo
+    token_cache_dir: str = "/tmp/pipeline-tokens"
+
+    # Pula linhas idênticas às da execução anterior (hash por linha, connectors/fingerprint.py)
+    row_fingerprints: bool = True
+
     class Config:
         env_file = ".env"
 
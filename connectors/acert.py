@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime, timedelta
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class AcertConnector(BaseConnector):
@@ -39,7 +40,7 @@ class AcertConnector(BaseConnector):
             except requests.exceptions.RequestException as e:
                 logging.error(f"[Acert] Erro page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 items = data
             elif isinstance(data, dict):
@@ -69,7 +70,7 @@ class AcertConnector(BaseConnector):
             try:
                 resp = requests.get(url, headers=self._headers(), params=params, timeout=60)
                 resp.raise_for_status()
-                data = resp.json()
+                data = decode_response(resp)
                 items = data if isinstance(data, list) else data.get("content", data.get("data", []))
                 if items:
                     for item in items:
@@ -98,14 +99,14 @@ class AcertConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {t} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
             """ for t in tables]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        results = {k: pd.DataFrame() for k in list(self.ENDPOINTS.keys()) + ["acert_cash_flow", "acert_sale_items"]}
+        records = {k: [] for k in list(self.ENDPOINTS.keys()) + ["acert_cash_flow", "acert_sale_items"]}
 
         for store_id in self.store_ids:
             logging.info(f"[Acert] Extraindo store {store_id}")
@@ -117,20 +118,12 @@ class AcertConnector(BaseConnector):
                     item["store_id"] = store_id
 
                 if table_name == "acert_sales" and items:
-                    sale_items = self._extract_sale_items(items)
-                    if sale_items:
-                        df_items = pd.DataFrame(sale_items)
-                        results["acert_sale_items"] = pd.concat([results["acert_sale_items"], df_items], ignore_index=True)
+                    records["acert_sale_items"].extend(self._extract_sale_items(items))
 
-                if items:
-                    df = pd.DataFrame(items)
-                    results[table_name] = pd.concat([results[table_name], df], ignore_index=True)
+                records[table_name].extend(items)
 
             # Cash flow (últimos 6 meses)
             cf_start = datetime.now() - timedelta(days=180)
-            cf_items = self._fetch_cash_flow(store_id, cf_start, date_stop)
-            if cf_items:
-                df_cf = pd.DataFrame(cf_items)
-                results["acert_cash_flow"] = pd.concat([results["acert_cash_flow"], df_cf], ignore_index=True)
+            records["acert_cash_flow"].extend(self._fetch_cash_flow(store_id, cf_start, date_stop))
 
-        return results
+        return {table_name: pack_records(items) for table_name, items in records.items()}
@@ -2,6 +2,9 @@ import time
 import requests
 import pandas as pd
 from typing import List, Dict, Any, Optional
+from connectors.http_cache import LookupCache
+from connectors.instrumentation import span
+from connectors.json_codec import decode_response
 
 class ActiveCampaignConnector:
     """
@@ -9,23 +12,35 @@ class ActiveCampaignConnector:
     Focado em deals, stages e contatos com paginação via offset.
     """
     
-    def __init__(self, account_name: str, api_token: str):
+    def __init__(self, account_name: str, api_token: str, cache: Optional[LookupCache] = None):
         self.base_url = f"https://{account_name}.api-us1.com/api/3"
         self.headers = {"Api-Token": api_token}
         self.limit = 100
+        self.cache = cache
 
-    def _fetch_all_pages(self, endpoint: str, data_key: str) -> List[Dict]:
-        """Busca todas as páginas de um endpoint AC v3."""
+    def _fetch_all_pages(self, endpoint: str, data_key: str, conditional: Optional[Dict] = None,
+                         info: Optional[Dict] = None) -> List[Dict]:
+        """
+        Busca todas as páginas de um endpoint AC v3.
+        `conditional` (If-None-Match/If-Modified-Since) vai só na primeira página; `info`
+        recebe a primeira resposta, o total de páginas e se alguma página falhou.
+        """
         all_items = []
         offset = 0
+        info = {} if info is None else info
         while True:
             params = {"limit": self.limit, "offset": offset}
             url = f"{self.base_url}/{endpoint}"
+            headers = {**self.headers, **conditional} if conditional and offset == 0 else self.headers
             
             try:
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
+                response = requests.get(url, headers=headers, params=params, timeout=30)
+                if offset == 0 and response.status_code in (200, 304):
+                    info["first"] = response
+                if response.status_code == 304:
+                    break
                 if response.status_code == 200:
-                    data = response.json()
+                    data = decode_response(response)
                     items = data.get(data_key, [])
                     all_items.extend(items)
                     
@@ -38,14 +53,17 @@ class ActiveCampaignConnector:
                     time.sleep(0.25)
                 elif response.status_code == 429:
                     print("Rate limit atingido. Aguardando 60s...")
-                    time.sleep(60)
+                    with span("rate_limit_wait", provider="active_campaign"):
+                        time.sleep(60)
                 else:
                     print(f"Erro AC ({response.status_code}): {response.text}")
+                    info["error"] = True
                     break
             except Exception as e:
                 print(f"Erro de conexão AC: {e}")
                 time.sleep(5)
                 
+        info["pages"] = offset // self.limit + 1
         return all_items
 
     def extract_deals(self) -> pd.DataFrame:
@@ -53,7 +71,23 @@ class ActiveCampaignConnector:
         return pd.DataFrame(deals)
 
     def extract_stages(self) -> pd.DataFrame:
-        stages = self._fetch_all_pages("dealStages", "dealStages")
+        """
+        Estágios (tabela de referência): DataFrame vazio se não mudaram desde a última carga ou
+        se alguma página falhou (a cópia anterior continua valendo; nunca carrega lista parcial).
+        """
+        if self.cache is None:
+            return pd.DataFrame(self._fetch_all_pages("dealStages", "dealStages"))
+
+        info = {}
+        stages = self._fetch_all_pages("dealStages", "dealStages", self.cache.headers("ac_stages"), info)
+        if info.get("error"):
+            print("Erro AC em dealStages: mantendo a cópia anterior (lista parcial não é carregada)")
+            return pd.DataFrame()
+        first = info.get("first")
+        if first is not None and self.cache.not_modified("ac_stages", first):
+            return pd.DataFrame()
+        if self.cache.unchanged("ac_stages", stages, first, info["pages"]):
+            return pd.DataFrame()
         return pd.DataFrame(stages)
 
     def extract_contacts(self) -> pd.DataFrame:
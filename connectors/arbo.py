@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class ArboConnector(BaseConnector):
@@ -32,7 +33,7 @@ class ArboConnector(BaseConnector):
             except requests.exceptions.RequestException as e:
                 logging.error(f"[Arbo] Erro page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", [])
             if not items:
                 break
@@ -53,11 +54,11 @@ class ArboConnector(BaseConnector):
                 name Nullable(String),
                 email Nullable(String),
                 phone Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 source Nullable(String),
                 created_at Nullable(String),
                 updated_at_source Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -66,8 +67,8 @@ class ArboConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS arbo_imoveis (
                 id String,
                 title Nullable(String),
-                type Nullable(String),
-                status Nullable(String),
+                type LowCardinality(Nullable(String)),
+                status LowCardinality(Nullable(String)),
                 address Nullable(String),
                 city Nullable(String),
                 state Nullable(String),
@@ -75,7 +76,7 @@ class ArboConnector(BaseConnector):
                 area Nullable(Float64),
                 bedrooms Nullable(Int32),
                 created_at Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class AsaasConnector(BaseConnector):
@@ -54,7 +55,7 @@ class AsaasConnector(BaseConnector):
                 logging.error(f"Erro ao buscar {endpoint} offset={offset}: {e}")
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", [])
             all_items.extend(items)
 
@@ -100,14 +101,14 @@ class AsaasConnector(BaseConnector):
                 customer String,
                 value Float64,
                 netValue Float64,
-                status String,
-                billingType String,
+                status LowCardinality(String),
+                billingType LowCardinality(String),
                 dueDate String,
                 paymentDate Nullable(String),
                 description Nullable(String),
                 externalReference Nullable(String),
                 invoiceUrl Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -123,7 +124,7 @@ class AsaasConnector(BaseConnector):
                 company Nullable(String),
                 city Nullable(String),
                 state Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -134,11 +135,11 @@ class AsaasConnector(BaseConnector):
                 customer String,
                 value Float64,
                 cycle String,
-                status String,
+                status LowCardinality(String),
                 nextDueDate Nullable(String),
                 description Nullable(String),
-                billingType String,
-                project_id String DEFAULT '',
+                billingType LowCardinality(String),
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -149,11 +150,11 @@ class AsaasConnector(BaseConnector):
                 subscription_id String,
                 customer String,
                 value Float64,
-                status String,
+                status LowCardinality(String),
                 dueDate String,
                 paymentDate Nullable(String),
-                billingType String,
-                project_id String DEFAULT '',
+                billingType LowCardinality(String),
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY (subscription_id, id)
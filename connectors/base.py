@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 from datetime import datetime
+from typing import Iterator, Tuple
 
 class BaseConnector(ABC):
     @abstractmethod
@@ -11,6 +12,17 @@ class BaseConnector(ABC):
         """
         pass
 
+    def extract_iter(self, date_start: datetime, date_stop: datetime) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """
+        Extrai dados do provedor em lotes, devolvendo tuplas (table_name, batch)
+        à medida que as páginas chegam. Uma mesma tabela pode aparecer em vários lotes.
+
+        Implementação padrão: adapta o extract() materializado, emitindo um lote
+        por tabela. Conectores paginados sobrescrevem para emitir por página.
+        """
+        for table_name, df in self.extract(date_start, date_stop).items():
+            yield table_name, df
+
     @abstractmethod
     def get_tables_ddl(self) -> list:
         """
@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime, timedelta
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import stream_records, batched, STREAM_BATCH_SIZE
 
 
 class BelleConnector(BaseConnector):
@@ -29,20 +30,28 @@ class BelleConnector(BaseConnector):
     def _headers(self):
         return {"Authorization": self.token, "Content-Type": "application/json"}
 
-    def _fetch(self, path: str, params: dict = None) -> list:
+    def _iter(self, path: str, params: dict = None):
+        """
+        Registros da resposta conforme o corpo chega (stream). Falha na requisição é logada e
+        pula a chamada; falha no meio do stream é relançada, para não carregar a tabela pela metade.
+        """
         url = f"{self.base_url}/{path}"
+        resp = None
         try:
-            resp = requests.get(url, headers=self._headers(), params=params or {}, timeout=120)
+            resp = requests.get(url, headers=self._headers(), params=params or {}, timeout=120, stream=True)
             resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict):
-                return data.get("data", data.get("items", [data]))
-            return []
-        except Exception as e:
+        except requests.exceptions.RequestException as e:
             logging.error(f"[Belle] Erro {path}: {e}")
-            return []
+            if resp is not None:
+                resp.close()
+            return
+        try:
+            yield from stream_records(resp, ("item", "data.item", "items.item"), wrap_object=True)
+        finally:
+            resp.close()
+
+    def _fetch(self, path: str, params: dict = None) -> list:
+        return list(self._iter(path, params))
 
     def _generate_date_chunks(self, start_str: str, end_date: datetime, max_days: int = None, max_months: int = None):
         """Gera chunks de datas no formato DD/MM/YYYY."""
@@ -62,54 +71,50 @@ class BelleConnector(BaseConnector):
 
     def get_tables_ddl(self) -> list:
         tables = list(self.ENDPOINTS.keys())
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String,
-                data String,
-                project_id String DEFAULT '',
-                updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at)
-            ORDER BY id
-            """ for t in tables]
+        return [blob_ddl(t) for t in tables]
+
+    def _iter_table(self, cfg: dict, date_stop: datetime):
+        """Registros de um endpoint, percorrendo os chunks de data e estabelecimentos."""
+        if not cfg.get("use_date_range"):
+            yield from self._iter(cfg["path"])
+            return
+
+        start_str = cfg.get("start_date")
+        max_days = cfg.get("max_days")
+        max_months = cfg.get("max_months")
+
+        if max_days or max_months:
+            chunks = self._generate_date_chunks(start_str, date_stop, max_days, max_months)
+        else:
+            chunks = [(start_str, date_stop.strftime("%d/%m/%Y"))]
+
+        estab_param = "estab" if cfg.get("param_name") == "estab" else "codEstab"
+        for dt_ini, dt_fim in chunks:
+            for estab in self.establishments:
+                params = {"dtInicio": dt_ini, "dtFim": dt_fim, estab_param: estab}
+                for item in self._iter(cfg["path"], params):
+                    item["cod_estab"] = estab
+                    yield item
+                time.sleep(0.5)
+
+    def _table_configs(self, date_start: datetime):
+        for table_name, cfg in self.ENDPOINTS.items():
+            if cfg.get("use_date_range") and not cfg.get("start_date"):
+                cfg = {**cfg, "start_date": date_start.strftime("%d/%m/%Y")}
+            yield table_name, cfg
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
 
-        for table_name, cfg in self.ENDPOINTS.items():
-            all_items = []
-
-            if cfg.get("use_date_range"):
-                start_str = cfg.get("start_date", date_start.strftime("%d/%m/%Y"))
-                max_days = cfg.get("max_days")
-                max_months = cfg.get("max_months")
-
-                if max_days or max_months:
-                    chunks = self._generate_date_chunks(start_str, date_stop, max_days, max_months)
-                else:
-                    chunks = [(start_str, date_stop.strftime("%d/%m/%Y"))]
-
-                for dt_ini, dt_fim in chunks:
-                    if cfg.get("param_name") == "estab":
-                        for estab in self.establishments:
-                            params = {"dtInicio": dt_ini, "dtFim": dt_fim, "estab": estab}
-                            items = self._fetch(cfg["path"], params)
-                            for item in items:
-                                item["cod_estab"] = estab
-                            all_items.extend(items)
-                            time.sleep(0.5)
-                    else:
-                        for estab in self.establishments:
-                            params = {"dtInicio": dt_ini, "dtFim": dt_fim, "codEstab": estab}
-                            items = self._fetch(cfg["path"], params)
-                            for item in items:
-                                item["cod_estab"] = estab
-                            all_items.extend(items)
-                            time.sleep(0.5)
-            else:
-                items = self._fetch(cfg["path"])
-                all_items.extend(items)
-
+        for table_name, cfg in self._table_configs(date_start):
+            all_items = list(self._iter_table(cfg, date_stop))
             logging.info(f"[Belle] {table_name}: {len(all_items)} registros")
-            results[table_name] = pd.DataFrame(all_items) if all_items else pd.DataFrame()
+            results[table_name] = pack_records(all_items)
 
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        """Emite lotes de cada endpoint enquanto as respostas ainda estão sendo baixadas."""
+        for table_name, cfg in self._table_configs(date_start):
+            for batch in batched(self._iter_table(cfg, date_stop), STREAM_BATCH_SIZE):
+                yield table_name, pack_records(batch)
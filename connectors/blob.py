@@ -0,0 +1,61 @@
+import json
+import hashlib
+from typing import Iterable, Sequence
+
+import pandas as pd
+
+from config.settings import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Chaves tentadas, em ordem, como identificador do registro
+ID_KEYS = ("id", "codigo", "uuid", "_id")
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _record_id(record, payload: bytes, id_keys: Sequence[str]) -> str:
+    for key in (id_keys if isinstance(record, dict) else ()):
+        value = record.get(key)
+        if value is not None and value != "":
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            return str(value)
+    # Sem id na origem: hash do conteúdo (estável entre execuções, deduplica no ReplacingMergeTree)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def pack_records(records: Iterable[dict], id_keys: Sequence[str] = ID_KEYS) -> pd.DataFrame:
+    """
+    Empacota registros no formato das tabelas blob (`id String, data String`): cada registro
+    vira um JSON compacto (orjson) na coluna `data`, com `id` tirado de `id_keys` ou, na falta,
+    do hash do conteúdo. Uma passada, sem montar o DataFrame largo intermediário.
+    """
+    ids, payloads = [], []
+    for record in records:
+        payload = _dumps(record)
+        ids.append(_record_id(record, payload, id_keys))
+        payloads.append(payload.decode("utf-8"))
+    if not ids:
+        return pd.DataFrame()
+    return pd.DataFrame({"id": ids, "data": payloads})
+
+
+def blob_ddl(table_name: str, data_type: str = None) -> str:
+    """DDL padrão das tabelas blob; `data` como String ou JSON (settings.blob_data_type)."""
+    return f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id String,
+                data {data_type or settings.blob_data_type},
+                project_id LowCardinality(String) DEFAULT '',
+                updated_at DateTime DEFAULT now()
+            ) ENGINE = ReplacingMergeTree(updated_at)
+            ORDER BY id
+            """
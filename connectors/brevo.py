@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class BrevoConnector(BaseConnector):
@@ -45,7 +46,7 @@ class BrevoConnector(BaseConnector):
                 logging.error(f"[Brevo] Erro ao buscar {path} offset={offset}: {e}")
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get(data_key, [])
             if not items:
                 break
@@ -64,14 +65,14 @@ class BrevoConnector(BaseConnector):
                 id UInt64,
                 name String,
                 subject Nullable(String),
-                type String,
-                status String,
+                type LowCardinality(String),
+                status LowCardinality(String),
                 scheduledAt Nullable(String),
                 createdAt String,
                 modifiedAt String,
                 sentDate Nullable(String),
                 tag Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -80,13 +81,13 @@ class BrevoConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS brevo_sms_campaigns (
                 id UInt64,
                 name String,
-                status String,
+                status LowCardinality(String),
                 content Nullable(String),
                 scheduledAt Nullable(String),
                 createdAt String,
                 modifiedAt String,
                 sender Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class C2sConnector(BaseConnector):
@@ -30,7 +31,7 @@ class C2sConnector(BaseConnector):
             except requests.exceptions.RequestException as e:
                 logging.error(f"[C2S] Erro {path} page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", data) if isinstance(data, dict) else data
             if isinstance(items, dict):
                 items = [items]
@@ -49,7 +50,7 @@ class C2sConnector(BaseConnector):
         try:
             resp = requests.get(url, headers=self._headers(), timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             companies = []
             if isinstance(data, dict):
                 main = {**data, "type": "main"}
@@ -66,21 +67,21 @@ class C2sConnector(BaseConnector):
     def get_tables_ddl(self) -> list:
         return [
             """CREATE TABLE IF NOT EXISTS c2s_companies (
-                id String, name Nullable(String), type Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                id String, name Nullable(String), type LowCardinality(Nullable(String)),
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id""",
             """CREATE TABLE IF NOT EXISTS c2s_leads (
                 id String, name Nullable(String), email Nullable(String), phone Nullable(String),
-                status Nullable(String), source Nullable(String), created_at Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                status LowCardinality(Nullable(String)), source Nullable(String), created_at Nullable(String),
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id""",
             """CREATE TABLE IF NOT EXISTS c2s_sellers (
                 id String, name Nullable(String), email Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id""",
             """CREATE TABLE IF NOT EXISTS c2s_tags (
                 id String, name Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id""",
         ]
 
@@ -1,7 +1,33 @@
 import clickhouse_connect
 import pandas as pd
+import pyarrow as pa
 from config.settings import settings
 import logging
+from connectors.instrumentation import span
+from connectors.schema import parse_ddl
+
+
+def is_arrow_backed(df: pd.DataFrame) -> bool:
+    """
+    True se o DataFrame tem colunas pd.ArrowDtype explícitas e nenhuma object. A string
+    pyarrow (StringDtype, padrão do pandas 3) sozinha não conta: frames comuns seguem no insert_df.
+    """
+    arrow = False
+    for dtype in df.dtypes:
+        if dtype == object:
+            return False
+        if isinstance(dtype, pd.ArrowDtype):
+            arrow = True
+    return arrow
+
+
+def _decode_dictionaries(table: pa.Table) -> pa.Table:
+    """Colunas dictionary (categóricas do pandas) vão como o tipo dos valores."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
+
 
 class ClickHouseClient:
     def __init__(self):
@@ -22,21 +48,103 @@ class ClickHouseClient:
     def run_ddl(self, ddl_list: list):
         for sql in ddl_list:
             self.client.command(sql)
+        if settings.clickhouse_migrate_low_cardinality:
+            self.migrate_low_cardinality(ddl_list)
+
+    def migrate_low_cardinality(self, ddl_list: list, dry_run: bool = False) -> list:
+        """
+        CREATE TABLE IF NOT EXISTS não altera tabelas antigas: colunas declaradas como
+        LowCardinality no DDL que ainda existem como String/Nullable(String) são convertidas
+        (ALTER ... MODIFY COLUMN, uma vez por coluna). Reescreve as partes da tabela, por isso
+        roda pelo script `scripts/migrate_low_cardinality.py`, não a cada run_ddl.
+        `dry_run` só lista os ALTERs. Retorna os comandos (executados ou planejados).
+        """
+        statements = []
+        for sql in ddl_list:
+            try:
+                table, columns = parse_ddl(sql)
+            except ValueError:
+                continue
+            wanted = {name: ch_type for name, ch_type in columns if ch_type.startswith("LowCardinality(")}
+            if not wanted:
+                continue
+
+            current = dict(self.client.query(
+                "SELECT name, type FROM system.columns WHERE database = {db:String} AND table = {table:String}",
+                parameters={"db": settings.clickhouse_database, "table": table},
+            ).result_rows)
+            for name, ch_type in wanted.items():
+                if current.get(name) != ch_type[len("LowCardinality("):-1]:
+                    continue
+                statement = f"ALTER TABLE {table} MODIFY COLUMN `{name}` {ch_type}"
+                statements.append(statement)
+                if dry_run:
+                    logging.info(f"[dry-run] {statement}")
+                    continue
+                try:
+                    self.client.command(statement)
+                    logging.info(f"{table}.{name} convertida para {ch_type}")
+                except Exception as e:
+                    logging.warning(f"Falha ao converter {table}.{name} para {ch_type}: {e}")
+        return statements
 
     def insert_dataframe(self, table_name: str, df: pd.DataFrame):
         if df.empty:
             logging.warning(f"DataFrame for {table_name} is empty. Skipping.")
             return
-        
-        # O clickhouse-connect insere DataFrames diretamente
-        self.client.insert_df(table_name, df)
+
+        # Colunas já em Arrow vão direto como buffers colunares (sem conversão por valor)
+        if settings.clickhouse_arrow_insert and is_arrow_backed(df):
+            try:
+                self.insert_arrow(table_name, df)
+                logging.info(f"Inserted {len(df)} rows into {table_name} (arrow)")
+                return
+            except Exception as e:
+                # Com mais de um bloco parte das linhas pode já ter entrado: não repete
+                if len(df) > settings.clickhouse_arrow_block_rows:
+                    raise
+                logging.warning(f"[{table_name}] Insert Arrow falhou ({e}); usando insert_df")
+        # O clickhouse-connect insere DataFrames diretamente (categóricas como texto)
+        categorical = df.select_dtypes(include=["category"]).columns
+        if len(categorical):
+            df = df.astype({col: object for col in categorical})
+        with span("clickhouse_insert", table_name=table_name, rows=len(df)):
+            self.client.insert_df(table_name, df)
         logging.info(f"Inserted {len(df)} rows into {table_name}")
 
-    def insert_from_s3(self, table_name: str, s3_url_path: str):
+    def insert_arrow(self, table_name: str, data, block_rows: int = None, compression: str = None) -> int:
+        """
+        Insert no formato Arrow (IPC) via clickhouse-connect: as colunas vão como buffers
+        colunares, sem a conversão valor a valor do insert_df. `data` é um pa.Table ou um
+        DataFrame; cada bloco de `block_rows` linhas é um INSERT (uma parte na tabela).
+        `compression` comprime o buffer IPC (lz4 ou zstd; "" desativa). Retorna as linhas.
+        """
+        table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+        table = _decode_dictionaries(table)
+        block_rows = block_rows or settings.clickhouse_arrow_block_rows
+        compression = settings.clickhouse_arrow_compression if compression is None else compression
+        options = pa.ipc.IpcWriteOptions(compression=compression or None)
+
+        with span("clickhouse_insert_arrow", table_name=table_name, rows=table.num_rows) as s:
+            sent = 0
+            for offset in range(0, table.num_rows, block_rows):
+                block = table.slice(offset, block_rows)
+                sink = pa.BufferOutputStream()
+                with pa.ipc.new_file(sink, block.schema, options=options) as writer:
+                    writer.write_table(block)
+                buffer = sink.getvalue()
+                sent += buffer.size
+                self.client.raw_insert(table_name, block.schema.names, buffer, fmt="Arrow")
+            s.set(bytes=sent, compression=compression or "none")
+        return table.num_rows
+
+    def insert_from_s3(self, table_name: str, s3_url_path: str, columns: list = None):
         """
         Dada uma URL s3 virtual (ex: s3://raw-data/file.parquet) gerada pelo DatalakeConnector,
         faz com que a Engine de banco de dados do ClickHouse puxe esses dados diretamente do MinIO 
         via rede C2C (Container to Container), de forma insanamente rapida.
+        Com `columns` o insert é por nome (colunas ausentes ficam com o DEFAULT do DDL);
+        sem ele, por posição (SELECT *).
         """
         # Formatando a URL para o protocolo HTTP do S3 compativel. 
         # Como o s3_url_path deve ser 's3://raw-data/...', removemos o 's3://' inicial.
@@ -45,9 +153,12 @@ class ClickHouseClient:
         # Monta a URL C2C (usando minio_external_endpoint p/ containers se acharem)
         full_endpoint = f"{settings.minio_external_endpoint}/{s3_path_cleaned}"
 
+        column_list = ", ".join(f"`{c}`" for c in columns) if columns else ""
+        target = f"{table_name} ({column_list})" if columns else table_name
+
         query = f"""
-            INSERT INTO {table_name}
-            SELECT * FROM s3(
+            INSERT INTO {target}
+            SELECT {column_list or '*'} FROM s3(
                 '{full_endpoint}',
                 '{settings.minio_access_key}',
                 '{settings.minio_secret_key}',
@@ -56,7 +167,11 @@ class ClickHouseClient:
         """
         
         try:
-            self.client.command(query)
+            with span("clickhouse_ingest", table_name=table_name, s3_url=s3_url_path) as s:
+                summary = self.client.command(query)
+                written_rows = getattr(summary, "written_rows", None)
+                if written_rows is not None:
+                    s.set(rows=written_rows)
             logging.info(f"Dados inseridos com sucesso do Datalake {s3_url_path} para a tabela {table_name}")
         except Exception as e:
             logging.error(f"Erro ao ingerir S3 {s3_url_path} para o ClickHouse: {str(e)}")
@@ -6,6 +6,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class ClicksignConnector(BaseConnector):
@@ -40,7 +41,7 @@ class ClicksignConnector(BaseConnector):
             except Exception as e:
                 logging.error(f"[Clicksign] Erro envelopes page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", [])
             if not items:
                 break
@@ -65,7 +66,7 @@ class ClicksignConnector(BaseConnector):
                 url = f"{self.api_url}/envelopes/{env_id}/documents"
                 resp = requests.get(url, headers=self._headers(), timeout=60)
                 resp.raise_for_status()
-                docs = resp.json().get("data", [])
+                docs = decode_response(resp).get("data", [])
                 for doc in docs:
                     doc["envelope_id"] = env_id
                 documents.extend(docs)
@@ -76,7 +77,7 @@ class ClicksignConnector(BaseConnector):
                 url = f"{self.api_url}/envelopes/{env_id}/signers"
                 resp = requests.get(url, headers=self._headers(), timeout=60)
                 resp.raise_for_status()
-                signs = resp.json().get("data", [])
+                signs = decode_response(resp).get("data", [])
                 for s in signs:
                     s["envelope_id"] = env_id
                 signers.extend(signs)
@@ -90,19 +91,19 @@ class ClicksignConnector(BaseConnector):
     def get_tables_ddl(self) -> list:
         return [
             """CREATE TABLE IF NOT EXISTS clicksign_envelopes (
-                id String, status Nullable(String), name Nullable(String),
+                id String, status LowCardinality(Nullable(String)), name Nullable(String),
                 created_at Nullable(String), updated_at_source Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id""",
             """CREATE TABLE IF NOT EXISTS clicksign_envelopes_documents (
                 id String, envelope_id String, filename Nullable(String),
                 content_type Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY (envelope_id, id)""",
             """CREATE TABLE IF NOT EXISTS clicksign_envelopes_signers (
                 id String, envelope_id String, name Nullable(String),
-                email Nullable(String), status Nullable(String),
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                email Nullable(String), status LowCardinality(Nullable(String)),
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY (envelope_id, id)""",
         ]
 
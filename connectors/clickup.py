@@ -7,6 +7,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class ClickUpConnector(BaseConnector):
@@ -87,14 +88,14 @@ class ClickUpConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS clickup_tasks (
                 task_id Nullable(String),
                 name Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 assignee Nullable(String),
                 priority Nullable(String),
                 due_date Nullable(String),
                 date_created Nullable(String),
                 date_updated Nullable(String),
                 date_done Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY task_id
@@ -121,7 +122,7 @@ class ClickUpConnector(BaseConnector):
             logging.error(f"[ClickUp] Erro no export: HTTP {resp.status_code} - {resp.text}")
             return {"clickup_tasks": pd.DataFrame()}
 
-        data = resp.json()
+        data = decode_response(resp)
         csv_url = data.get("url")
         if not csv_url:
             logging.error(f"[ClickUp] URL do CSV nao encontrada na resposta: {data}")
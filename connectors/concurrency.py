@@ -0,0 +1,64 @@
+import time
+import itertools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(fn: Callable[[T], R], items: Iterable[T], max_workers: int = 4,
+                window: int = None, name: str = "fetch") -> Iterator[R]:
+    """
+    Aplica `fn` em paralelo (threads) e devolve os resultados na ordem de `items`.
+
+    No máximo `window` chamadas ficam em voo (padrão: 2x max_workers), então páginas já
+    baixadas não se acumulam se o consumidor (ex: StagePipeline) estiver mais lento.
+    Cada chamada roda numa cópia do contexto atual, para que os spans herdem flow/client.
+    Uma exceção em `fn` é relançada na posição do item que falhou.
+    """
+    window = window or max_workers * 2
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name) as pool:
+        def submit(batch):
+            for item in batch:
+                pending.append(pool.submit(contextvars.copy_context().run, fn, item))
+
+        try:
+            submit(itertools.islice(items, window))
+            while pending:
+                result = pending.popleft().result()
+                submit(itertools.islice(items, 1))
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class RateLimiter:
+    """
+    Limite de chamadas por minuto compartilhado entre as threads de um conector: cada
+    `wait()` reserva o próximo horário livre (intervalo mínimo de 60/per_minute segundos).
+    `pause(s)` adia todas as chamadas seguintes, ex: depois de um 429.
+    """
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
@@ -1,14 +1,20 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
+from connectors.instrumentation import span
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class CvcrmCvdwConnector(BaseConnector):
-    """Conector para CVCRM CVDW. Auth: email+token headers. Paginação: page-based (500/page)."""
+    """
+    Conector para CVCRM CVDW. Auth: email+token headers. Paginação: page-based (500/page).
+    Com `checkpoint` (PageCheckpoint), extract_iter pula tabelas concluídas e continua da
+    próxima página ainda não carregada; um erro de página falha a task (retry retoma dali).
+    """
 
     ENDPOINTS = {
         "cvcrm_cvdw_vendas": "cvdw/vendas",
@@ -18,40 +24,52 @@ class CvcrmCvdwConnector(BaseConnector):
         "cvcrm_cvdw_leads_historico_situacoes": "cvdw/leads/historico/situacoes",
     }
 
-    def __init__(self, api_dominio: str = None, email: str = None, token: str = None):
+    def __init__(self, api_dominio: str = None, email: str = None, token: str = None, checkpoint=None):
         self.api_dominio = api_dominio or settings.cvcrm_api_dominio
         self.email = email or settings.cvcrm_email
         self.token = token or settings.cvcrm_token
         self.base_url = f"https://{self.api_dominio}.cvcrm.com.br/api/v1" if self.api_dominio else ""
+        self.checkpoint = checkpoint
 
     def _headers(self):
         return {"email": self.email, "token": self.token, "Content-Type": "application/json"}
 
-    def _fetch_all_pages(self, endpoint: str) -> list:
-        all_items = []
-        page = 1
+    def _iter_pages(self, endpoint: str, page: int = 1):
+        """Gera (página, itens, última) à medida que as páginas são recebidas."""
+        total_items = 0
         while True:
             url = f"{self.base_url}/{endpoint}"
             params = {"pagina": page, "registros_por_pagina": 500}
-            try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
-                resp.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                logging.error(f"[CVCRM-CVDW] Erro {endpoint} pagina={page}: {e}")
-                break
-            data = resp.json()
-            items = data.get("dados", data.get("data", []))
-            if isinstance(items, dict):
-                items = list(items.values()) if items else []
+            with span("extract_page", provider="cvcrm_cvdw", endpoint=endpoint, page=page) as s:
+                try:
+                    resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
+                    resp.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"[CVCRM-CVDW] Erro {endpoint} pagina={page}: {e}")
+                    s.status = "error"
+                    if self.checkpoint:
+                        raise
+                    break
+                data = decode_response(resp)
+                items = data.get("dados", data.get("data", []))
+                if isinstance(items, dict):
+                    items = list(items.values()) if items else []
+                s.set(rows=len(items), bytes=len(resp.content))
             if not items:
                 break
-            all_items.extend(items)
+            total_items += len(items)
             total_pages = data.get("total_de_paginas", 1)
+            yield page, items, page >= total_pages
             if page >= total_pages:
                 break
             page += 1
             time.sleep(5)
-        logging.info(f"[CVCRM-CVDW] {endpoint}: {len(all_items)} registros em {page} páginas")
+        logging.info(f"[CVCRM-CVDW] {endpoint}: {total_items} registros em {page} páginas")
+
+    def _fetch_all_pages(self, endpoint: str) -> list:
+        all_items = []
+        for _, items, _ in self._iter_pages(endpoint):
+            all_items.extend(items)
         return all_items
 
     def get_tables_ddl(self) -> list:
@@ -61,7 +79,7 @@ class CvcrmCvdwConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {table_name} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -72,5 +90,18 @@ class CvcrmCvdwConnector(BaseConnector):
         results = {}
         for table_name, endpoint in self.ENDPOINTS.items():
             items = self._fetch_all_pages(endpoint)
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        for table_name, endpoint in self.ENDPOINTS.items():
+            if not self.checkpoint:
+                for _, items, _ in self._iter_pages(endpoint):
+                    yield table_name, pack_records(items)
+                continue
+            if self.checkpoint.done(table_name):
+                logging.info(f"[CVCRM-CVDW] {table_name}: já carregada nesta execução")
+                continue
+            start = self.checkpoint.resume(table_name).get("next", 1)
+            for page, items, last in self._iter_pages(endpoint, start):
+                yield table_name, self.checkpoint.tag(pack_records(items), table_name, page + 1, last)
@@ -2,20 +2,27 @@ import requests
 import re
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
+from connectors.instrumentation import span
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class CvcrmCvioConnector(BaseConnector):
-    """Conector para CVCRM CVIO. Auth: email+token headers. Paginação: offset-based."""
+    """
+    Conector para CVCRM CVIO. Auth: email+token headers. Paginação: offset-based.
+    Com `checkpoint` (PageCheckpoint), extract_iter continua do próximo offset ainda não
+    carregado; um erro de página falha a task (retry retoma dali).
+    """
 
-    def __init__(self, api_dominio: str = None, email: str = None, token: str = None):
+    def __init__(self, api_dominio: str = None, email: str = None, token: str = None, checkpoint=None):
         self.api_dominio = api_dominio or settings.cvcrm_api_dominio
         self.email = email or settings.cvcrm_email
         self.token = token or settings.cvcrm_token
         self.base_url = f"https://{self.api_dominio}.cvcrm.com.br/api" if self.api_dominio else ""
+        self.checkpoint = checkpoint
 
     def _headers(self):
         return {"email": self.email, "token": self.token, "Content-Type": "application/json"}
@@ -32,31 +39,43 @@ class CvcrmCvioConnector(BaseConnector):
             filtered[key] = value
         return filtered
 
-    def _fetch_all(self) -> list:
-        all_items = []
-        offset = 0
+    def _iter_pages(self, offset: int = 0):
+        """Gera (próximo offset, itens filtrados, última) à medida que as páginas são recebidas."""
         limit = 500
+        total_items = 0
         while True:
             url = f"{self.base_url}/cvio/lead"
             params = {"offset": offset, "limit": limit}
-            try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
-                resp.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                logging.error(f"[CVCRM-CVIO] Erro offset={offset}: {e}")
-                break
-            data = resp.json()
-            items = data.get("leads", [])
+            with span("extract_page", provider="cvcrm_cvio", endpoint="cvio/lead", page=offset // limit + 1) as s:
+                try:
+                    resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
+                    resp.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"[CVCRM-CVIO] Erro offset={offset}: {e}")
+                    s.status = "error"
+                    if self.checkpoint:
+                        raise
+                    break
+                data = decode_response(resp)
+                items = data.get("leads", [])
+                s.set(rows=len(items), bytes=len(resp.content))
             if not items:
                 break
             filtered_items = [self._filter_fields(item) for item in items]
-            all_items.extend(filtered_items)
+            total_items += len(filtered_items)
             total = data.get("total", 0)
-            if offset + limit >= total:
+            last = offset + limit >= total
+            yield offset + limit, filtered_items, last
+            if last:
                 break
             offset += limit
             time.sleep(5)
-        logging.info(f"[CVCRM-CVIO] leads: {len(all_items)} registros")
+        logging.info(f"[CVCRM-CVIO] leads: {total_items} registros")
+
+    def _fetch_all(self) -> list:
+        all_items = []
+        for _, items, _ in self._iter_pages():
+            all_items.extend(items)
         return all_items
 
     def get_tables_ddl(self) -> list:
@@ -65,7 +84,7 @@ class CvcrmCvioConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS cvcrm_cvio_leads (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -74,5 +93,17 @@ class CvcrmCvioConnector(BaseConnector):
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         items = self._fetch_all()
-        df = pd.DataFrame(items) if items else pd.DataFrame()
-        return {"cvcrm_cvio_leads": df}
+        return {"cvcrm_cvio_leads": pack_records(items)}
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        table_name = "cvcrm_cvio_leads"
+        if not self.checkpoint:
+            for _, items, _ in self._iter_pages():
+                yield table_name, pack_records(items)
+            return
+        if self.checkpoint.done(table_name):
+            logging.info(f"[CVCRM-CVIO] {table_name}: já carregada nesta execução")
+            return
+        start = self.checkpoint.resume(table_name).get("next", 0)
+        for next_offset, items, last in self._iter_pages(start):
+            yield table_name, self.checkpoint.tag(pack_records(items), table_name, next_offset, last)
@@ -1,8 +1,11 @@
+import io
 import pandas as pd
 import tempfile
+import json
 import boto3
 import os
 from config.settings import settings
+from connectors.instrumentation import span
 
 class DatalakeConnector:
     """
@@ -50,10 +53,14 @@ class DatalakeConnector:
 
         try:
             # Convert para parquet (Mais leve e otimizado para Data Lake)
-            df.to_parquet(temp_path, index=False, engine='pyarrow')
+            with span("parquet_encode", rows=len(df)) as s:
+                df.to_parquet(temp_path, index=False, engine='pyarrow')
+                file_size = os.path.getsize(temp_path)
+                s.set(bytes=file_size)
             
             # Executar Upload
-            self.s3_client.upload_file(temp_path, bucket_name, s3_key)
+            with span("s3_upload", rows=len(df), bytes=file_size, s3_key=s3_key):
+                self.s3_client.upload_file(temp_path, bucket_name, s3_key)
             print(f"Arquivo enviado para o Datalake: s3://{bucket_name}/{s3_key}")
             
             # Retorna caminho padrão S3 pro Clickhouse puxar depois
@@ -66,3 +73,52 @@ class DatalakeConnector:
             # Apagar arquivo temporario do worker
             if os.path.exists(temp_path):
                 os.remove(temp_path)
+
+    def push_json(self, data, bucket_name: str, s3_key: str) -> str:
+        """Grava um objeto JSON (ex: perfil de recursos de uma execução) no MinIO."""
+        self.ensure_bucket_exists(bucket_name)
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.s3_client.put_object(Bucket=bucket_name, Key=s3_key, Body=body, ContentType="application/json")
+        return f"s3://{bucket_name}/{s3_key}"
+
+    def get_json(self, bucket_name: str, s3_key: str, default=None):
+        """Lê um objeto JSON do MinIO; `default` se a chave (ou o bucket) não existir."""
+        try:
+            obj = self.s3_client.get_object(Bucket=bucket_name, Key=s3_key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return default
+        except self.s3_client.exceptions.NoSuchBucket:
+            return default
+        return json.loads(obj["Body"].read())
+
+    def get_parquet(self, bucket_name: str, s3_key: str, columns: list = None):
+        """Lê um Parquet do MinIO como DataFrame; None se a chave (ou o bucket) não existir."""
+        try:
+            obj = self.s3_client.get_object(Bucket=bucket_name, Key=s3_key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        except self.s3_client.exceptions.NoSuchBucket:
+            return None
+        return pd.read_parquet(io.BytesIO(obj["Body"].read()), columns=columns, engine='pyarrow')
+
+    def list_keys(self, bucket_name: str, prefix: str) -> list:
+        """Chaves sob `prefix`, em ordem lexicográfica; vazio se o bucket não existir."""
+        keys = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        try:
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+                keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        except self.s3_client.exceptions.NoSuchBucket:
+            return []
+        return sorted(keys)
+
+    def delete_prefix(self, bucket_name: str, prefix: str) -> int:
+        """Apaga todos os objetos sob `prefix` (ex: checkpoints de uma execução já carregada)."""
+        deleted = 0
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if keys:
+                self.s3_client.delete_objects(Bucket=bucket_name, Delete={"Objects": keys})
+                deleted += len(keys)
+        return deleted
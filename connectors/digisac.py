@@ -4,7 +4,9 @@ import logging
 import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.instrumentation import span
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class DigisacConnector(BaseConnector):
@@ -30,8 +32,9 @@ class DigisacConnector(BaseConnector):
             "Content-Type": "application/json",
         }
 
-    def _fetch_paginated(self, path: str) -> list:
-        all_items = []
+    def _iter_pages(self, path: str):
+        """Gera os itens de cada página à medida que são recebidos."""
+        total_items = 0
         page = 1
         per_page = 500
 
@@ -39,19 +42,23 @@ class DigisacConnector(BaseConnector):
             url = f"{self.api_url}/{path}"
             params = {"currentPage": page, "perPage": per_page}
 
-            try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=60)
-                resp.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                logging.error(f"[Digisac] Erro {path} page={page}: {e}")
-                break
-
-            data = resp.json()
-            items = data.get("data", [])
+            with span("extract_page", provider="digisac", endpoint=path, page=page) as s:
+                try:
+                    resp = requests.get(url, headers=self._headers(), params=params, timeout=60)
+                    resp.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"[Digisac] Erro {path} page={page}: {e}")
+                    s.status = "error"
+                    break
+
+                data = decode_response(resp)
+                items = data.get("data", [])
+                s.set(rows=len(items), bytes=len(resp.content))
             if not items:
                 break
 
-            all_items.extend(items)
+            total_items += len(items)
+            yield items
 
             last_page = data.get("lastPage", 1)
             if page >= last_page:
@@ -60,7 +67,12 @@ class DigisacConnector(BaseConnector):
             page += 1
             time.sleep(0.5)
 
-        logging.info(f"[Digisac] {path}: {len(all_items)} registros")
+        logging.info(f"[Digisac] {path}: {total_items} registros")
+
+    def _fetch_paginated(self, path: str) -> list:
+        all_items = []
+        for items in self._iter_pages(path):
+            all_items.extend(items)
         return all_items
 
     def _fetch_single(self, path: str) -> list:
@@ -68,7 +80,7 @@ class DigisacConnector(BaseConnector):
         try:
             resp = requests.get(url, headers=self._headers(), timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 return data
             elif isinstance(data, dict):
@@ -85,10 +97,10 @@ class DigisacConnector(BaseConnector):
                 id String,
                 title Nullable(String),
                 description Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 createdAt Nullable(String),
                 updatedAt Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -101,7 +113,7 @@ class DigisacConnector(BaseConnector):
                 phone Nullable(String),
                 createdAt Nullable(String),
                 updatedAt Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -110,7 +122,7 @@ class DigisacConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS digisac_answers_overview (
                 key String,
                 value Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY key
@@ -126,3 +138,12 @@ class DigisacConnector(BaseConnector):
                 items = self._fetch_single(cfg["path"])
             results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        for table_name, cfg in self.ENDPOINTS.items():
+            if cfg["paginated"]:
+                for items in self._iter_pages(cfg["path"]):
+                    yield table_name, pd.DataFrame(items)
+            else:
+                items = self._fetch_single(cfg["path"])
+                yield table_name, pd.DataFrame(items) if items else pd.DataFrame()
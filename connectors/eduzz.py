@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class EduzzConnector(BaseConnector):
@@ -62,7 +63,7 @@ class EduzzConnector(BaseConnector):
                 logging.error(f"Erro ao buscar {endpoint} page={page}: {e}")
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("items", [])
             all_items.extend(items)
 
@@ -85,7 +86,7 @@ class EduzzConnector(BaseConnector):
                 email Nullable(String),
                 phone Nullable(String),
                 document Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -94,11 +95,11 @@ class EduzzConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS eduzz_subscriptions_creation (
                 id String,
                 plan_name Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 created_at Nullable(String),
                 updated_at_field Nullable(String),
                 value Float64 DEFAULT 0,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -107,11 +108,11 @@ class EduzzConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS eduzz_subscriptions_update (
                 id String,
                 plan_name Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 created_at Nullable(String),
                 updated_at_field Nullable(String),
                 value Float64 DEFAULT 0,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -125,7 +126,7 @@ class EduzzConnector(BaseConnector):
                 date_create Nullable(String),
                 client_name Nullable(String),
                 client_email Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
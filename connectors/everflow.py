@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class EverflowConnector(BaseConnector):
@@ -57,7 +58,7 @@ class EverflowConnector(BaseConnector):
             try:
                 resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
                 resp.raise_for_status()
-                items = self._extract_data(resp.json(), data_key)
+                items = self._extract_data(decode_response(resp), data_key)
                 all_items.extend(items)
             except Exception as e:
                 logging.error(f"[Everflow] Erro {path}: {e}")
@@ -72,7 +73,7 @@ class EverflowConnector(BaseConnector):
                 except Exception as e:
                     logging.error(f"[Everflow] Erro {path} page={page}: {e}")
                     break
-                items = self._extract_data(resp.json(), data_key)
+                items = self._extract_data(decode_response(resp), data_key)
                 if not items:
                     break
                 all_items.extend(items)
@@ -89,7 +90,7 @@ class EverflowConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {t} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -99,5 +100,5 @@ class EverflowConnector(BaseConnector):
         results = {}
         for table_name, cfg in self.ENDPOINTS.items():
             items = self._fetch_endpoint(cfg["path"], cfg["data_key"], cfg["pagination_disabled"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
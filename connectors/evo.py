@@ -2,10 +2,11 @@ import requests
 import base64
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class EvoConnector(BaseConnector):
@@ -36,7 +37,7 @@ class EvoConnector(BaseConnector):
         try:
             resp = requests.get(url, headers=self._headers(), timeout=120)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 return data
             elif isinstance(data, dict):
@@ -59,7 +60,7 @@ class EvoConnector(BaseConnector):
             except Exception as e:
                 logging.error(f"[Evo] Erro {path} offset={offset}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 items = data
             elif isinstance(data, dict):
@@ -77,15 +78,7 @@ class EvoConnector(BaseConnector):
         return all_items
 
     def get_tables_ddl(self) -> list:
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String,
-                data String,
-                project_id String DEFAULT '',
-                updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at)
-            ORDER BY id
-            """ for t in self.ENDPOINTS]
+        return [blob_ddl(t) for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
@@ -95,5 +88,5 @@ class EvoConnector(BaseConnector):
             else:
                 items = self._fetch_simple(cfg["path"])
             logging.info(f"[Evo] {table_name}: {len(items)} registros")
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response, stream_records, batched, STREAM_BATCH_SIZE
 
 
 class FacilitaConnector(BaseConnector):
@@ -35,28 +36,36 @@ class FacilitaConnector(BaseConnector):
     def _platform_headers(self):
         return {"api-instance": self.instance, "api-key": self.api_key or self.token, "token-user": self.token_user or "", "Content-Type": "application/json"}
 
-    def _fetch_bi_report(self, report_name: str) -> list:
+    def _iter_bi_report(self, report_name: str):
+        """
+        Registros do relatório BI conforme o corpo chega (stream). Falha na requisição é logada
+        e pula o relatório; falha no meio do stream é relançada (carga incompleta).
+        """
         url = f"{self.bi_url}/analyses"
         params = {"report": report_name}
+        resp = None
         try:
-            resp = requests.get(url, headers=self._bi_headers(), params=params, timeout=120)
+            resp = requests.get(url, headers=self._bi_headers(), params=params, timeout=120, stream=True)
             resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict):
-                return data.get("data", data.get("items", []))
-            return []
-        except Exception as e:
+        except requests.exceptions.RequestException as e:
             logging.error(f"[Facilita] Erro BI report {report_name}: {e}")
-            return []
+            if resp is not None:
+                resp.close()
+            return
+        try:
+            yield from stream_records(resp, ("item", "data.item", "items.item"))
+        finally:
+            resp.close()
+
+    def _fetch_bi_report(self, report_name: str) -> list:
+        return list(self._iter_bi_report(report_name))
 
     def _fetch_funnel(self) -> list:
         url = f"{self.platform_url}/funnel"
         try:
             resp = requests.get(url, headers=self._platform_headers(), timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 return data
             elif isinstance(data, dict):
@@ -72,7 +81,7 @@ class FacilitaConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {t} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -88,10 +97,21 @@ class FacilitaConnector(BaseConnector):
                 all_items.extend(items)
                 time.sleep(1)
             logging.info(f"[Facilita] {table_name}: {len(all_items)} registros de {len(reports)} relatórios")
-            results[table_name] = pd.DataFrame(all_items) if all_items else pd.DataFrame()
+            results[table_name] = pack_records(all_items)
 
         # Platform API: funnel
         funnel = self._fetch_funnel()
-        results["facilita_funnel"] = pd.DataFrame(funnel) if funnel else pd.DataFrame()
+        results["facilita_funnel"] = pack_records(funnel)
 
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        """Emite lotes dos relatórios BI enquanto são baixados; o funil (pequeno) vai em um lote."""
+        for table_name, reports in self.BI_REPORTS.items():
+            for report in reports:
+                for batch in batched(self._iter_bi_report(report), STREAM_BATCH_SIZE):
+                    yield table_name, pack_records(batch)
+                time.sleep(1)
+
+        funnel = self._fetch_funnel()
+        yield "facilita_funnel", pack_records(funnel)
@@ -0,0 +1,189 @@
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from config.settings import settings
+from connectors.datalake import DatalakeConnector
+from connectors.instrumentation import span
+from connectors.schema import table_order_by
+
+
+def row_hashes(df: pd.DataFrame, exclude: Iterable[str] = ()) -> np.ndarray:
+    """
+    Hash uint64 por linha das colunas de negócio (todas menos `exclude`, em ordem de nome),
+    vetorizado com pd.util.hash_pandas_object. Colunas com listas/dicts (ou ArrowDtype
+    aninhado), que o pandas não sabe hashear, entram como texto.
+    """
+    columns = sorted(c for c in df.columns if c not in set(exclude))
+    frame = df[columns]
+    try:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    except Exception:
+        pass
+
+    frame = frame.copy()
+    for name in columns:
+        try:
+            pd.util.hash_pandas_object(frame[name], index=False)
+        except Exception:
+            frame[name] = frame[name].astype(str)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+class RowFingerprints:
+    """
+    Deduplicação por conteúdo entre execuções: guarda, por tabela/cliente, o hash da última
+    versão carregada de cada linha, indexado pela chave da tabela (colunas do ORDER BY do
+    DDL do `connector`), em `{source}/{cliente}/_fingerprints/{tabela}.parquet` (`key`, `hash`).
+    `filter` devolve só as linhas de chave nova ou com conteúdo diferente da última versão
+    (inclusive das já vistas em lotes anteriores desta execução). Evita reinserir as mesmas
+    linhas nas ReplacingMergeTree a cada recarga completa (menos partes e merges no ClickHouse).
+
+    `commit(tabela, df)`, chamado depois que o lote foi carregado, registra seus hashes e grava
+    um delta em `{tabela}/pending/`: um retry que pula páginas já carregadas (PageCheckpoint)
+    continua enxergando-as. `save()` consolida o último hash por chave no arquivo da tabela e
+    apaga os deltas. Tabela sem chave no DDL não é filtrada. `refresh=True` (full_refresh)
+    carrega tudo e grava só os hashes desta execução.
+    Cada lote gera um span `fingerprint` (rows, skipped); `stats` tem o total por tabela.
+    """
+
+    def __init__(self, source: str, company_name: str, bucket: str = "raw-data",
+                 lake: DatalakeConnector = None, refresh: bool = False, exclude: Iterable[str] = (),
+                 connector=None):
+        self.lake = lake or DatalakeConnector()
+        self.bucket = bucket
+        self.prefix = f"{source}/{company_name}/_fingerprints"
+        self.enabled = settings.row_fingerprints
+        self.refresh = refresh
+        self.exclude = tuple(exclude)
+        self.connector = connector
+        self.stats: Dict[str, dict] = {}
+        self._previous: Dict[str, pd.Series] = {}
+        self._seen: Dict[str, dict] = {}
+        self._loaded: Dict[str, List[pd.Series]] = {}
+        self._unkeyed = set()
+        self._lock = threading.Lock()
+
+    def _key(self, table_name: str) -> str:
+        return f"{self.prefix}/{table_name}.parquet"
+
+    def _pending(self, table_name: str) -> str:
+        return f"{self.prefix}/{table_name}/pending/"
+
+    def _keys(self, table_name: str, df: pd.DataFrame) -> List[str]:
+        keys = table_order_by(self.connector, table_name) if self.connector else []
+        return keys if keys and all(k in df.columns for k in keys) else []
+
+    def _hashes(self, table_name: str, df: pd.DataFrame):
+        """(hash da chave, hash do conteúdo) por linha; None se a tabela não tem chave."""
+        keys = self._keys(table_name, df)
+        if not keys:
+            return None
+        return row_hashes(df[keys]), row_hashes(df, self.exclude)
+
+    @staticmethod
+    def _latest(parts: List[pd.Series]) -> pd.Series:
+        """Junta versões (key -> hash) em ordem, mantendo o último hash de cada chave."""
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return pd.Series(np.array([], dtype="uint64"), index=pd.Index([], dtype="uint64"))
+        merged = pd.concat(parts)
+        return merged[~merged.index.duplicated(keep="last")]
+
+    def _read(self, key: str) -> pd.Series:
+        df = self.lake.get_parquet(self.bucket, key, columns=["key", "hash"])
+        if df is None or df.empty:
+            return self._latest([])
+        return pd.Series(df["hash"].to_numpy(), index=pd.Index(df["key"].to_numpy()))
+
+    def _load_previous(self, table_name: str) -> pd.Series:
+        """Última carga consolidada + deltas de tentativas que não chegaram ao `save`."""
+        if table_name not in self._previous:
+            parts = []
+            if not self.refresh:
+                try:
+                    parts.append(self._read(self._key(table_name)))
+                    parts.extend(self._read(k) for k in self.lake.list_keys(self.bucket, self._pending(table_name)))
+                except Exception as e:
+                    logging.warning(f"[Fingerprint] Falha ao ler {self._key(table_name)} ({e}); carregando tudo")
+                    parts = []
+            self._previous[table_name] = self._latest(parts)
+        return self._previous[table_name]
+
+    def filter(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Linhas de `df` de chave nova ou com conteúdo diferente da última versão carregada."""
+        if not self.enabled or df.empty:
+            return df
+
+        with span("fingerprint", table_name=table_name, rows=len(df)) as s:
+            hashes = self._hashes(table_name, df)
+            if hashes is None:
+                if table_name not in self._unkeyed:
+                    self._unkeyed.add(table_name)
+                    logging.warning(f"[Fingerprint] {table_name} sem chave (ORDER BY) no lote; carregando tudo")
+                return df
+            keys, content = hashes
+            with self._lock:
+                previous = self._load_previous(table_name)
+                latest = np.zeros(len(keys), dtype="uint64")
+                if not previous.empty:
+                    positions = previous.index.get_indexer(keys)
+                    found = positions >= 0
+                    latest[found] = previous.to_numpy()[positions[found]]
+                seen = self._seen.setdefault(table_name, {})
+                if seen:
+                    latest = np.fromiter((seen.get(k, v) for k, v in zip(keys.tolist(), latest.tolist())),
+                                         dtype="uint64", count=len(keys))
+                pairs = pd.DataFrame({"key": keys, "hash": content})
+                keep = (content != latest) & ~pairs.duplicated().to_numpy()
+                seen.update(zip(keys[keep].tolist(), content[keep].tolist()))
+            skipped = int(len(df) - keep.sum())
+            s.set(skipped=skipped)
+
+        with self._lock:
+            stats = self.stats.setdefault(table_name, {"rows": 0, "skipped": 0})
+            stats["rows"] += len(df)
+            stats["skipped"] += skipped
+        return df[keep] if skipped else df
+
+    def filter_all(self, data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """`filter` em cada tabela de um extract no formato {tabela: df}."""
+        return {table_name: self.filter(table_name, df) for table_name, df in data.items()}
+
+    def commit(self, table_name: str, df: pd.DataFrame):
+        """Registra os hashes de um lote já carregado e os grava como delta (sobrevive a retry)."""
+        if not self.enabled or df.empty:
+            return
+        hashes = self._hashes(table_name, df)
+        if hashes is None:
+            return
+        version = pd.Series(hashes[1], index=pd.Index(hashes[0]))
+        with self._lock:
+            self._loaded.setdefault(table_name, []).append(version)
+        delta = pd.DataFrame({"key": hashes[0], "hash": hashes[1]})
+        self.lake.push_dataframe_to_parquet(delta, self.bucket, f"{self._pending(table_name)}{time.time_ns()}.parquet")
+
+    def commit_all(self, data: Dict[str, pd.DataFrame]):
+        for table_name, df in data.items():
+            self.commit(table_name, df)
+
+    def save(self):
+        """Consolida o último hash por chave (carga anterior + lotes commitados) e apaga os deltas."""
+        for table_name, versions in self._loaded.items():
+            previous = self._latest([]) if self.refresh else self._load_previous(table_name)
+            latest = self._latest([previous] + versions)
+            self.lake.push_dataframe_to_parquet(
+                pd.DataFrame({"key": latest.index.to_numpy(), "hash": latest.to_numpy()}),
+                self.bucket, self._key(table_name),
+            )
+            self.lake.delete_prefix(self.bucket, self._pending(table_name))
+
+            stats = self.stats.get(table_name, {})
+            rows, skipped = stats.get("rows", 0), stats.get("skipped", 0)
+            ratio = skipped / rows if rows else 0
+            logging.info(f"[Fingerprint] {table_name}: {skipped}/{rows} linhas sem mudança puladas ({ratio:.1%})")
+        self._loaded = {}
@@ -0,0 +1,124 @@
+import json
+import logging
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+# Como tratar colunas aninhadas (listas, ou objetos além de max_level) no resultado
+NESTED_MODES = ("arrow", "json", "repr", "python", "drop")
+
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, OverflowError)
+
+
+def _is_nested(arrow_type) -> bool:
+    return (
+        pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+        or pa.types.is_struct(arrow_type) or pa.types.is_map(arrow_type)
+    )
+
+
+def _encode_nested(values: list, nested: str) -> list:
+    if nested == "json":
+        return [json.dumps(v, ensure_ascii=False, default=str) if v is not None else None for v in values]
+    if nested == "repr":
+        return [str(v) if v is not None else None for v in values]
+    return values
+
+
+def _value_at(record: dict, path: tuple):
+    for key in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def _arrow_flatten(records: List[dict], sep: str, columns: Optional[List[str]], nested: str,
+                   max_level: Optional[int]) -> pd.DataFrame:
+    array = pa.array(records)
+    if not pa.types.is_struct(array.type):
+        raise TypeError("registros não são objetos")
+    table = pa.Table.from_batches([pa.RecordBatch.from_struct_array(array)])
+    # Caminho de chaves de cada coluna, acompanhando table.flatten() (struct -> filhos, na ordem)
+    paths = [(f.name,) for f in table.schema]
+
+    level = 0
+    while any(pa.types.is_struct(f.type) for f in table.schema) and (max_level is None or level < max_level):
+        paths = [
+            path + (child.name,) if pa.types.is_struct(f.type) else path
+            for f, path in zip(table.schema, paths)
+            for child in (f.type if pa.types.is_struct(f.type) else [None])
+        ]
+        table = table.flatten()
+        level += 1
+    names = [sep.join(path) for path in paths]
+    table = table.rename_columns(names)
+
+    keep = range(len(names))
+    if columns is not None:
+        position = {name: i for i, name in enumerate(names)}
+        keep = [position[c] for c in dict.fromkeys(columns) if c in position]
+        table = table.select(list(keep))
+
+    nested_cols = [f.name for f in table.schema if _is_nested(f.type)]
+    if nested == "drop":
+        return table.drop_columns(nested_cols).to_pandas()
+    if nested == "arrow":
+        # Listas/objetos ficam como ArrowDtype: vão ao Parquet como LIST/STRUCT (Array/Tuple no ClickHouse)
+        return table.to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if _is_nested(t) else None)
+
+    # Demais modos usam o valor original do registro (o Arrow preenche chaves ausentes com None)
+    df = table.drop_columns(nested_cols).to_pandas()
+    nested_paths = {names[i]: paths[i] for i in keep if names[i] in nested_cols}
+    for name in nested_cols:
+        df[name] = _encode_nested([_value_at(r, nested_paths[name]) for r in records], nested)
+    return df[table.column_names]
+
+
+def _pandas_flatten(records: List[dict], sep: str, columns: Optional[List[str]], nested: str,
+                    max_level: Optional[int]) -> pd.DataFrame:
+    df = pd.json_normalize(records, sep=sep, max_level=max_level)
+    if columns is not None:
+        df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+    if nested in ("arrow", "python"):
+        return df
+    for name in df.columns[df.dtypes == object]:
+        values = df[name].tolist()
+        if any(isinstance(v, (list, dict)) for v in values):
+            if nested == "drop":
+                df = df.drop(columns=name)
+            else:
+                df[name] = _encode_nested(values, nested)
+    return df
+
+
+def bulk_flatten(records: Iterable[dict], sep: str = "_", columns: Optional[List[str]] = None,
+                 nested: str = "arrow", max_level: Optional[int] = None) -> pd.DataFrame:
+    """
+    Achata um lote de registros JSON em colunas de uma vez (sem laço Python por chave).
+
+    Converte o lote para Arrow (o tipo struct é inferido de todos os registros) e achata
+    os objetos aninhados nível a nível: `{"a": {"b": 1}}` vira a coluna `a<sep>b`. Listas não
+    são expandidas por índice; seguem como valor conforme `nested`:
+
+    - "arrow": pd.ArrowDtype (LIST/STRUCT no Parquet, Array/Tuple no ClickHouse)
+    - "json": string JSON (colunas String/JSON)
+    - "repr": str(valor), como os flatteners legados
+    - "python": listas/dicts Python
+    - "drop": descarta a coluna
+
+    `columns` projeta o resultado (ordem do DDL); `max_level` limita a profundidade.
+    Se o lote tiver tipos incompatíveis entre registros (ex: int e string no mesmo campo),
+    cai para pd.json_normalize com as mesmas regras.
+    """
+    if nested not in NESTED_MODES:
+        raise ValueError(f"nested deve ser um de {NESTED_MODES}")
+    records = list(records)
+    if not records:
+        return pd.DataFrame()
+    try:
+        return _arrow_flatten(records, sep, columns, nested, max_level)
+    except _ARROW_ERRORS as e:
+        logging.debug(f"[Flatten] Lote heterogêneo para Arrow ({e}); usando json_normalize")
+        return _pandas_flatten(records, sep, columns, nested, max_level)
@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response, stream_records, batched, STREAM_BATCH_SIZE
 
 
 class GronerConnector(BaseConnector):
@@ -74,9 +75,12 @@ class GronerConnector(BaseConnector):
                 resp = requests.get(url, headers=self._headers(), params=req_params, timeout=120)
                 resp.raise_for_status()
             except requests.exceptions.RequestException as e:
+                if page > 1:
+                    # Páginas anteriores já lidas: relança em vez de devolver o endpoint incompleto
+                    raise
                 logging.error(f"[Groner] Erro {path} page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             content = data.get("Content", data)
             items = content.get("list", content.get("data", []))
             if isinstance(items, dict):
@@ -92,38 +96,42 @@ class GronerConnector(BaseConnector):
         logging.info(f"[Groner] {path}: {len(all_items)} registros em {page} páginas")
         return all_items
 
-    def _fetch_date_range(self, path: str, date_start: datetime, date_stop: datetime, extra_params: dict = None) -> list:
+    # Onde os registros aparecem nas respostas (lista no topo, Content.list, Content.data...)
+    RECORD_PATHS = (
+        "item", "Content.list.item", "Content.data.item", "Content.list", "Content.data",
+        "list.item", "data.item", "list", "data",
+    )
+
+    def _iter_date_range(self, path: str, date_start: datetime, date_stop: datetime, extra_params: dict = None):
+        """
+        Registros do relatório por período conforme o corpo chega (stream). Falha na requisição
+        é logada e pula o relatório; falha no meio do stream é relançada (carga incompleta).
+        """
         url = f"{self.api_url}/{path}"
         params = {
             "dataInicial": date_start.strftime("%Y-%m-%d"),
             "dataFinal": date_stop.strftime("%Y-%m-%d"),
             **(extra_params or {}),
         }
+        resp = None
         try:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
+            resp = requests.get(url, headers=self._headers(), params=params, timeout=120, stream=True)
             resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, list):
-                return data
-            content = data.get("Content", data)
-            items = content.get("list", content.get("data", []))
-            if isinstance(items, dict):
-                items = [items]
-            return items if isinstance(items, list) else []
-        except Exception as e:
+        except requests.exceptions.RequestException as e:
             logging.error(f"[Groner] Erro {path}: {e}")
-            return []
+            if resp is not None:
+                resp.close()
+            return
+        try:
+            yield from stream_records(resp, self.RECORD_PATHS)
+        finally:
+            resp.close()
+
+    def _fetch_date_range(self, path: str, date_start: datetime, date_stop: datetime, extra_params: dict = None) -> list:
+        return list(self._iter_date_range(path, date_start, date_stop, extra_params))
 
     def get_tables_ddl(self) -> list:
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String,
-                data String,
-                project_id String DEFAULT '',
-                updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at)
-            ORDER BY id
-            """ for t in self.ENDPOINTS]
+        return [blob_ddl(t) for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
@@ -135,5 +143,16 @@ class GronerConnector(BaseConnector):
                 items = self._fetch_paginated(cfg["path"], extra)
             else:
                 items = self._fetch_date_range(cfg["path"], date_start, date_stop, extra)
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        """Relatórios por período saem em lotes durante o download; paginados, um lote por endpoint."""
+        for table_name, cfg in self.ENDPOINTS.items():
+            extra = cfg.get("extra_params", {})
+            if cfg.get("paginated") and not cfg.get("use_date_range"):
+                items = self._fetch_paginated(cfg["path"], extra)
+                yield table_name, pack_records(items)
+                continue
+            for batch in batched(self._iter_date_range(cfg["path"], date_start, date_stop, extra), STREAM_BATCH_SIZE):
+                yield table_name, pack_records(batch)
@@ -4,13 +4,23 @@ import logging
 import pandas as pd
 from datetime import datetime, timedelta
 from connectors.base import BaseConnector
+from connectors.concurrency import RateLimiter, ordered_map
+from connectors.instrumentation import span
+from connectors.schema import PrunedFlattener
+from connectors.token_cache import token_cache
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class HotmartConnector(BaseConnector):
     """
     Conector para extração de dados da API Hotmart (produtos digitais).
     Auth: OAuth 2.0 (client_credentials). Paginação: token-based (page_token).
+
+    O histórico de vendas é dividido em janelas de `window_days` (e, opcionalmente, em
+    `status_groups` grupos de status), buscadas em paralelo sob um RateLimiter comum.
+    Com `checkpoint` (StateStore do cliente), cada janela concluída é gravada no MinIO e
+    um retry da task só busca as que faltam.
     """
 
     BASE_URL = "https://developers.hotmart.com"
@@ -23,23 +33,28 @@ class HotmartConnector(BaseConnector):
         "PROTESTED", "REFUNDED", "STARTED", "UNDER_ANALISYS", "WAITING_PAYMENT",
     ]
 
-    def __init__(self, basic_auth: str = None, days_to_fetch: int = None):
+    def __init__(self, basic_auth: str = None, days_to_fetch: int = None, window_days: int = None,
+                 status_groups: int = None, max_workers: int = None, checkpoint=None):
         self.basic_auth = basic_auth or settings.hotmart_basic_auth
         self.days_to_fetch = days_to_fetch or settings.hotmart_days_to_fetch
-        self._token = None
+        self.window_days = window_days or settings.hotmart_window_days
+        self.status_groups = status_groups or settings.hotmart_status_groups
+        self.max_workers = max_workers or settings.hotmart_max_workers
+        self.checkpoint = checkpoint
+        self.limiter = RateLimiter(settings.hotmart_requests_per_minute)
 
     def _get_token(self) -> str:
-        if self._token:
-            return self._token
+        return token_cache.get("hotmart", (self.basic_auth,), self._request_token)
 
+    def _request_token(self) -> tuple:
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
             "Authorization": f"Basic {self.basic_auth}",
         }
         resp = requests.post(self.AUTH_URL, headers=headers, params={"grant_type": "client_credentials"})
         resp.raise_for_status()
-        self._token = resp.json()["access_token"]
-        return self._token
+        data = resp.json()
+        return data["access_token"], data.get("expires_in")
 
     def _auth_headers(self):
         return {
@@ -47,27 +62,26 @@ class HotmartConnector(BaseConnector):
             "Content-Type": "application/json",
         }
 
-    def _get_date_range(self):
+    def _sales_windows(self) -> list:
+        """
+        (chave, start_ms, end_ms, status) de cada janela; dias alinhados à meia-noite para a chave
+        se manter num retry do mesmo dia. A última janela termina em `agora`, que muda a cada
+        tentativa: fica sem chave (None) e é sempre buscada de novo, nunca reaproveitada.
+        """
         end = datetime.now()
-        start = end - timedelta(days=self.days_to_fetch)
-        return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
-
-    @staticmethod
-    def _flatten_json(nested: dict, prefix: str = "") -> dict:
-        flat = {}
-        for key, value in nested.items():
-            new_key = f"{prefix}_{key}" if prefix else key
-            if isinstance(value, dict):
-                flat.update(HotmartConnector._flatten_json(value, new_key))
-            elif isinstance(value, list):
-                for i, item in enumerate(value):
-                    if isinstance(item, dict):
-                        flat.update(HotmartConnector._flatten_json(item, f"{new_key}_{i}"))
-                    else:
-                        flat[f"{new_key}_{i}"] = item
-            else:
-                flat[new_key] = value
-        return flat
+        day = (end - timedelta(days=self.days_to_fetch)).replace(hour=0, minute=0, second=0, microsecond=0)
+        groups = [self.TRANSACTION_STATUSES[i::self.status_groups] for i in range(self.status_groups)]
+
+        windows = []
+        while day < end:
+            next_day = min(day + timedelta(days=self.window_days), end)
+            start_ms, end_ms = int(day.timestamp() * 1000), int(next_day.timestamp() * 1000) - 1
+            closed = next_day < end
+            for i, statuses in enumerate(groups):
+                key = f"{end:%Y%m%d}/{day:%Y%m%d}_{self.window_days}d_g{i}of{len(groups)}" if closed else None
+                windows.append((key, start_ms, end_ms, ",".join(statuses)))
+            day = next_day
+        return windows
 
     @staticmethod
     def _convert_dates(df: pd.DataFrame) -> pd.DataFrame:
@@ -83,8 +97,8 @@ class HotmartConnector(BaseConnector):
             )
         return df
 
-    def _fetch_paginated(self, endpoint: str, params: dict = None) -> list:
-        """Busca todas as páginas usando page_token."""
+    def _fetch_paginated(self, endpoint: str, params: dict = None, raise_on_error: bool = False) -> list:
+        """Busca todas as páginas usando page_token (raise_on_error: falha em vez de devolver o parcial)."""
         all_items = []
         next_page = None
         url = f"{self.BASE_URL}/{endpoint}"
@@ -97,12 +111,19 @@ class HotmartConnector(BaseConnector):
 
             for retry in range(5):
                 try:
-                    resp = requests.get(url, headers=self._auth_headers(), params=req_params, timeout=30)
+                    self.limiter.wait()
+                    # Com 401 o token em cache é renovado e a página repetida uma vez
+                    resp = token_cache.retry_unauthorized(
+                        "hotmart", (self.basic_auth,),
+                        lambda: requests.get(url, headers=self._auth_headers(), params=req_params, timeout=30),
+                    )
 
                     if resp.status_code == 429:
                         wait = 60 * (retry + 1)
                         logging.warning(f"[Hotmart] Rate limit - aguardando {wait}s")
-                        time.sleep(wait)
+                        self.limiter.pause(wait)
+                        with span("rate_limit_wait", provider="hotmart"):
+                            time.sleep(wait)
                         continue
 
                     resp.raise_for_status()
@@ -112,9 +133,11 @@ class HotmartConnector(BaseConnector):
                         time.sleep(10 * (2 ** retry))
                         continue
                     logging.error(f"[Hotmart] Falha apos 5 tentativas: {e}")
+                    if raise_on_error:
+                        raise
                     return all_items
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("items", [])
             if not items:
                 break
@@ -129,36 +152,30 @@ class HotmartConnector(BaseConnector):
         logging.info(f"[Hotmart] {endpoint}: {len(all_items)} registros")
         return all_items
 
-    def _extract_sales_nested(self, sales: list) -> list:
-        """Extrai campos aninhados de vendas para formato flat."""
-        flat_data = []
-        for item in sales:
-            flat = {k: v for k, v in item.items() if not isinstance(v, (dict, list))}
-
-            for obj_name in ["product", "buyer", "producer"]:
-                if obj_name in item and isinstance(item[obj_name], dict):
-                    for k, v in item[obj_name].items():
-                        flat[f"{obj_name}_{k}"] = v
-
-            if "purchase" in item and isinstance(item["purchase"], dict):
-                purchase = item["purchase"]
-                for k, v in purchase.items():
-                    if not isinstance(v, dict):
-                        flat[f"purchase_{k}"] = v
-
-                for nested_name, prefix in [
-                    ("price", "purchase_price_"),
-                    ("payment", "purchase_payment_"),
-                    ("tracking", "purchase_tracking_"),
-                    ("offer", "purchase_offer_"),
-                    ("hotmart_fee", "purchase_hotmart_fee_"),
-                ]:
-                    if nested_name in purchase and isinstance(purchase[nested_name], dict):
-                        for k, v in purchase[nested_name].items():
-                            flat[f"{prefix}{k}"] = v
+    def _fetch_sales_window(self, window: tuple) -> list:
+        key, start_ms, end_ms, statuses = window
+        done = self.checkpoint.get("sales_windows", {}) if self.checkpoint else {}
+        if key in done:
+            return self.checkpoint.lake.get_json(self.checkpoint.bucket, done[key], default=[])
 
-            flat_data.append(flat)
-        return flat_data
+        items = self._fetch_paginated(
+            "payments/api/v1/sales/history",
+            {"max_results": 500, "start_date": start_ms, "end_date": end_ms, "transaction_status": statuses},
+            raise_on_error=self.checkpoint is not None,
+        )
+        if self.checkpoint and key:
+            s3_key = f"{self.checkpoint.prefix}/_windows/{key}.json"
+            self.checkpoint.lake.push_json(items, self.checkpoint.bucket, s3_key)
+            self.checkpoint.update("sales_windows", {key: s3_key})
+            self.checkpoint.save()
+        return items
+
+    def _fetch_sales(self) -> list:
+        windows = self._sales_windows()
+        done = self.checkpoint.get("sales_windows", {}) if self.checkpoint else {}
+        logging.info(f"[Hotmart] Vendas: {len(windows)} janelas ({sum(w[0] in done for w in windows)} já concluídas)")
+        pages = ordered_map(self._fetch_sales_window, windows, self.max_workers, name="hotmart")
+        return [item for page in pages for item in page]
 
     def get_tables_ddl(self) -> list:
         return [
@@ -166,8 +183,8 @@ class HotmartConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS hotmart_products (
                 id String,
                 name Nullable(String),
-                status Nullable(String),
-                project_id String DEFAULT '',
+                status LowCardinality(Nullable(String)),
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -179,10 +196,10 @@ class HotmartConnector(BaseConnector):
                 product_name Nullable(String),
                 buyer_name Nullable(String),
                 buyer_email Nullable(String),
-                purchase_status Nullable(String),
+                purchase_status LowCardinality(Nullable(String)),
                 purchase_price_value Float64 DEFAULT 0,
                 purchase_order_date Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY transaction
@@ -191,8 +208,8 @@ class HotmartConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS hotmart_subscriptions (
                 subscriber_code Nullable(String),
                 plan_name Nullable(String),
-                status Nullable(String),
-                project_id String DEFAULT '',
+                status LowCardinality(Nullable(String)),
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY subscriber_code
@@ -200,7 +217,7 @@ class HotmartConnector(BaseConnector):
             """
             CREATE TABLE IF NOT EXISTS hotmart_sales_summary (
                 total_items Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY updated_at
@@ -208,25 +225,18 @@ class HotmartConnector(BaseConnector):
         ]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        start_ts, end_ts = self._get_date_range()
-        status_param = ",".join(self.TRANSACTION_STATUSES)
-
         # Products
         products_raw = self._fetch_paginated(
             "products/api/v1/products", {"max_results": 100}
         )
-        products = [self._flatten_json(p) for p in products_raw]
-        df_products = pd.DataFrame(products)
+        # Achata só os caminhos que viram colunas do DDL (evita centenas de colunas descartadas)
+        df_products = PrunedFlattener.for_table(self, "hotmart_products").frame(products_raw)
         if not df_products.empty:
             df_products = self._convert_dates(df_products)
 
         # Sales
-        sales_raw = self._fetch_paginated(
-            "payments/api/v1/sales/history",
-            {"max_results": 500, "start_date": start_ts, "end_date": end_ts, "transaction_status": status_param},
-        )
-        sales_flat = self._extract_sales_nested(sales_raw)
-        df_sales = pd.DataFrame(sales_flat)
+        sales_raw = self._fetch_sales()
+        df_sales = PrunedFlattener.for_table(self, "hotmart_sales").frame(sales_raw)
         if not df_sales.empty:
             df_sales = self._convert_dates(df_sales)
 
@@ -235,8 +245,7 @@ class HotmartConnector(BaseConnector):
             "payments/api/v1/subscriptions",
             {"max_results": 500, "status": "ACTIVE,CANCELLED,DELAYED,INACTIVE,OVERDUE"},
         )
-        subs = [self._flatten_json(s) for s in subs_raw]
-        df_subs = pd.DataFrame(subs)
+        df_subs = PrunedFlattener.for_table(self, "hotmart_subscriptions").frame(subs_raw)
         if not df_subs.empty:
             df_subs = self._convert_dates(df_subs)
 
@@ -247,7 +256,7 @@ class HotmartConnector(BaseConnector):
                 headers=self._auth_headers(), timeout=30,
             )
             resp.raise_for_status()
-            df_summary = pd.DataFrame([resp.json()])
+            df_summary = pd.DataFrame([decode_response(resp)])
         except Exception as e:
             logging.error(f"[Hotmart] Erro sales summary: {e}")
             df_summary = pd.DataFrame()
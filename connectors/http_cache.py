@@ -0,0 +1,97 @@
+import json
+import hashlib
+import logging
+from typing import Any, Optional
+
+import requests
+
+from connectors.instrumentation import span
+from connectors.state import StateStore
+
+
+def content_hash(items: Any) -> str:
+    """Hash estável do conteúdo decodificado (ignora ordem de chaves e espaços do JSON)."""
+    payload = json.dumps(items, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LookupCache:
+    """
+    Cache de endpoints de referência (estágios, tags, usuários...) que quase nunca mudam,
+    guardado no StateStore (chave `http_cache`) por tabela: ETag, Last-Modified, hash do
+    conteúdo e número de páginas.
+
+    O conector envia `headers(tabela)` na primeira requisição: com 304 (`not_modified`) não
+    baixa o resto; senão baixa tudo e `unchanged(...)` compara o hash com o anterior. Nos
+    dois casos a tabela não é reenviada ao MinIO/ClickHouse. Os validadores só vão na
+    requisição se a última resposta coube em uma página (304 da primeira página não garante
+    as seguintes). As entradas novas só persistem no `save()` do flow, após a carga.
+
+    Cada consulta gera um span `http_cache` (result: not_modified, unchanged ou changed),
+    que o exportador converte em `pipeline_http_cache_requests_total{provider,result}`.
+    """
+
+    KEY = "http_cache"
+
+    def __init__(self, state: StateStore, provider: str, refresh: bool = False):
+        self.state = state
+        self.provider = provider
+        self.refresh = refresh
+        self.skipped = set()
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, table_name: str) -> dict:
+        return (self.state.get(self.KEY) or {}).get(table_name, {})
+
+    def headers(self, table_name: str) -> dict:
+        entry = self.entry(table_name)
+        if self.refresh or entry.get("pages", 1) != 1:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _record(self, table_name: str, result: str):
+        hit = result != "changed"
+        if hit:
+            self.hits += 1
+            self.skipped.add(table_name)
+        else:
+            self.misses += 1
+        with span("http_cache", provider=self.provider, table_name=table_name, result=result):
+            pass
+        logging.info(f"[HttpCache] {self.provider}/{table_name}: {result}")
+
+    def not_modified(self, table_name: str, resp: requests.Response) -> bool:
+        """True se a API respondeu 304 aos validadores enviados (tabela sem mudança)."""
+        if resp.status_code != 304 or self.refresh or not self.entry(table_name):
+            return False
+        self._record(table_name, "not_modified")
+        return True
+
+    def unchanged(self, table_name: str, items: Any, resp: Optional[requests.Response] = None,
+                  pages: int = 1, keep: bool = False) -> bool:
+        """
+        Compara o conteúdo baixado com o da última carga e guarda a entrada nova (validadores
+        da resposta, hash, páginas). `keep=True` guarda também o conteúdo, para quem precisa
+        dele depois de um 304 (ex: mapa de estágios do HubSpot).
+        """
+        digest = content_hash(items)
+        same = not self.refresh and self.entry(table_name).get("hash") == digest
+
+        entry = {"hash": digest, "pages": pages}
+        if resp is not None:
+            entry.update(etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+        if keep:
+            entry["body"] = items
+        self.state.update(self.KEY, {table_name: entry})
+
+        self._record(table_name, "unchanged" if same else "changed")
+        return same
+
+    def body(self, table_name: str) -> Any:
+        return self.entry(table_name).get("body")
@@ -1,9 +1,12 @@
 import time
+import requests
 import pandas as pd
 import hubspot
 from hubspot.crm.deals import PublicObjectSearchRequest, Filter, FilterGroup
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from connectors.http_cache import LookupCache
+from connectors.json_codec import decode_response
 
 class HubSpotConnector:
     """
@@ -11,9 +14,13 @@ class HubSpotConnector:
     Implementa busca dinâmica de propriedades, mapeamento de deal stages e filtros de data.
     """
     
-    def __init__(self, access_token: str):
+    PIPELINES_URL = "https://api.hubapi.com/crm/v3/pipelines/deals"
+
+    def __init__(self, access_token: str, cache: Optional[LookupCache] = None):
         self.client = hubspot.Client.create(access_token=access_token)
+        self.access_token = access_token
         self.limit = 100
+        self.cache = cache
 
     def _get_all_properties(self, object_type: str) -> List[str]:
         """Busca todas as propriedades disponíveis para um objeto."""
@@ -24,10 +31,34 @@ class HubSpotConnector:
             print(f"Erro ao buscar propriedades de {object_type}: {e}")
             return []
 
+    def _cached_stage_mapping(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Mapeamento de stages via REST com If-None-Match/If-Modified-Since: com 304 reaproveita
+        o mapa guardado no LookupCache em vez de baixar os pipelines de novo.
+        """
+        headers = {"Authorization": f"Bearer {self.access_token}", **self.cache.headers("hubspot_pipelines")}
+        resp = requests.get(self.PIPELINES_URL, headers=headers, timeout=30)
+        resp.raise_for_status()
+        if self.cache.not_modified("hubspot_pipelines", resp) and self.cache.body("hubspot_pipelines"):
+            return self.cache.body("hubspot_pipelines")
+
+        stage_mapping = {}
+        for pipeline in decode_response(resp).get("results", []):
+            for stage in pipeline.get("stages", []):
+                stage_mapping[stage["id"]] = {
+                    'label': stage.get("label"),
+                    'pipeline_name': pipeline.get("label"),
+                    'probability': (stage.get("metadata") or {}).get("probability", 0)
+                }
+        self.cache.unchanged("hubspot_pipelines", stage_mapping, resp, keep=True)
+        return stage_mapping
+
     def _create_stage_mapping(self) -> Dict[str, Dict[str, Any]]:
         """Cria mapeamento de stage IDs para labels legíveis."""
         stage_mapping = {}
         try:
+            if self.cache is not None:
+                return self._cached_stage_mapping()
             pipelines = self.client.crm.pipelines.pipelines_api.get_all("deals")
             for pipeline in pipelines.results:
                 for stage in pipeline.stages:
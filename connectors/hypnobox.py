@@ -1,10 +1,12 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.token_cache import token_cache
+from connectors.json_codec import decode_response
 
 
 class HypnoboxConnector(BaseConnector):
@@ -28,24 +30,38 @@ class HypnoboxConnector(BaseConnector):
             self.base_url = f"https://{self.subdomain}.hypnobox.com.br"
         else:
             self.base_url = ""
-        self.token = None
 
-    def _authenticate(self):
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.base_url, self.login, self.password)
+
+    def _get_token(self) -> str:
+        return token_cache.get("hypnobox", self._auth_key, self._authenticate)
+
+    def _authenticate(self) -> str:
         url = f"{self.base_url}/api/auth"
         params = {"login": self.login, "password": self.password, "returnType": "json"}
         resp = requests.post(url, params=params, timeout=60)
         resp.raise_for_status()
         data = resp.json()
-        self.token = data.get("token") or data.get("Token")
         logging.info("[Hypnobox] Autenticado com sucesso.")
+        return data.get("token") or data.get("Token")
+
+    def _get(self, url: str, params: dict) -> requests.Response:
+        """GET com o token nos params; com 401 renova o token em cache e repete uma vez."""
+        return token_cache.retry_unauthorized(
+            "hypnobox", self._auth_key,
+            lambda: requests.get(url, headers={"Content-Type": "application/json"},
+                                 params={"token": self._get_token(), **params}, timeout=120),
+        )
 
     def _fetch_simple(self, path: str, data_key: str) -> list:
         url = f"{self.base_url}/{path}"
-        params = {"token": self.token, "returnType": "json"}
+        params = {"returnType": "json"}
         try:
-            resp = requests.get(url, headers={"Content-Type": "application/json"}, params=params, timeout=120)
+            resp = self._get(url, params)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             return data.get(data_key, []) if isinstance(data, dict) else data
         except Exception as e:
             logging.error(f"[Hypnobox] Erro {path}: {e}")
@@ -56,14 +72,14 @@ class HypnoboxConnector(BaseConnector):
         page = 1
         while True:
             url = f"{self.base_url}/{path}"
-            params = {"token": self.token, "pagina": page, "returnType": "json"}
+            params = {"pagina": page, "returnType": "json"}
             try:
-                resp = requests.get(url, headers={"Content-Type": "application/json"}, params=params, timeout=120)
+                resp = self._get(url, params)
                 resp.raise_for_status()
             except Exception as e:
                 logging.error(f"[Hypnobox] Erro {path} pagina={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get(data_key, []) if isinstance(data, dict) else data
             if not items:
                 break
@@ -82,20 +98,20 @@ class HypnoboxConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {t} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
             """ for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        if not self.token:
-            self._authenticate()
+        # Autentica (ou usa o token em cache) antes das requisições: erro de login falha a task
+        self._get_token()
         results = {}
         for table_name, cfg in self.ENDPOINTS.items():
             if cfg["paginated"]:
                 items = self._fetch_paginated(cfg["path"], cfg["data_key"])
             else:
                 items = self._fetch_simple(cfg["path"], cfg["data_key"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
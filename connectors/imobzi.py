@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class ImobziConnector(BaseConnector):
@@ -41,7 +42,7 @@ class ImobziConnector(BaseConnector):
             except Exception as e:
                 logging.error(f"[Imobzi] Erro {path}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             if data_field:
                 items = data.get(data_field, [])
             elif isinstance(data, list):
@@ -63,7 +64,7 @@ class ImobziConnector(BaseConnector):
         try:
             resp = requests.get(url, headers=self._headers(), timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             if data_field:
                 return data.get(data_field, [])
             elif isinstance(data, list):
@@ -74,12 +75,7 @@ class ImobziConnector(BaseConnector):
             return []
 
     def get_tables_ddl(self) -> list:
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String, data String,
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id
-            """ for t in self.ENDPOINTS]
+        return [blob_ddl(t) for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
@@ -88,5 +84,5 @@ class ImobziConnector(BaseConnector):
                 items = self._fetch_cursor(cfg["path"], cfg["data_field"])
             else:
                 items = self._fetch_simple(cfg["path"], cfg["data_field"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
@@ -0,0 +1,198 @@
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List
+
+METRICS_TABLE = "pipeline_run_metrics"
+
+METRICS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+        run_id String,
+        flow LowCardinality(String),
+        client LowCardinality(String),
+        stage LowCardinality(String),
+        table_name String,
+        status LowCardinality(String),
+        started_at DateTime64(3),
+        duration_ms Float64,
+        rows UInt64,
+        bytes UInt64,
+        attributes String,
+        recorded_at DateTime DEFAULT now()
+    ) ENGINE = MergeTree
+    ORDER BY (flow, client, stage, started_at)
+    TTL toDateTime(started_at) + INTERVAL 180 DAY
+"""
+
+# Atributos que viram colunas próprias; o restante vai para `attributes` (JSON)
+_COLUMN_ATTRS = ("flow", "client", "table_name", "rows", "bytes")
+
+_context = contextvars.ContextVar("pipeline_instrumentation_context", default={})
+_active = {}
+_active_lock = threading.Lock()
+_finished = deque(maxlen=50_000)
+_finished_lock = threading.Lock()
+_listeners: List[Callable[["Span"], None]] = []
+_ddl_ready = False
+
+
+class Span:
+    """Trecho medido do pipeline (ex: uma página extraída, um upload S3)."""
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+        self.thread_id = threading.get_native_id()
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set(self, **attrs):
+        """Adiciona atributos conhecidos só ao fim do trecho (rows, bytes...)."""
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+
+_PROCESS_RUN_ID = str(uuid.uuid4())
+
+
+def _run_id() -> str:
+    try:
+        from prefect.runtime import flow_run
+        if flow_run.id:
+            return str(flow_run.id)
+    except Exception:
+        pass
+    return _PROCESS_RUN_ID
+
+
+@contextmanager
+def bind(**attrs):
+    """
+    Define atributos de contexto (flow, client, table_name...) herdados por todos
+    os spans abertos dentro do bloco, inclusive em funções chamadas mais abaixo.
+    """
+    token = _context.set({**_context.get(), **attrs})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context() -> dict:
+    return dict(_context.get())
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Mede a duração de um trecho e registra o resultado:
+
+        with span("s3_upload", table_name=table) as s:
+            ...
+            s.set(bytes=size)
+    """
+    s = Span(name, {**_context.get(), **attrs})
+    key = id(s)
+    with _active_lock:
+        _active[key] = s
+    try:
+        yield s
+    except BaseException:
+        s.status = "error"
+        raise
+    finally:
+        s.finish()
+        with _active_lock:
+            _active.pop(key, None)
+        with _finished_lock:
+            _finished.append(s)
+        for listener in list(_listeners):
+            try:
+                listener(s)
+            except Exception as e:
+                logging.debug(f"[Instrumentation] listener falhou: {e}")
+
+
+def active_spans() -> list:
+    """Spans em andamento (em qualquer thread), do mais antigo para o mais recente."""
+    with _active_lock:
+        return sorted(_active.values(), key=lambda s: s._start)
+
+
+def add_listener(listener: Callable[[Span], None]):
+    """Registra um callback chamado a cada span finalizado (ex: exportador Prometheus)."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[Span], None]):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def drain() -> list:
+    """Retira e retorna os spans finalizados ainda não persistidos."""
+    with _finished_lock:
+        spans = list(_finished)
+        _finished.clear()
+    return spans
+
+
+def _to_row(s: Span, run_id: str) -> list:
+    extra = {k: v for k, v in s.attrs.items() if k not in _COLUMN_ATTRS}
+    return [
+        run_id,
+        str(s.attrs.get("flow", "")),
+        str(s.attrs.get("client", "")),
+        s.name,
+        str(s.attrs.get("table_name", "")),
+        s.status,
+        s.started_at,
+        round(s.duration_ms, 3),
+        int(s.attrs.get("rows") or 0),
+        int(s.attrs.get("bytes") or 0),
+        json.dumps(extra, default=str),
+    ]
+
+
+def flush(ch=None) -> int:
+    """
+    Persiste os spans finalizados na tabela pipeline_run_metrics do ClickHouse.
+    Falhas são apenas logadas: métricas nunca devem derrubar uma carga.
+    """
+    global _ddl_ready
+    spans = drain()
+    if not spans:
+        return 0
+
+    try:
+        if ch is None:
+            from connectors.clickhouse_client import ClickHouseClient
+            ch = ClickHouseClient()
+        if not _ddl_ready:
+            ch.run_ddl([METRICS_DDL])
+            _ddl_ready = True
+        run_id = _run_id()
+        ch.client.insert(
+            METRICS_TABLE,
+            [_to_row(s, run_id) for s in spans],
+            column_names=[
+                "run_id", "flow", "client", "stage", "table_name", "status",
+                "started_at", "duration_ms", "rows", "bytes", "attributes",
+            ],
+        )
+        logging.info(f"[Instrumentation] {len(spans)} spans gravados em {METRICS_TABLE}")
+        return len(spans)
+    except Exception as e:
+        logging.warning(f"[Instrumentation] Falha ao gravar métricas: {e}")
+        return 0
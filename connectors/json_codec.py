@@ -0,0 +1,191 @@
+import os
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Ordem de preferência dos decoders; JSON_BACKEND (env) força um deles para comparação
+BACKENDS = ("orjson", "msgspec", "json")
+
+# Registros por lote ao converter respostas em stream para DataFrames (extract_iter)
+STREAM_BATCH_SIZE = 5000
+
+
+def _available(name: str) -> bool:
+    return {"orjson": orjson, "msgspec": msgspec, "json": json}.get(name) is not None
+
+
+def _select_backend() -> str:
+    forced = os.getenv("JSON_BACKEND")
+    if forced:
+        if _available(forced):
+            return forced
+        logging.warning(f"[JSON] Backend {forced} indisponível; usando o padrão")
+    return next(name for name in BACKENDS if _available(name))
+
+
+BACKEND = _select_backend()
+
+
+def loads(data, backend: str = None) -> Any:
+    """Decodifica bytes/str JSON com o backend mais rápido disponível."""
+    backend = backend or BACKEND
+    if backend == "orjson":
+        return orjson.loads(data)
+    if backend == "msgspec":
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def decode_response(resp: requests.Response, backend: str = None) -> Any:
+    """
+    Substituto de `resp.json()` para páginas grandes: decodifica os bytes do corpo direto
+    (sem passar por str) com orjson/msgspec. Se o corpo não for UTF-8 ou o backend rápido
+    recusar o conteúdo, cai para `resp.json()`, preservando a exceção original do requests
+    (requests.exceptions.JSONDecodeError, subclasse de ValueError e RequestException).
+    """
+    backend = backend or BACKEND
+    if backend != "json":
+        try:
+            return loads(resp.content, backend)
+        except Exception:
+            pass
+    return resp.json()
+
+
+@lru_cache(maxsize=64)
+def _columnar_decoder(fields: tuple, list_key: Optional[str]):
+    """Decoder msgspec tipado (compilado uma vez por combinação de campos)."""
+    safe = [f"f{i}" for i in range(len(fields))]
+    record = msgspec.defstruct(
+        "Record", [(name, Any, None) for name in safe],
+        rename=dict(zip(safe, fields)),
+    )
+    if list_key:
+        envelope = msgspec.defstruct("Envelope", [("items", List[record], [])], rename={"items": list_key})
+        return msgspec.json.Decoder(envelope), safe
+    return msgspec.json.Decoder(List[record]), safe
+
+
+def decode_columns(data, fields: Sequence[str], list_key: Optional[str] = None) -> Dict[str, List[Any]]:
+    """
+    Decodifica uma página direto em colunas ({campo: [valores]}) mantendo só `fields`,
+    pronto para `pd.DataFrame(colunas)`. Com msgspec o parser já descarta os campos não
+    pedidos (menos objetos Python criados); sem ele, decodifica e projeta.
+    `list_key` é a chave da lista de registros no envelope (ex: "data", "value").
+    """
+    fields = tuple(fields)
+    if msgspec is not None:
+        decoder, safe = _columnar_decoder(fields, list_key)
+        decoded = decoder.decode(data)
+        records = decoded.items if list_key else decoded
+        return {field: [getattr(r, name) for r in records] for field, name in zip(fields, safe)}
+
+    payload = loads(data)
+    records = payload.get(list_key, []) if list_key else payload
+    return {field: [r.get(field) for r in records] for field in fields}
+
+
+def _records_from_document(doc, paths: Sequence[str], wrap_object: bool) -> Iterator[dict]:
+    """Mesma seleção de stream_records, sobre um documento já decodificado (fallback sem ijson)."""
+    for path in paths:
+        parts = path.split(".")
+        is_array = parts[-1] == "item"
+        node = doc
+        for part in (parts[:-1] if is_array else parts):
+            if not isinstance(node, dict) or part not in node:
+                node = None
+                break
+            node = node[part]
+        if is_array and isinstance(node, list):
+            yield from (r for r in node if isinstance(r, dict))
+            return
+        if not is_array and isinstance(node, dict) and node is not doc:
+            yield node
+            return
+    if wrap_object and isinstance(doc, dict):
+        yield doc
+
+
+def _records_from_events(events, paths: Sequence[str], wrap_object: bool) -> Iterator[dict]:
+    """
+    Monta e devolve cada objeto encontrado em um dos `paths` (prefixos ijson) assim que
+    ele termina de chegar. Só o primeiro caminho que aparece no documento é usado.
+    """
+    paths = set(paths)
+    active = None
+    builder, depth = None, 0
+    top = ijson.ObjectBuilder() if wrap_object else None
+
+    for prefix, event, value in events:
+        if builder is not None:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    yield builder.value
+                    builder = None
+            continue
+
+        if event == "start_map" and prefix in paths and active in (None, prefix):
+            active = prefix
+            builder, depth = ijson.ObjectBuilder(), 1
+            builder.event(event, value)
+            continue
+        if top is not None and active is None:
+            top.event(event, value)
+
+    if active is None and top is not None and isinstance(getattr(top, "value", None), dict):
+        yield top.value
+
+
+def stream_records(resp: requests.Response, paths: Sequence[str], wrap_object: bool = False) -> Iterator[dict]:
+    """
+    Lê o corpo de uma resposta pedida com `stream=True` de forma incremental (ijson),
+    devolvendo cada registro conforme é decodificado, sem carregar o corpo inteiro em memória.
+
+    - paths: onde estão os registros, em prefixos ijson (vale o primeiro que existir):
+      "item" (lista no topo), "data.item" (lista em data), "Content.list" (objeto único)...
+    - wrap_object: se nenhum caminho existir e o topo for um objeto, devolve o próprio objeto
+
+    Sem ijson instalado, decodifica o corpo inteiro e aplica a mesma seleção.
+    """
+    try:
+        if ijson is None:
+            yield from _records_from_document(decode_response(resp), paths, wrap_object)
+            return
+        resp.raw.decode_content = True  # descompacta gzip/deflate ao ler do socket
+        yield from _records_from_events(ijson.parse(resp.raw, use_float=True), paths, wrap_object)
+    finally:
+        resp.close()
+
+
+def batched(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """Agrupa registros em listas de até `size` itens (lotes para extract_iter)."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -4,6 +4,7 @@ from datetime import datetime
 import logging
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class Leads2bConnector(BaseConnector):
     def __init__(self, token: str = None):
@@ -39,7 +40,7 @@ class Leads2bConnector(BaseConnector):
                 break
                 
             response.raise_for_status()
-            data = response.json()
+            data = decode_response(response)
             
             # O Leads2b costuma retornar uma lista diretamente ou em uma chave com o nome do recurso
             items = data.get("data", []) if isinstance(data, dict) else []
@@ -68,7 +69,7 @@ class Leads2bConnector(BaseConnector):
                 id String,
                 name String,
                 email String,
-                status String,
+                status LowCardinality(String),
                 funnel_stage String,
                 source String,
                 created_at DateTime,
@@ -83,7 +84,7 @@ class Leads2bConnector(BaseConnector):
                 lead_id String,
                 title String,
                 value Float64,
-                status String,
+                status LowCardinality(String),
                 created_at DateTime,
                 updated_at DateTime,
                 ingestion_at DateTime DEFAULT now()
@@ -1,10 +1,12 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.token_cache import token_cache
+from connectors.json_codec import decode_response
 
 
 class LearnWordsConnector(BaseConnector):
@@ -29,18 +31,31 @@ class LearnWordsConnector(BaseConnector):
         self.base_url = (base_url or settings.learn_words_base_url or "").rstrip("/")
         self.client_id = client_id or settings.learn_words_client_id
         self.client_secret = client_secret or settings.learn_words_client_secret
-        self.token = None
 
-    def _authenticate(self):
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.base_url, self.client_id, self.client_secret)
+
+    def _get_token(self) -> str:
+        return token_cache.get("learn_words", self._auth_key, self._authenticate)
+
+    def _authenticate(self) -> tuple:
         url = f"{self.base_url}/oauth2/access_token"
         payload = {"grant_type": "client_credentials", "client_id": self.client_id, "client_secret": self.client_secret}
         resp = requests.post(url, data=payload, timeout=60)
         resp.raise_for_status()
-        self.token = resp.json().get("access_token")
+        data = resp.json()
         logging.info("[LearnWords] Autenticado via OAuth2.")
+        return data.get("access_token"), data.get("expires_in")
 
     def _headers(self):
-        return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+        return {"Authorization": f"Bearer {self._get_token()}", "Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET autenticado; com 401 renova o token em cache e repete uma vez."""
+        return token_cache.retry_unauthorized(
+            "learn_words", self._auth_key, lambda: requests.get(url, headers=self._headers(), **kwargs)
+        )
 
     def _fetch_paginated(self, endpoint: str) -> list:
         all_items = []
@@ -49,12 +64,12 @@ class LearnWordsConnector(BaseConnector):
             url = f"{self.base_url}/{endpoint}"
             params = {"items_per_page": 200, "page": page}
             try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
+                resp = self._get(url, params=params, timeout=120)
                 resp.raise_for_status()
             except Exception as e:
                 logging.error(f"[LearnWords] Erro {endpoint} page={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", data) if isinstance(data, dict) else data
             if not isinstance(items, list) or not items:
                 break
@@ -70,9 +85,9 @@ class LearnWordsConnector(BaseConnector):
 
     def _fetch_simple(self, url: str) -> list:
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=60)
+            resp = self._get(url, timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             if isinstance(data, list):
                 return data
             elif isinstance(data, dict):
@@ -104,24 +119,19 @@ class LearnWordsConnector(BaseConnector):
 
     def get_tables_ddl(self) -> list:
         tables = list(self.ENDPOINTS.keys()) + list(self.DEPENDENT_ENDPOINTS.keys())
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String, data String,
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id
-            """ for t in tables]
+        return [blob_ddl(t) for t in tables]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        if not self.token:
-            self._authenticate()
+        # Autentica (ou usa o token em cache) antes das requisições: erro de login falha a task
+        self._get_token()
         results = {}
         parent_data = {}
         for table_name, endpoint in self.ENDPOINTS.items():
             items = self._fetch_paginated(endpoint)
             parent_data[table_name] = items
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         for table_name, cfg in self.DEPENDENT_ENDPOINTS.items():
             parent_items = parent_data.get(cfg["parent"], [])
             items = self._fetch_dependent(parent_items, cfg["endpoint"], cfg["id_field"], cfg["paginated"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
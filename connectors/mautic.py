@@ -1,10 +1,12 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.token_cache import token_cache
+from connectors.json_codec import decode_response
 
 
 class MauticConnector(BaseConnector):
@@ -20,9 +22,15 @@ class MauticConnector(BaseConnector):
         self.base_url = (base_url or settings.mautic_base_url or "").rstrip("/")
         self.client_id = client_id or settings.mautic_client_id
         self.client_secret = client_secret or settings.mautic_client_secret
-        self.token = None
 
-    def _authenticate(self):
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.base_url, self.client_id, self.client_secret)
+
+    def _get_token(self) -> str:
+        return token_cache.get("mautic", self._auth_key, self._authenticate)
+
+    def _authenticate(self) -> tuple:
         url = f"{self.base_url}/oauth/v2/token"
         payload = {
             "grant_type": "client_credentials",
@@ -31,11 +39,18 @@ class MauticConnector(BaseConnector):
         }
         resp = requests.post(url, data=payload, timeout=60)
         resp.raise_for_status()
-        self.token = resp.json().get("access_token")
+        data = resp.json()
         logging.info("[Mautic] Autenticado via OAuth2.")
+        return data.get("access_token"), data.get("expires_in")
 
     def _headers(self):
-        return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
+        return {"Authorization": f"Bearer {self._get_token()}", "Content-Type": "application/json"}
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET autenticado; com 401 renova o token em cache e repete uma vez."""
+        return token_cache.retry_unauthorized(
+            "mautic", self._auth_key, lambda: requests.get(url, headers=self._headers(), **kwargs)
+        )
 
     def _fetch_paginated(self, path: str, data_key: str, dict_to_list: bool) -> list:
         all_items = []
@@ -45,12 +60,12 @@ class MauticConnector(BaseConnector):
             url = f"{self.base_url}/{path}"
             params = {"start": start, "limit": limit, "orderBy": "id"}
             try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=120)
+                resp = self._get(url, params=params, timeout=120)
                 resp.raise_for_status()
             except Exception as e:
                 logging.error(f"[Mautic] Erro {path} start={start}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get(data_key, {})
             if dict_to_list and isinstance(items, dict):
                 items = list(items.values())
@@ -70,9 +85,9 @@ class MauticConnector(BaseConnector):
     def _fetch_simple(self, path: str, data_key: str, dict_to_list: bool) -> list:
         url = f"{self.base_url}/{path}"
         try:
-            resp = requests.get(url, headers=self._headers(), timeout=60)
+            resp = self._get(url, timeout=60)
             resp.raise_for_status()
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get(data_key, {})
             if dict_to_list and isinstance(items, dict):
                 items = list(items.values())
@@ -85,18 +100,18 @@ class MauticConnector(BaseConnector):
         return [f"""
             CREATE TABLE IF NOT EXISTS {t} (
                 id String, data String,
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
+                project_id LowCardinality(String) DEFAULT '', updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id
             """ for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        if not self.token:
-            self._authenticate()
+        # Autentica (ou usa o token em cache) antes das requisições: erro de login falha a task
+        self._get_token()
         results = {}
         for table_name, cfg in self.ENDPOINTS.items():
             if cfg["paginated"]:
                 items = self._fetch_paginated(cfg["path"], cfg["data_key"], cfg["dict_to_list"])
             else:
                 items = self._fetch_simple(cfg["path"], cfg["data_key"], cfg["dict_to_list"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
@@ -34,9 +34,9 @@ class MetaAdsConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS meta_campaigns (
                 id String,
                 name String,
-                status String,
+                status LowCardinality(String),
                 objective String,
-                account_id String,
+                account_id LowCardinality(String),
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -53,7 +53,7 @@ class MetaAdsConnector(BaseConnector):
                 ctr Float64,
                 cpc Float64,
                 cpm Float64,
-                account_id String,
+                account_id LowCardinality(String),
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY (ad_id, date_start)
@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class MoskitConnector(BaseConnector):
@@ -48,7 +49,7 @@ class MoskitConnector(BaseConnector):
             except Exception as e:
                 logging.error(f"[Moskit] Erro {endpoint}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data if isinstance(data, list) else data.get("data", [])
             if not items:
                 break
@@ -72,7 +73,7 @@ class MoskitConnector(BaseConnector):
             try:
                 resp = requests.get(url, headers=self._headers(), timeout=60)
                 resp.raise_for_status()
-                data = resp.json()
+                data = decode_response(resp)
                 items = data if isinstance(data, list) else data.get("data", [])
                 for i in items:
                     i["deal_id"] = parent_id
@@ -85,12 +86,7 @@ class MoskitConnector(BaseConnector):
 
     def get_tables_ddl(self) -> list:
         tables = list(self.ENDPOINTS.keys()) + list(self.DEPENDENT_ENDPOINTS.keys())
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String, data String,
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id
-            """ for t in tables]
+        return [blob_ddl(t) for t in tables]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
@@ -98,9 +94,9 @@ class MoskitConnector(BaseConnector):
         for table_name, endpoint in self.ENDPOINTS.items():
             items = self._fetch_cursor(endpoint)
             parent_data[table_name] = items
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         for table_name, cfg in self.DEPENDENT_ENDPOINTS.items():
             parent_items = parent_data.get(cfg["parent"], [])
             items = self._fetch_dependent(parent_items, cfg["endpoint"], cfg["id_field"])
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
@@ -4,7 +4,9 @@ import logging
 import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.json_codec import stream_records, batched, STREAM_BATCH_SIZE
 
 class NativeConnector(BaseConnector):
     def __init__(self, api_url=None, username=None, password=None, report_ids=None):
@@ -24,48 +26,77 @@ class NativeConnector(BaseConnector):
     def _headers(self):
         return {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
 
-    def _fetch_report(self, report_id):
+    def _iter_report(self, report_id):
+        """
+        Registros do report conforme o corpo chega (stream), sem carregar o JSON inteiro. Falha
+        na requisição é logada e pula o report; falha no meio do stream é relançada.
+        """
         url = f"{self.api_url}/api/apiReport/{report_id}"
-        resp = requests.get(url, headers=self._headers(), timeout=120)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("data", data) if isinstance(data, dict) else data
+        resp = None
+        try:
+            resp = requests.get(url, headers=self._headers(), timeout=120, stream=True)
+            resp.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"[Native] Erro no report {report_id}: {e}")
+            if resp is not None:
+                resp.close()
+            return
+        try:
+            for item in stream_records(resp, ("item", "data.item"), wrap_object=True):
+                item["report_id"] = report_id
+                yield item
+        finally:
+            resp.close()
+
+    def _report_ids(self):
+        return [rid.strip() for rid in self.report_ids.split(",") if rid.strip()]
 
     def get_tables_ddl(self):
+        # Um registro por linha (id + JSON em data), agrupado pelo report de origem
         return [
             """
             CREATE TABLE IF NOT EXISTS native_reports (
+                id String,
                 report_id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
-            ORDER BY report_id
+            ORDER BY (report_id, id)
             """
         ]
 
+    @staticmethod
+    def _pack(report_id, items: list) -> pd.DataFrame:
+        df = pack_records(items)
+        if not df.empty:
+            df["report_id"] = str(report_id)
+        return df
+
     def extract(self, date_start, date_stop):
         if not self.token:
             self._authenticate()
 
-        ids = [rid.strip() for rid in self.report_ids.split(",") if rid.strip()]
-        all_rows = []
+        frames = []
 
-        for rid in ids:
+        for rid in self._report_ids():
             try:
-                items = self._fetch_report(rid)
-                if isinstance(items, list):
-                    for item in items:
-                        if isinstance(item, dict):
-                            item["report_id"] = rid
-                    all_rows.extend(items)
-                elif isinstance(items, dict):
-                    items["report_id"] = rid
-                    all_rows.append(items)
-                logging.info(f"[Native] Report {rid}: {len(items) if isinstance(items, list) else 1} registros")
+                items = list(self._iter_report(rid))
+                frames.append(self._pack(rid, items))
+                logging.info(f"[Native] Report {rid}: {len(items)} registros")
             except Exception as e:
                 logging.error(f"[Native] Erro no report {rid}: {e}")
             time.sleep(0.5)
 
-        df = pd.DataFrame(all_rows) if all_rows else pd.DataFrame()
-        return {"native_reports": df}
+        frames = [df for df in frames if not df.empty]
+        return {"native_reports": pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()}
+
+    def extract_iter(self, date_start, date_stop):
+        """Emite lotes de cada report enquanto o download ainda está em andamento."""
+        if not self.token:
+            self._authenticate()
+
+        for rid in self._report_ids():
+            for batch in batched(self._iter_report(rid), STREAM_BATCH_SIZE):
+                yield "native_reports", self._pack(rid, batch)
+            time.sleep(0.5)
@@ -1,19 +1,58 @@
+import time
 import requests
 import pandas as pd
 from datetime import datetime
 import logging
+from requests.adapters import HTTPAdapter
 from connectors.base import BaseConnector
+from connectors.concurrency import ordered_map
+from connectors.instrumentation import span
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class OmieConnector(BaseConnector):
-    def __init__(self, app_key: str = None, app_secret: str = None):
+    """
+    Conector Omie (ERP). Auth: app_key/app_secret no corpo. API JSON-RPC (POST por `call`).
+    Paginação por número de página: a primeira resposta traz `total_de_paginas` e as demais
+    páginas são buscadas em paralelo. Com `watermarks` (tabela -> data da última carga
+    completa) a extração é incremental (`filtrar_por_data_de` + `filtrar_apenas_alteracao`);
+    com `backfill` (date_start informado pelo usuário) começa em min(watermark, date_start).
+    """
+
+    REQUEST_TIMEOUT = 120
+    MAX_RETRIES = 3
+    RECORDS_PER_PAGE = 500
+
+    # Chave da lista de registros na resposta de cada call
+    RECORD_KEYS = {
+        "ListarClientes": "clientes_cadastro",
+        "ListarPedidos": "pedido_venda_produto",
+    }
+
+    def __init__(self, app_key: str = None, app_secret: str = None, max_workers: int = None,
+                 watermarks: dict = None, backfill: bool = False):
         self.base_url = "https://app.omie.com.br/api/v1"
         self.app_key = app_key or settings.omie_app_key
         self.app_secret = app_secret or settings.omie_app_secret
+        self.max_workers = max_workers or settings.omie_max_workers
+        self.watermarks = dict(watermarks or {})
+        self.backfill = backfill
+        # Tabelas extraídas por completo nesta execução -> nova watermark (salva pelo flow)
+        self.completed = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _is_empty_page(response) -> bool:
+        # Página sem registros vem como HTTP 500 com faultcode "...-5113"
+        return response.status_code == 500 and ("5113" in response.text or "Não existem registros" in response.text)
 
     def _call_api(self, endpoint, call, param=None):
         """
-        Executa uma chamada POST para a API do Omie.
+        Executa uma chamada POST para a API do Omie (conexão reaproveitada, com timeout).
+        Limite de consumo (429/425) e falhas 5xx são repetidos com espera crescente.
         """
         if param is None:
             param = [{}]
@@ -26,54 +65,75 @@ class OmieConnector(BaseConnector):
         }
         
         url = f"{self.base_url}/{endpoint.strip('/')}/"
-        response = requests.post(url, json=payload)
-        
-        if response.status_code != 200:
-            logging.error(f"Omie API Error: {response.status_code} - {response.text}")
-            response.raise_for_status()
-            
-        return response.json()
+        for attempt in range(self.MAX_RETRIES + 1):
+            response = self.session.post(url, json=payload, timeout=self.REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return decode_response(response)
+            if self._is_empty_page(response):
+                return {}
+            if attempt < self.MAX_RETRIES and (response.status_code in (425, 429) or response.status_code >= 500):
+                wait = 2 ** attempt
+                logging.warning(f"Omie API {call}: HTTP {response.status_code}, nova tentativa em {wait}s")
+                with span("rate_limit_wait", provider="omie"):
+                    time.sleep(wait)
+                continue
+            break
+
+        logging.error(f"Omie API Error: {response.status_code} - {response.text}")
+        response.raise_for_status()
+        return {}
+
+    def _records(self, call: str, data: dict) -> list:
+        key = self.RECORD_KEYS.get(call)
+        if key in data:
+            return data[key] or []
+        # Calls sem chave conhecida: primeira lista da resposta
+        for name, value in data.items():
+            if isinstance(value, list) and name != "param":
+                return value
+        return []
+
+    def _fetch_page(self, endpoint, call, page, filter_params=None) -> dict:
+        param = {
+            "pagina": page,
+            "registros_por_pagina": self.RECORDS_PER_PAGE,
+            "apenas_importado_api": "N"
+        }
+        if filter_params:
+            param.update(filter_params)
+
+        with span("extract_page", provider="omie", endpoint=call, page=page) as s:
+            try:
+                data = self._call_api(endpoint, call, param=[param])
+            except Exception:
+                s.status = "error"
+                raise
+            s.set(rows=len(self._records(call, data)))
+        return data
+
+    def _iter_pages(self, endpoint, call, filter_params=None):
+        """
+        Gera os registros de cada página, em ordem. A primeira página informa
+        `total_de_paginas`; as seguintes são buscadas em paralelo (max_workers),
+        sem limite fixo de páginas.
+        """
+        first = self._fetch_page(endpoint, call, 1, filter_params)
+        total_pages = int(first.get("total_de_paginas") or 1)
+        yield self._records(call, first)
+
+        def fetch(page):
+            return self._records(call, self._fetch_page(endpoint, call, page, filter_params))
+
+        yield from ordered_map(fetch, range(2, total_pages + 1), self.max_workers, name="omie")
+        logging.info(f"[Omie] {call}: {total_pages} paginas (total de registros: {first.get('total_de_registros')})")
 
     def _fetch_paginated(self, endpoint, call, filter_params=None):
         """
-        Busca dados de forma paginada para o Omie.
+        Busca todas as páginas de um call do Omie.
         """
         all_items = []
-        page = 1
-        records_per_page = 100
-        
-        while True:
-            param = {
-                "pagina": page,
-                "registros_por_pagina": records_per_page,
-                "apenas_importado_api": "N"
-            }
-            if filter_params:
-                param.update(filter_params)
-                
-            data = self._call_api(endpoint, call, param=[param])
-            
-            # A API do Omie retorna os itens em uma chave específica dependendo do call
-            # Ex: ListarClientes -> clientes_cadastro
-            # Vamos tentar inferir ou usar chaves comuns
-            items = []
-            for key in data.keys():
-                if isinstance(data[key], list) and key != "param":
-                    items = data[key]
-                    break
-            
-            if not items:
-                break
-                
+        for items in self._iter_pages(endpoint, call, filter_params):
             all_items.extend(items)
-            
-            if page >= data.get("total_de_paginas", 0):
-                break
-                
-            page += 1
-            if page > 500: # Safety break
-                break
-                
         return all_items
 
     def get_tables_ddl(self) -> list:
@@ -113,56 +173,85 @@ class OmieConnector(BaseConnector):
             """
         ]
 
-    def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        logging.info(f"Omie: Extraindo dados desde {date_start.date()}")
-        
-        # Filtros por data costumam ser via param no Omie
-        # Ex: "filtrar_por_data_de": "2023-01-01"
-        filter_params = {
+    @staticmethod
+    def _map_cliente(c: dict) -> dict:
+        return {
+            "codigo_cliente_omie": c.get("codigo_cliente_omie"),
+            "codigo_cliente_integracao": c.get("codigo_cliente_integracao"),
+            "razao_social": c.get("razao_social"),
+            "nome_fantasia": c.get("nome_fantasia"),
+            "cnpj_cpf": c.get("cnpj_cpf"),
+            "email": c.get("email"),
+            "telefone1_ddd": c.get("telefone1_ddd"),
+            "telefone1_numero": c.get("telefone1_numero"),
+            "contato": c.get("contato"),
+            "endereco": c.get("endereco"),
+            "bairro": c.get("bairro"),
+            "cidade": c.get("cidade"),
+            "estado": c.get("estado"),
+            "cep": c.get("cep")
+        }
+
+    @staticmethod
+    def _map_pedido(p: dict) -> dict:
+        cabecalho = p.get("cabecalho", {})
+        total = p.get("total_pedido", {})
+        return {
+            "numero_pedido": cabecalho.get("numero_pedido"),
+            "codigo_pedido_omie": cabecalho.get("codigo_pedido_omie"),
+            "codigo_cliente": cabecalho.get("codigo_cliente"),
+            "data_previsao": cabecalho.get("data_previsao"),
+            "etapa": cabecalho.get("etapa"),
+            "valor_total": float(total.get("valor_total_pedido", 0)),
+            "status_pedido": p.get("infoCadastro", {}).get("cancelado") == "S" and "Cancelado" or "Ativo"
+        }
+
+    def _tables(self, date_start: datetime, date_stop: datetime):
+        """(tabela, endpoint, call, filtros, mapeamento) de cada extração."""
+        ate = date_stop.strftime("%d/%m/%Y")
+
+        def incremental(table):
+            since = self.watermarks.get(table)
+            if not since:
+                return None
+            since = datetime.strptime(since, "%Y-%m-%d")
+            if self.backfill and date_start < since:
+                since = date_start
+            elif since > date_stop:
+                logging.warning(f"Omie: watermark de {table} ({since.date()}) depois de date_stop; usando date_start")
+                since = date_start
+            elif since > date_start:
+                logging.info(f"Omie: {table} a partir da watermark {since.date()} (date_start {date_start.date()} ignorado)")
+            # Filtro por data é inclusivo: o dia da watermark é relido e deduplicado no ReplacingMergeTree
+            return {
+                "filtrar_por_data_de": since.strftime("%d/%m/%Y"),
+                "filtrar_por_data_ate": ate,
+                "filtrar_apenas_alteracao": "S",
+            }
+
+        # Clientes: carga completa na primeira execução, depois só os alterados
+        yield "omie_clientes", "geral/clientes", "ListarClientes", incremental("omie_clientes"), self._map_cliente
+        pedidos_filter = incremental("omie_pedidos") or {
             "filtrar_por_data_de": date_start.strftime("%d/%m/%Y"),
-            "filtrar_por_data_ate": date_stop.strftime("%d/%m/%Y")
+            "filtrar_por_data_ate": ate,
         }
+        yield "omie_pedidos", "produtos/pedido", "ListarPedidos", pedidos_filter, self._map_pedido
 
-        # 1. Clientes
-        # Nota: ListarClientes pode não aceitar filtro de data da mesma forma, 
-        # mas muitas vezes queremos todos ou os alterados.
-        raw_clientes = self._fetch_paginated("geral/clientes", "ListarClientes")
-        clientes = []
-        for c in raw_clientes:
-            clientes.append({
-                "codigo_cliente_omie": c.get("codigo_cliente_omie"),
-                "codigo_cliente_integracao": c.get("codigo_cliente_integracao"),
-                "razao_social": c.get("razao_social"),
-                "nome_fantasia": c.get("nome_fantasia"),
-                "cnpj_cpf": c.get("cnpj_cpf"),
-                "email": c.get("email"),
-                "telefone1_ddd": c.get("telefone1_ddd"),
-                "telefone1_numero": c.get("telefone1_numero"),
-                "contato": c.get("contato"),
-                "endereco": c.get("endereco"),
-                "bairro": c.get("bairro"),
-                "cidade": c.get("cidade"),
-                "estado": c.get("estado"),
-                "cep": c.get("cep")
-            })
-
-        # 2. Pedidos de Venda
-        raw_pedidos = self._fetch_paginated("produtos/pedido", "ListarPedidosVenda", filter_params)
-        pedidos = []
-        for p in raw_pedidos:
-            cabecalho = p.get("cabecalho", {})
-            total = p.get("total_pedido", {})
-            pedidos.append({
-                "numero_pedido": cabecalho.get("numero_pedido"),
-                "codigo_pedido_omie": cabecalho.get("codigo_pedido_omie"),
-                "codigo_cliente": cabecalho.get("codigo_cliente"),
-                "data_previsao": cabecalho.get("data_previsao"),
-                "etapa": cabecalho.get("etapa"),
-                "valor_total": float(total.get("valor_total_pedido", 0)),
-                "status_pedido": p.get("infoCadastro", {}).get("cancelado") == "S" and "Cancelado" or "Ativo"
-            })
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        """Um lote por página, em ordem, enquanto as páginas seguintes ainda estão sendo baixadas."""
+        logging.info(f"Omie: Extraindo dados desde {date_start.date()} (watermarks: {self.watermarks or 'nenhuma'})")
+        for table_name, endpoint, call, filters, mapper in self._tables(date_start, date_stop):
+            for items in self._iter_pages(endpoint, call, filters):
+                if items:
+                    yield table_name, pd.DataFrame([mapper(item) for item in items])
+            # Backfill de uma janela antiga não faz a watermark voltar
+            self.completed[table_name] = max(date_stop.strftime("%Y-%m-%d"), self.watermarks.get(table_name, ""))
 
+    def extract(self, date_start: datetime, date_stop: datetime) -> dict:
+        frames = {}
+        for table_name, df in self.extract_iter(date_start, date_stop):
+            frames.setdefault(table_name, []).append(df)
         return {
-            "omie_clientes": pd.DataFrame(clientes),
-            "omie_pedidos": pd.DataFrame(pedidos)
+            table_name: pd.concat(frames[table_name], ignore_index=True) if table_name in frames else pd.DataFrame()
+            for table_name, *_ in self._tables(date_start, date_stop)
         }
@@ -4,7 +4,9 @@ from datetime import datetime
 import logging
 import base64
 from connectors.base import BaseConnector
+from connectors.token_cache import token_cache
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class PayTourConnector(BaseConnector):
     def __init__(self, email: str = None, password: str = None, loja_id: int = None, app_key: str = None, app_secret: str = None):
@@ -14,8 +16,15 @@ class PayTourConnector(BaseConnector):
         self.loja_id = loja_id or settings.paytour_loja_id
         self.app_key = app_key or settings.paytour_app_key
         self.app_secret = app_secret or settings.paytour_app_secret
-        self.access_token = None
-        self._authenticate()
+
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.app_key, self.app_secret, self.email, self.password, self.loja_id)
+
+    @property
+    def access_token(self) -> str:
+        # Login só na primeira requisição (create_tables instancia sem credenciais)
+        return token_cache.get("paytour", self._auth_key, self._authenticate)
 
     def _authenticate(self):
         """
@@ -39,8 +48,8 @@ class PayTourConnector(BaseConnector):
         response = requests.post(url, headers=headers)
         response.raise_for_status()
         data = response.json()
-        self.access_token = data.get("access_token")
         logging.info("PayTour: Autenticado com sucesso.")
+        return data.get("access_token"), data.get("expires_in")
 
     def _get_headers(self):
         return {
@@ -63,9 +72,13 @@ class PayTourConnector(BaseConnector):
 
         while True:
             params["page"] = page
-            response = requests.get(f"{self.base_url}/{endpoint}", headers=self._get_headers(), params=params)
+            # Com 401 o token em cache é renovado e a página repetida uma vez
+            response = token_cache.retry_unauthorized(
+                "paytour", self._auth_key,
+                lambda: requests.get(f"{self.base_url}/{endpoint}", headers=self._get_headers(), params=params),
+            )
             response.raise_for_status()
-            data = response.json()
+            data = decode_response(response)
             
             items = data.get("itens", [])
             if not items:
@@ -96,7 +109,7 @@ class PayTourConnector(BaseConnector):
                 cliente_cpf String,
                 data_hora_pedido DateTime,
                 data_hora_atualizacao DateTime,
-                status String,
+                status LowCardinality(String),
                 status_pagamento String,
                 metodo_pagamento String,
                 utm_source String,
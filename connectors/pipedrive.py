@@ -1,19 +1,160 @@
 import time
+import logging
 import requests
 import re
 import unicodedata
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+import pyarrow as pa
+import pyarrow.compute as pc
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from requests.adapters import HTTPAdapter
+from connectors.concurrency import ordered_map
+from connectors.instrumentation import span
+from config.settings import settings
+from connectors.json_codec import decode_response
+
+_SHA1_KEY = re.compile(r'^[0-9a-fA-F]{40}$')
+# Textos que mudam na limpeza: espaço repetido, nas bordas ou diferente de ' ' (\n, \t, NBSP...).
+# Classe em RE2 equivalente ao \s do Python para str unicode.
+_WS = r'[\s\x0b\x1c-\x1f\x85\p{Z}]'
+_NEEDS_CLEANING = rf'{_WS}{{2}}|^{_WS}|{_WS}$|[^ \PZ]|[\t\n\r\f\x0b\x1c-\x1f\x85]'
+
+
+def _clean_text(s: pd.Series) -> pd.Series:
+    """Quebras de linha e espaços repetidos viram um espaço; bordas aparadas (só nos valores str)."""
+    if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return s
+    values = s.to_numpy(dtype=object)
+    try:
+        arr = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Coluna mista (str + números/objetos): limpa valor a valor
+        return s.map(lambda v: ' '.join(v.split()) if isinstance(v, str) else v)
+    # Filtro vetorizado no Arrow; só os textos que mudam passam pelo split/join
+    needs = pc.match_substring_regex(arr, _NEEDS_CLEANING).fill_null(False)
+    idx = np.flatnonzero(needs.to_numpy(zero_copy_only=False))
+    if not len(idx):
+        return s
+    values = values.copy()
+    values[idx] = [' '.join(v.split()) for v in values[idx]]
+    return pd.Series(values, index=s.index, name=s.name, dtype=s.dtype)
+
+
+class FieldTranslationPlan:
+    """
+    Tradução dos campos customizados de uma entidade, compilada uma vez por tenant:
+    hash do campo -> nome da coluna e, para enums, id da opção -> label (Series indexada).
+
+    `apply` trabalha por coluna sobre o lote inteiro: monta o DataFrame dos registros,
+    descarta objetos/listas, renomeia e traduz as colunas customizadas e limpa os textos.
+    """
+
+    def __init__(self, field_map: dict, options_map: dict):
+        self.field_map = field_map
+        self.options = {
+            key: pd.Series(list(options.values()), index=list(options.keys()), dtype=object)
+            for key, options in options_map.items()
+        }
+        # Leads trazem os campos customizados na raiz, com o hash como chave
+        self.hash_keys = {key for key in field_map if _SHA1_KEY.match(str(key))}
+
+    def _translate(self, key: str, s: pd.Series) -> pd.Series:
+        options = self.options.get(key)
+        if options is None:
+            return s
+        labels = options.reindex(s.astype(str)).to_numpy()
+        return pd.Series(np.where(pd.isna(labels) | s.isna().to_numpy(), s.to_numpy(), labels),
+                         index=s.index, dtype=object)
+
+    def apply(self, items: List[Dict], is_lead: bool = False) -> pd.DataFrame:
+        if not items:
+            return pd.DataFrame()
+        df = pd.DataFrame(items)
+        custom = df.pop('custom_fields') if 'custom_fields' in df.columns else None
+
+        translated = {}
+        if custom is not None:
+            rows = [v if isinstance(v, dict) else {} for v in custom.tolist()]
+            custom = pd.DataFrame(rows, index=df.index, dtype=object)
+            for key in custom.columns:
+                translated[self.field_map.get(key, key)] = self._translate(key, custom[key])
+        if is_lead:
+            keys = [c for c in df.columns if c in self.hash_keys]
+            # dtype object mantém os ids inteiros das opções (sem virar float com os nulos)
+            raw = pd.DataFrame(items, columns=keys, index=df.index, dtype=object)
+            for key in keys:
+                translated[self.field_map[key]] = self._translate(key, raw[key])
+
+        # Objetos e listas ficam de fora dos campos padrão (como chave ausente no registro)
+        for col in df.columns[df.dtypes == object]:
+            nested = df[col].map(lambda v: isinstance(v, (dict, list))).to_numpy(dtype=bool)
+            if nested.any():
+                # Sem nenhum valor escalar presente (None conta, chave ausente não), a coluna some
+                present = df[col].map(lambda v: not (isinstance(v, float) and v != v)).to_numpy(dtype=bool)
+                if (nested | ~present).all():
+                    df = df.drop(columns=col)
+                else:
+                    df[col] = df[col].mask(nested, np.nan)
+
+        for name, values in translated.items():
+            df[name] = values
+        return df.apply(_clean_text)
+
 
 class PipedriveConnector:
     """
     Conector nativo do Pipedrive V2 para o pipelines de Datalake da Nalk.
     Refatorado do legado do Airflow para uso in-memory via Pandas -> Parquet.
+
+    Entidades independentes são extraídas em paralelo (max_workers). Com `watermarks`
+    (tabela -> RFC3339 da última carga) os endpoints v2 usam `updated_since`; `field_cache`
+    guarda os mapas de campos customizados do tenant entre execuções (FIELDS_TTL).
     """
-    def __init__(self, api_domain: str, api_token: str):
+    PAGE_SIZE = {'v1': 100, 'v2': 500}  # 500 é o máximo aceito pela API v2
+    REQUEST_TIMEOUT = 60
+    MAX_RETRIES = 3
+    FIELDS_TTL = timedelta(hours=24)
+
+    # Endpoint dos metadados de campos de cada entidade
+    FIELD_ENDPOINTS = {
+        'organizations': 'organizationFields',
+        'deals': 'dealFields',
+        'persons': 'personFields',
+        'activities': 'activityFields',
+        'products': 'productFields',
+        'leads': 'leadFields',
+    }
+
+    # tabela -> (endpoint, versão, entidade dos campos customizados, aceita updated_since)
+    ENTITIES = {
+        'pipedrive_pipelines': ('pipelines', 'v2', None, False),
+        'pipedrive_stages': ('stages', 'v2', None, False),
+        'pipedrive_users': ('users', 'v1', None, False),
+        'pipedrive_lead_labels': ('leadLabels', 'v1', None, False),
+        'pipedrive_organizations': ('organizations', 'v2', 'organizations', True),
+        'pipedrive_persons': ('persons', 'v2', 'persons', True),
+        'pipedrive_products': ('products', 'v2', 'products', True),
+        'pipedrive_deals': ('deals', 'v2', 'deals', True),
+        'pipedrive_activities': ('activities', 'v2', 'activities', True),
+        'pipedrive_leads': ('leads', 'v1', 'leads', False),
+    }
+
+    def __init__(self, api_domain: str, api_token: str, max_workers: int = None,
+                 watermarks: dict = None, field_cache: dict = None):
         self.api_domain = api_domain
         self.api_token = api_token
         self.base_url = f'https://{api_domain}.pipedrive.com/api'
+        self.max_workers = max_workers or settings.pipedrive_max_workers
+        self.watermarks = dict(watermarks or {})
+        self.field_cache = dict(field_cache or {})
+        # Tabelas extraídas sem erro nesta execução -> nova watermark (salva pelo flow)
+        self.completed = {}
+        self._failed = set()
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=self.max_workers))
 
     def _normalize_name(self, name: str) -> str:
         """Normaliza o nome removendo acentos, espaços e caracteres especiais"""
@@ -27,61 +168,57 @@ class PipedriveConnector:
         name = re.sub(r'[^a-z0-9_]', '', name)
         return name
 
-    def _clean_text_data(self, value: Any) -> Any:
-        if isinstance(value, str):
-            value = re.sub(r'\r?\n+', ' ', value)
-            value = re.sub(r'\s+', ' ', value.strip())
-        return value
+    def _get(self, url: str, params: dict, endpoint: str, page: int) -> dict:
+        """GET com timeout; 429 (limite por token) espera o Retry-After e repete."""
+        with span('extract_page', provider='pipedrive', endpoint=endpoint, page=page) as s:
+            for attempt in range(self.MAX_RETRIES + 1):
+                res = self.session.get(url, params=params, timeout=self.REQUEST_TIMEOUT)
+                if res.status_code == 429 and attempt < self.MAX_RETRIES:
+                    wait = float(res.headers.get('Retry-After') or 2 ** attempt)
+                    with span('rate_limit_wait', provider='pipedrive'):
+                        time.sleep(wait)
+                    continue
+                try:
+                    res.raise_for_status()
+                except requests.exceptions.RequestException:
+                    s.status = 'error'
+                    raise
+                data = decode_response(res)
+                s.set(rows=len(data.get('data') or []), bytes=len(res.content))
+                return data
 
     def _fetch_all(self, endpoint: str, version: str = 'v1', base_params: dict = None) -> List[Dict]:
         """Faz requests com paginação para a API (V1 e V2 do Pipedrive)"""
         all_data = []
         url = f"{self.base_url}/{version}/{endpoint}"
-        params = base_params or {}
+        params = dict(base_params or {})
         params['api_token'] = self.api_token
+        params['limit'] = self.PAGE_SIZE[version]
+        page = 0
 
-        if version == 'v1':
-            start = 0
-            while True:
-                params['start'] = start
-                params['limit'] = 100
-                try:
-                    res = requests.get(url, params=params)
-                    res.raise_for_status()
-                    data = res.json()
-                except Exception as e:
-                    print(f"Erro no request do Pipedrive {endpoint}: {str(e)}")
-                    break
+        while True:
+            page += 1
+            try:
+                data = self._get(url, params, endpoint, page)
+            except Exception as e:
+                print(f"Erro no request do Pipedrive {endpoint}: {str(e)}")
+                self._failed.add(endpoint)
+                break
 
-                items = data.get('data') or []
-                all_data.extend(items)
+            items = data.get('data') or []
+            all_data.extend(items)
 
+            if version == 'v1':
                 pagination = data.get('additional_data', {}).get('pagination', {})
                 if not pagination.get('more_items_in_collection'):
                     break
-                start = pagination.get('next_start', start + 100)
-                time.sleep(0.1)
-        else:
-            cursor = None
-            while True:
-                params['limit'] = 100
-                if cursor:
-                    params['cursor'] = cursor
-                try:
-                    res = requests.get(url, params=params)
-                    res.raise_for_status()
-                    data = res.json()
-                except Exception as e:
-                    print(f"Erro no request do Pipedrive {endpoint}: {str(e)}")
-                    break
-
-                items = data.get('data') or []
-                all_data.extend(items)
-
+                params['start'] = pagination.get('next_start', params.get('start', 0) + params['limit'])
+            else:
                 cursor = data.get('additional_data', {}).get('next_cursor')
                 if not cursor:
                     break
-                time.sleep(0.1)
+                params['cursor'] = cursor
+            time.sleep(0.1)
 
         return all_data
 
@@ -101,91 +238,57 @@ class PipedriveConnector:
                 }
         return field_map, options_map
 
-    def _flatten_custom_fields(self, data: List[Dict], field_map: dict, options_map: dict, is_lead=False) -> List[Dict]:
-        """Achata o objeto removendo hashes e substituindo para os nomes reais"""
-        flattened_data = []
-        for item in data:
-            flat_item = {}
-            # Copiar os campos normais e limpar strings longas
-            for k, v in item.items():
-                if k != 'custom_fields' and type(v) not in (dict, list):
-                    flat_item[k] = self._clean_text_data(v)
-            
-            # Achatar 'custom_fields' (no modelo padrao)
-            if 'custom_fields' in item and isinstance(item['custom_fields'], dict):
-                for key, value in item['custom_fields'].items():
-                    field_name = field_map.get(key, key)
-                    if key in options_map and value is not None:
-                        value_str = str(value)
-                        value = options_map[key].get(value_str, value)
-                    flat_item[field_name] = self._clean_text_data(value)
-
-            # Para leads, os campos customizados vem no raiz usando os hashes como key (ex: a0f8c...)
-            if is_lead:
-                sha1_keys = [k for k in item.keys() if len(k) == 40 and all(c in '0123456789abcdef' for c in str(k).lower())]
-                for key in sha1_keys:
-                    if key in field_map:
-                        field_name = field_map[key]
-                        value = item[key]
-                        if key in options_map and value is not None:
-                            value_str = str(value)
-                            value = options_map[key].get(value_str, value)
-                        flat_item[field_name] = self._clean_text_data(value)
-
-            flattened_data.append(flat_item)
-        return flattened_data
+    def _field_mappings(self, entity: str) -> tuple:
+        """Mapas (campo, opções) da entidade: do cache do tenant se recente, senão da API."""
+        endpoint = self.FIELD_ENDPOINTS[entity]
+        cached = self.field_cache.get(endpoint)
+        if cached:
+            fetched_at = datetime.fromisoformat(cached['fetched_at'])
+            if datetime.now(timezone.utc) - fetched_at < self.FIELDS_TTL:
+                return cached['field_map'], cached['options_map']
+
+        fields = self._fetch_all(endpoint, 'v1')
+        field_map, options_map = self._create_field_mappings(fields)
+        if fields and endpoint not in self._failed:
+            self.field_cache[endpoint] = {
+                'fetched_at': datetime.now(timezone.utc).isoformat(),
+                'field_map': field_map,
+                'options_map': options_map,
+            }
+        return field_map, options_map
+
+    def _fetch_entity(self, table_name: str) -> List[Dict]:
+        endpoint, version, _, incremental = self.ENTITIES[table_name]
+        since = self.watermarks.get(table_name) if incremental else None
+        return self._fetch_all(endpoint, version, {'updated_since': since} if since else None)
 
     def extract_all(self) -> Dict[str, pd.DataFrame]:
         """Executa o pipeline completo reproduzindo as queries do Airflow e convertendo para DataFrames limpos"""
+        # Watermark = início da extração (alterações durante a execução entram na próxima)
+        started_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
         print("Iniciando extração do Pipedrive (Fields)")
-        # 1. Obter Schemas
-        org_fields = self._fetch_all('organizationFields', 'v1')
-        deal_fields = self._fetch_all('dealFields', 'v1')
-        person_fields = self._fetch_all('personFields', 'v1')
-        activity_fields = self._fetch_all('activityFields', 'v1')
-        product_fields = self._fetch_all('productFields', 'v1')
-        lead_fields = self._fetch_all('leadFields', 'v1')
-
-        # Mapas de Tradução
-        org_map, org_opts = self._create_field_mappings(org_fields)
-        deal_map, deal_opts = self._create_field_mappings(deal_fields)
-        person_map, person_opts = self._create_field_mappings(person_fields)
-        activity_map, activity_opts = self._create_field_mappings(activity_fields)
-        product_map, product_opts = self._create_field_mappings(product_fields)
-        lead_map, lead_opts = self._create_field_mappings(lead_fields)
+        # 1. Obter Schemas (em paralelo, só os que não estão no cache do tenant)
+        entities = list(self.FIELD_ENDPOINTS)
+        mappings = ordered_map(self._field_mappings, entities, self.max_workers, name='pipedrive')
+        plans = {entity: FieldTranslationPlan(*maps) for entity, maps in zip(entities, mappings)}
 
         print("Iniciando extração do Pipedrive (Dados brutos de Vendas e Cadastros)")
-        # 2. Obter Dados Base
-        pipelines = self._fetch_all('pipelines', 'v2')
-        stages = self._fetch_all('stages', 'v2')
-        users = self._fetch_all('users', 'v1')
-        labels = self._fetch_all('leadLabels', 'v1')
-
-        organizations = self._fetch_all('organizations', 'v2')
-        persons = self._fetch_all('persons', 'v2')
-        products = self._fetch_all('products', 'v2')
-        deals = self._fetch_all('deals', 'v2')
-        activities = self._fetch_all('activities', 'v2')
-        leads = self._fetch_all('leads', 'v1')
+        # 2. Obter Dados Base (entidades independentes em paralelo)
+        tables = list(self.ENTITIES)
+        raw = dict(zip(tables, ordered_map(self._fetch_entity, tables, self.max_workers, name='pipedrive')))
 
         print("Achatando as variaveis customizaveis HASH -> Names")
         # 3. Flatten e Normalize dos objetos difíceis
-        org_flat = self._flatten_custom_fields(organizations, org_map, org_opts)
-        pers_flat = self._flatten_custom_fields(persons, person_map, person_opts)
-        prod_flat = self._flatten_custom_fields(products, product_map, product_opts)
-        deals_flat = self._flatten_custom_fields(deals, deal_map, deal_opts)
-        activ_flat = self._flatten_custom_fields(activities, activity_map, activity_opts)
-        leads_flat = self._flatten_custom_fields(leads, lead_map, lead_opts, is_lead=True)
-
-        return {
-            "pipedrive_pipelines": pd.DataFrame(pipelines),
-            "pipedrive_stages": pd.DataFrame(stages),
-            "pipedrive_users": pd.DataFrame(users),
-            "pipedrive_lead_labels": pd.DataFrame(labels),
-            "pipedrive_organizations": pd.DataFrame(org_flat),
-            "pipedrive_persons": pd.DataFrame(pers_flat),
-            "pipedrive_products": pd.DataFrame(prod_flat),
-            "pipedrive_deals": pd.DataFrame(deals_flat),
-            "pipedrive_activities": pd.DataFrame(activ_flat),
-            "pipedrive_leads": pd.DataFrame(leads_flat)
-        }
+        results = {}
+        for table_name, items in raw.items():
+            endpoint, _, fields_entity, _ = self.ENTITIES[table_name]
+            if fields_entity:
+                results[table_name] = plans[fields_entity].apply(items, is_lead=fields_entity == 'leads')
+            else:
+                results[table_name] = pd.DataFrame(items)
+            if endpoint not in self._failed:
+                self.completed[table_name] = started_at
+
+        logging.info(f"[Pipedrive] {self.api_domain}: " + ", ".join(f"{t}={len(df)}" for t, df in results.items()))
+        return results
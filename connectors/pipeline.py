@@ -0,0 +1,154 @@
+import queue
+import logging
+import threading
+import contextvars
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Iterable, Optional, Tuple
+from connectors.clickhouse_client import ClickHouseClient
+from connectors.datalake import DatalakeConnector
+from connectors.instrumentation import span
+
+
+class BatchLoader:
+    """
+    Carrega lotes (table_name, df) no MinIO e em seguida no ClickHouse.
+    Cada lote de uma mesma tabela vira uma parte Parquet numerada, para que
+    lotes por página não sobrescrevam uns aos outros no Datalake.
+    Com `checkpoint` (PageCheckpoint), a numeração continua da execução interrompida
+    e cada lote carregado avança o checkpoint. Com `fingerprints` (RowFingerprints), só
+    as linhas novas ou alteradas desde a execução anterior são enviadas, e os hashes de cada
+    lote carregado são registrados antes do checkpoint avançar.
+    """
+
+    def __init__(self, source: str, company_name: str, dt_stop: datetime, bucket: str = "raw-data",
+                 ch: ClickHouseClient = None, lake: DatalakeConnector = None, checkpoint=None,
+                 fingerprints=None):
+        self.source = source
+        self.company_name = company_name
+        self.date_path = dt_stop.strftime("%Y%m%d")
+        self.bucket = bucket
+        self.ch = ch or ClickHouseClient()
+        self.lake = lake or DatalakeConnector()
+        self.checkpoint = checkpoint
+        self.fingerprints = fingerprints
+        self._parts = {}
+        if checkpoint:
+            self._parts = {t: pos.get("parts", 0) for t, pos in checkpoint.tables.items()}
+
+    def load(self, table_name: str, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.fingerprints:
+            df = self.fingerprints.filter(table_name, df)
+            if df.empty:
+                if self.checkpoint:
+                    self.checkpoint.commit(df, self._parts.get(table_name, 0))
+                return
+
+        part = self._parts.get(table_name, 0)
+        self._parts[table_name] = part + 1
+        s3_key = f"{self.source}/{self.company_name}/{table_name}_run_{self.date_path}_part{part:04d}.parquet"
+
+        print(f"[{table_name}] Upload {self.source} MinIO ({len(df)} linhas) -> s3://{self.bucket}/{s3_key}")
+        s3_url = self.lake.push_dataframe_to_parquet(df, self.bucket, s3_key)
+
+        if s3_url:
+            try:
+                self.ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
+            except Exception as err:
+                print(f"[{table_name}] Fallback upload: {err}")
+                self.ch.insert_dataframe(table_name, df)
+
+        if self.fingerprints:
+            self.fingerprints.commit(table_name, df)
+        if self.checkpoint:
+            self.checkpoint.commit(df, self._parts[table_name])
+
+
+class StagePipeline:
+    """
+    Executa extração e carga em paralelo (produtor/consumidor).
+
+    O produtor consome o iterador de lotes (ex: connector.extract_iter) numa thread
+    própria e deposita cada lote numa fila limitada; o consumidor (thread chamadora)
+    carrega os lotes conforme chegam. Com a fila cheia a extração espera a carga,
+    mantendo a memória limitada a `max_pending` lotes em trânsito.
+    """
+
+    _DONE = object()
+
+    def __init__(self, load_fn: Callable[[str, pd.DataFrame], None],
+                 transform_fn: Optional[Callable[[str, pd.DataFrame], pd.DataFrame]] = None,
+                 max_pending: int = 4):
+        self.load_fn = load_fn
+        self.transform_fn = transform_fn
+        self.max_pending = max_pending
+
+    def _produce(self, batches: Iterable[Tuple[str, pd.DataFrame]], q: queue.Queue,
+                 stop: threading.Event, errors: list):
+        iterator = iter(batches)
+        try:
+            for table_name, df in iterator:
+                if stop.is_set():
+                    break
+                if self.transform_fn and not df.empty:
+                    # attrs (ex: marca do PageCheckpoint) seguem para o lote transformado
+                    attrs = dict(df.attrs)
+                    df = self.transform_fn(table_name, df)
+                    df.attrs.update(attrs)
+                # put com timeout para perceber o cancelamento pelo consumidor
+                while not stop.is_set():
+                    try:
+                        q.put((table_name, df), timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            while True:
+                try:
+                    q.put(self._DONE, timeout=1)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    def run(self, batches: Iterable[Tuple[str, pd.DataFrame]]) -> dict:
+        """Consome todos os lotes e retorna o total de linhas carregadas por tabela."""
+        q = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        errors = []
+        rows = {}
+
+        # A thread produtora herda o contexto (flow/client) usado pela instrumentação
+        ctx = contextvars.copy_context()
+        producer = threading.Thread(target=ctx.run, args=(self._produce, batches, q, stop, errors),
+                                    name="extract-producer", daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = q.get()
+                if item is self._DONE:
+                    break
+                table_name, df = item
+                if df.empty:
+                    continue
+                with span("load_batch", table_name=table_name, rows=len(df)):
+                    self.load_fn(table_name, df)
+                rows[table_name] = rows.get(table_name, 0) + len(df)
+        finally:
+            stop.set()
+            producer.join()
+
+        if errors:
+            raise errors[0]
+
+        for table_name, total in rows.items():
+            logging.info(f"[Pipeline] {table_name}: {total} linhas carregadas")
+        return rows
@@ -6,7 +6,11 @@ import requests
 import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.http_cache import LookupCache
+from connectors.instrumentation import span
+from connectors.schema import PrunedFlattener
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class PiperunConnector(BaseConnector):
@@ -25,9 +29,13 @@ class PiperunConnector(BaseConnector):
 
     NESTED_FIELDS = ["customFields", "owner", "pipeline", "stage", "tags"]
 
-    def __init__(self, api_url: str = None, api_token: str = None):
+    # Tabelas de referência: baixadas com validadores HTTP e hash de conteúdo (LookupCache)
+    LOOKUPS = {"piperun_lost_reasons", "piperun_origins"}
+
+    def __init__(self, api_url: str = None, api_token: str = None, cache: LookupCache = None):
         self.api_url = (api_url or settings.piperun_api_url or "https://api.pipe.run/v1").rstrip("/")
         self.api_token = api_token or settings.piperun_api_token
+        self.cache = cache
 
     def _headers(self):
         return {
@@ -42,17 +50,6 @@ class PiperunConnector(BaseConnector):
         cleaned = re.sub(r"[^\w\s]", "", ascii_name)
         return re.sub(r"\s+", "_", cleaned).lower()
 
-    @staticmethod
-    def _flatten_dict(d: dict, parent_key: str = "", sep: str = "_") -> dict:
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(PiperunConnector._flatten_dict(v, new_key, sep).items())
-            else:
-                items.append((new_key, v))
-        return dict(items)
-
     def _flatten_deal_nested(self, deals: list) -> list:
         """Aplica flatten de campos aninhados específicos de deals."""
         flat_deals = []
@@ -87,29 +84,44 @@ class PiperunConnector(BaseConnector):
             flat_deals.append(flat)
         return flat_deals
 
-    def _fetch_all_pages(self, endpoint: str, extra_params: dict = None) -> list:
-        """Busca todas as páginas via meta.links.next."""
+    def _fetch_all_pages(self, endpoint: str, extra_params: dict = None, conditional: dict = None,
+                         info: dict = None) -> list:
+        """
+        Busca todas as páginas via meta.links.next.
+        `conditional` (If-None-Match/If-Modified-Since) vai só na primeira página; `info`
+        recebe a primeira resposta, o total de páginas e se alguma página falhou.
+        """
         all_items = []
         params = {"show": 200, "page": 1}
         if extra_params:
             params.update(extra_params)
+        info = {} if info is None else info
 
         while True:
             url = f"{self.api_url}/{endpoint}"
+            first = params["page"] == 1
+            headers = {**self._headers(), **conditional} if conditional and first else self._headers()
             try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=60)
+                resp = requests.get(url, headers=headers, params=params, timeout=60)
 
                 if resp.status_code == 429:
                     logging.warning("[Piperun] Rate limit - aguardando 30s")
-                    time.sleep(30)
+                    with span("rate_limit_wait", provider="piperun"):
+                        time.sleep(30)
                     continue
 
                 resp.raise_for_status()
             except requests.exceptions.RequestException as e:
                 logging.error(f"Erro ao buscar {endpoint} page={params.get('page')}: {e}")
+                info["error"] = True
+                break
+
+            if first:
+                info["first"] = resp
+            if resp.status_code == 304:
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get("data", [])
             if not items:
                 break
@@ -128,9 +140,26 @@ class PiperunConnector(BaseConnector):
 
             time.sleep(0.5)
 
+        info["pages"] = params["page"]
         logging.info(f"[Piperun] {endpoint}: {len(all_items)} registros")
         return all_items
 
+    def _fetch_lookup(self, table_name: str, endpoint: str) -> list:
+        """
+        Tabela de referência via cache: None se não mudou desde a última carga ou se alguma
+        página falhou (a cópia anterior continua valendo; lista parcial nunca é carregada).
+        """
+        info = {}
+        items = self._fetch_all_pages(endpoint, conditional=self.cache.headers(table_name), info=info)
+        if info.get("error"):
+            logging.warning(f"[Piperun] {table_name}: falha na paginação, mantendo a cópia anterior")
+            return None
+        if info.get("first") is not None and self.cache.not_modified(table_name, info["first"]):
+            return None
+        if self.cache.unchanged(table_name, items, info.get("first"), info.get("pages", 1)):
+            return None
+        return items
+
     def get_tables_ddl(self) -> list:
         return [
             """
@@ -142,10 +171,10 @@ class PiperunConnector(BaseConnector):
                 pipeline_name Nullable(String),
                 stage_name Nullable(String),
                 tags_name Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 created_at Nullable(String),
                 updated_at_field Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -159,7 +188,7 @@ class PiperunConnector(BaseConnector):
                 phone Nullable(String),
                 city Nullable(String),
                 state Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -167,11 +196,11 @@ class PiperunConnector(BaseConnector):
             """
             CREATE TABLE IF NOT EXISTS piperun_activities (
                 id String,
-                type Nullable(String),
+                type LowCardinality(Nullable(String)),
                 deal_id Nullable(String),
                 description Nullable(String),
                 created_at Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -181,7 +210,7 @@ class PiperunConnector(BaseConnector):
                 id String,
                 name Nullable(String),
                 active Nullable(Int8),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -191,7 +220,7 @@ class PiperunConnector(BaseConnector):
                 id String,
                 name Nullable(String),
                 active Nullable(Int8),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -206,14 +235,19 @@ class PiperunConnector(BaseConnector):
             if config.get("with"):
                 extra_params["with"] = config["with"]
 
-            raw_items = self._fetch_all_pages(config["path"], extra_params=extra_params)
+            if self.cache is not None and table_name in self.LOOKUPS:
+                raw_items = self._fetch_lookup(table_name, config["path"])
+                if raw_items is None:
+                    continue
+            else:
+                raw_items = self._fetch_all_pages(config["path"], extra_params=extra_params)
 
-            # Flatten especial para deals
+            # Flatten especial para deals (custom fields viram colunas dinâmicas)
             if table_name == "piperun_deals" and raw_items:
                 items = self._flatten_deal_nested(raw_items)
+                results[table_name] = pd.DataFrame(items)
             else:
-                items = [self._flatten_dict(item) for item in raw_items] if raw_items else []
-
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+                flattener = PrunedFlattener.for_table(self, table_name, expand_lists=False)
+                results[table_name] = flattener.frame(raw_items)
 
         return results
@@ -4,7 +4,10 @@ import logging
 import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.http_cache import LookupCache
+from connectors.instrumentation import span
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class PloomesConnector(BaseConnector):
@@ -35,48 +38,91 @@ class PloomesConnector(BaseConnector):
         "ploomes_contacts_types": "Contacts@Types",
     }
 
-    def __init__(self, user_key: str = None):
+    # Tabelas de referência: baixadas com validadores HTTP e hash de conteúdo (LookupCache)
+    LOOKUPS = {
+        "ploomes_deals_stages", "ploomes_deals_pipelines", "ploomes_deals_status",
+        "ploomes_deals_loss_reasons", "ploomes_products_families", "ploomes_products_groups",
+        "ploomes_users", "ploomes_teams", "ploomes_tags", "ploomes_contacts_origins",
+        "ploomes_contacts_status", "ploomes_contacts_types",
+    }
+
+    def __init__(self, user_key: str = None, cache: LookupCache = None):
         self.user_key = user_key or settings.ploomes_user_key
+        self.cache = cache
 
     def _headers(self):
         return {"User-Key": self.user_key}
 
-    def _fetch_all_odata(self, endpoint_path: str) -> list:
-        """Busca todos os dados de um endpoint com paginação OData."""
-        all_data = []
+    def _iter_odata_pages(self, endpoint_path: str, conditional: dict = None, info: dict = None):
+        """
+        Gera os itens de cada página OData à medida que são recebidos.
+        `conditional` (If-None-Match/If-Modified-Since) vai só na primeira página; `info`
+        recebe a primeira resposta, o total de páginas e se alguma página falhou.
+        """
+        total_items = 0
         next_url = endpoint_path
         page = 0
+        info = {} if info is None else info
 
         while next_url:
             page += 1
             url = f"{self.BASE_URL}/{next_url}" if not next_url.startswith("http") else next_url
+            headers = {**self._headers(), **conditional} if conditional and page == 1 else self._headers()
 
-            try:
-                resp = requests.get(url, headers=self._headers(), timeout=60)
-                resp.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Erro ao buscar {endpoint_path} page={page}: {e}")
-                break
+            with span("extract_page", provider="ploomes", endpoint=endpoint_path, page=page) as s:
+                try:
+                    resp = requests.get(url, headers=headers, timeout=60)
+                    resp.raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Erro ao buscar {endpoint_path} page={page}: {e}")
+                    s.status = "error"
+                    info["error"] = True
+                    break
 
-            data = resp.json()
-            page_items = data.get("value", [])
-            all_data.extend(page_items)
+                if page == 1:
+                    info["first"] = resp
+                if resp.status_code == 304:
+                    s.set(rows=0, bytes=0)
+                    break
 
-            # OData nextLink
-            next_link = data.get("@odata.nextLink")
-            if next_link:
-                # Se a URL contém domínio completo, usar diretamente
-                if next_link.startswith("https://"):
-                    next_url = next_link
-                else:
-                    next_url = next_link
-            else:
-                next_url = None
+                data = decode_response(resp)
+                page_items = data.get("value", [])
+                s.set(rows=len(page_items), bytes=len(resp.content))
+            if page_items:
+                total_items += len(page_items)
+                yield page_items
+
+            # OData nextLink (relativo ou com domínio completo)
+            next_url = data.get("@odata.nextLink")
 
             if next_url:
                 time.sleep(0.1)
 
-        logging.info(f"[Ploomes] {endpoint_path}: {len(all_data)} registros em {page} paginas")
+        info["pages"] = page
+        logging.info(f"[Ploomes] {endpoint_path}: {total_items} registros em {page} paginas")
+
+    def _fetch_lookup(self, table_name: str, endpoint_path: str) -> list:
+        """
+        Tabela de referência via cache: None se não mudou desde a última carga ou se alguma
+        página falhou (a cópia anterior continua valendo; lista parcial nunca é carregada).
+        """
+        info, items = {}, []
+        for page_items in self._iter_odata_pages(endpoint_path, self.cache.headers(table_name), info):
+            items.extend(page_items)
+        if info.get("error"):
+            logging.warning(f"[Ploomes] {table_name}: falha na paginação, mantendo a cópia anterior")
+            return None
+        if info.get("first") is not None and self.cache.not_modified(table_name, info["first"]):
+            return None
+        if self.cache.unchanged(table_name, items, info.get("first"), info.get("pages", 1)):
+            return None
+        return items
+
+    def _fetch_all_odata(self, endpoint_path: str) -> list:
+        """Busca todos os dados de um endpoint com paginação OData."""
+        all_data = []
+        for page_items in self._iter_odata_pages(endpoint_path):
+            all_data.extend(page_items)
         return all_data
 
     def get_tables_ddl(self) -> list:
@@ -95,7 +141,7 @@ class PloomesConnector(BaseConnector):
                 StatusId Nullable(Int64),
                 TypeId Nullable(Int64),
                 OwnerId Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -113,7 +159,7 @@ class PloomesConnector(BaseConnector):
                 LossReasonId Nullable(Int64),
                 CreateDate Nullable(String),
                 LastUpdateDate Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -123,7 +169,7 @@ class PloomesConnector(BaseConnector):
                 Id Int64,
                 Name Nullable(String),
                 PipelineId Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -132,7 +178,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_deals_pipelines (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -141,7 +187,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_deals_status (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -150,7 +196,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_deals_loss_reasons (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -162,7 +208,7 @@ class PloomesConnector(BaseConnector):
                 DealId Nullable(Int64),
                 Amount Float64 DEFAULT 0,
                 StageId Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -173,7 +219,7 @@ class PloomesConnector(BaseConnector):
                 Name Nullable(String),
                 FamilyId Nullable(Int64),
                 GroupId Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -182,7 +228,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_products_families (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -191,7 +237,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_products_groups (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -202,7 +248,7 @@ class PloomesConnector(BaseConnector):
                 Name Nullable(String),
                 Email Nullable(String),
                 TeamId Nullable(Int64),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -211,7 +257,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_teams (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -220,7 +266,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_tags (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -229,7 +275,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_contacts_origins (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -238,7 +284,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_contacts_status (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -247,7 +293,7 @@ class PloomesConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS ploomes_contacts_types (
                 Id Int64,
                 Name Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY Id
@@ -258,7 +304,20 @@ class PloomesConnector(BaseConnector):
         results = {}
 
         for table_name, endpoint_path in self.ENDPOINTS.items():
-            items = self._fetch_all_odata(endpoint_path)
+            if self.cache is not None and table_name in self.LOOKUPS:
+                items = self._fetch_lookup(table_name, endpoint_path)
+            else:
+                items = self._fetch_all_odata(endpoint_path)
             results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
 
         return results
+
+    def extract_iter(self, date_start: datetime, date_stop: datetime):
+        for table_name, endpoint_path in self.ENDPOINTS.items():
+            if self.cache is not None and table_name in self.LOOKUPS:
+                items = self._fetch_lookup(table_name, endpoint_path)
+                if items:
+                    yield table_name, pd.DataFrame(items)
+                continue
+            for page_items in self._iter_odata_pages(endpoint_path):
+                yield table_name, pd.DataFrame(page_items)
@@ -1,3 +1,4 @@
+import re
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
@@ -5,15 +6,39 @@ import time
 import logging
 from typing import Dict, Any, List
 from connectors.base import BaseConnector
+from connectors.concurrency import ordered_map
+from connectors.flatten import bulk_flatten
+from connectors.schema import PrunedFlattener
+from connectors.instrumentation import span
+from connectors.token_cache import token_cache
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class RDMarketingConnector(BaseConnector):
     """
     Conector para extração de dados do RD Station Marketing.
     Extrai Analytics de Emails, Conversões e Leads do Webhook.
+
+    Analytics de emails pede a janela mais larga aceita (ANALYTICS_WINDOW_DAYS) e só divide
+    ao meio quando a resposta vem truncada (ANALYTICS_ROW_CAP) ou a API recusa o intervalo;
+    qualquer outra falha interrompe a extração (um dia com erro não vira dia vazio). Conversões são
+    agregadas pela janela inteira, então seguem dia a dia, com os dias em paralelo.
+    O webhook continua do `webhook_offset` da última execução (watermark no StateStore).
     """
-    
-    def __init__(self, client_id: str = None, client_secret: str = None, refresh_token: str = None, x_api_key: str = None, alias: str = None):
+    ANALYTICS_WINDOW_DAYS = 45
+    ANALYTICS_ROW_CAP = 1000
+    # Corpo das respostas 400/422 que recusam a janela por ser longa demais
+    RANGE_ERROR = re.compile(r"range|interval|period|per[ií]odo|intervalo|days|dias", re.IGNORECASE)
+    WEBHOOK_PAGE_SIZE = 500
+
+    # endpoint -> (chave da lista, campo de data do item; None = métricas agregadas na janela)
+    ANALYTICS = {
+        "emails": ("emails", "send_at"),
+        "conversions": ("conversions", None),
+    }
+
+    def __init__(self, client_id: str = None, client_secret: str = None, refresh_token: str = None, x_api_key: str = None, alias: str = None,
+                 webhook_offset: int = 0, max_workers: int = None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.refresh_token = refresh_token
@@ -21,12 +46,21 @@ class RDMarketingConnector(BaseConnector):
         self.alias = alias # Empresa no proxy
         self.base_url = "https://api.rd.services"
         self.webhook_proxy_url = "https://webhook-rd.nalk.com.br"
-        self._access_token = None
+        self.webhook_offset = webhook_offset or 0
+        self.max_workers = max_workers or settings.rd_marketing_max_workers
+        self.session = requests.Session()
+
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.client_id, self.client_secret, self.refresh_token)
 
     def _get_access_token(self):
-        if self._access_token:
-            return self._access_token
-            
+        return token_cache.get("rd_marketing", self._auth_key, self._request_token)
+
+    def _auth_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self._get_access_token()}", "Content-Type": "application/json"}
+
+    def _request_token(self) -> tuple:
         logging.info("RD Marketing: Obtendo access token...")
         payload = {
             "client_id": self.client_id,
@@ -36,27 +70,53 @@ class RDMarketingConnector(BaseConnector):
         }
         response = requests.post(f"{self.base_url}/auth/token", data=payload)
         response.raise_for_status()
-        self._access_token = response.json()["access_token"]
-        return self._access_token
+        data = response.json()
+        return data["access_token"], data.get("expires_in")
+
+    def _send(self, method: str, url: str, headers: dict, auth: bool, **kwargs) -> requests.Response:
+        if not auth:
+            return self.session.request(method, url, headers=headers, **kwargs)
+        # Com 401 o token em cache é renovado e a requisição repetida uma vez
+        return token_cache.retry_unauthorized(
+            "rd_marketing", self._auth_key,
+            lambda: self.session.request(method, url, headers={**self._auth_headers(), **(headers or {})}, **kwargs),
+        )
 
-    def _safe_request(self, url: str, method: str = "GET", headers: dict = None, params: dict = None, json_data: dict = None):
+    def _safe_request(self, url: str, method: str = "GET", headers: dict = None, params: dict = None, json_data: dict = None,
+                      raise_errors: bool = False, auth: bool = False):
+        """
+        Resposta decodificada, repetindo rate limit e falhas de conexão. Com erro, devolve None;
+        com `raise_errors`, levanta HTTPError (status != 200/429) ou a última falha de conexão.
+        `auth` envia o access token da API (renovado uma vez em caso de 401).
+        """
+        error = None
         for attempt in range(3):
             try:
-                response = requests.request(method, url, headers=headers, params=params, json=json_data, timeout=30)
+                response = self._send(method, url, headers, auth, params=params, json=json_data, timeout=30)
                 if response.status_code == 200:
-                    return response.json()
+                    return decode_response(response)
                 elif response.status_code == 429:
                     retry_after = int(response.headers.get("Retry-After", 30))
                     logging.warning(f"RD Marketing: Rate Limit (429). Aguardando {retry_after}s...")
-                    time.sleep(retry_after)
+                    with span("rate_limit_wait", provider="rd_marketing"):
+                        time.sleep(retry_after)
+                    error = requests.HTTPError(f"429 após {attempt + 1} tentativas: {url}", response=response)
                 else:
                     logging.error(f"RD Marketing Erro ({response.status_code}): {response.text}")
+                    error = requests.HTTPError(f"{response.status_code}: {response.text[:200]}", response=response)
                     break
             except Exception as e:
                 logging.error(f"RD Marketing Conexão: {e}")
+                error = e
                 time.sleep(5)
+        if raise_errors and error is not None:
+            raise error
         return None
 
+    def _range_too_large(self, error: requests.HTTPError) -> bool:
+        response = error.response
+        return response is not None and response.status_code in (400, 413, 422) and bool(self.RANGE_ERROR.search(response.text))
+
     def get_tables_ddl(self) -> list:
         return [
             """
@@ -113,27 +173,56 @@ class RDMarketingConnector(BaseConnector):
             """
         ]
 
-    def _extract_analytics(self, endpoint: str, json_key: str, date_start: datetime, date_stop: datetime) -> pd.DataFrame:
-        access_token = self._get_access_token()
-        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-        all_data = []
-        
-        current_date = date_start
-        while current_date <= date_stop:
-            date_str = current_date.strftime("%Y-%m-%d")
-            params = {"start_date": date_str, "end_date": date_str}
-            url = f"{self.base_url}/platform/analytics/{endpoint}"
-            
-            data = self._safe_request(url, headers=headers, params=params)
-            if data and json_key in data:
-                for item in data[json_key]:
-                    item["extraction_date"] = date_str
-                    all_data.append(item)
-            
-            current_date += timedelta(days=1)
-            time.sleep(0.5) # Anti-ban suave
-            
-        return pd.json_normalize(all_data) if all_data else pd.DataFrame()
+    def _analytics_window(self, endpoint: str, start: datetime, stop: datetime) -> List[Dict[str, Any]]:
+        """
+        Itens de [start, stop]; divide a janela ao meio se a resposta atingir ANALYTICS_ROW_CAP
+        ou a API recusar o intervalo. Outras falhas (auth, 4xx/5xx, conexão) são relançadas.
+        """
+        json_key, date_key = self.ANALYTICS[endpoint]
+        params = {"start_date": start.strftime("%Y-%m-%d"), "end_date": stop.strftime("%Y-%m-%d")}
+        url = f"{self.base_url}/platform/analytics/{endpoint}"
+
+        days = (stop - start).days
+        split = False
+        with span("extract_page", provider="rd_marketing", endpoint=endpoint, page=params["start_date"]) as s:
+            try:
+                data = self._safe_request(url, params=params, raise_errors=True, auth=True)
+            except requests.HTTPError as e:
+                if days == 0 or not self._range_too_large(e):
+                    raise
+                data, split = None, True
+            items = (data or {}).get(json_key) or []
+            s.set(rows=len(items))
+
+        if len(items) >= self.ANALYTICS_ROW_CAP:
+            if days > 0:
+                split = True
+            else:
+                logging.warning(f"RD Marketing: {endpoint} {params['start_date']} com {len(items)} itens (limite da API)")
+        if split:
+            middle = start + timedelta(days=days // 2)
+            logging.info(f"RD Marketing: {endpoint} {params['start_date']}..{params['end_date']} dividido ao meio")
+            return (self._analytics_window(endpoint, start, middle)
+                    + self._analytics_window(endpoint, middle + timedelta(days=1), stop))
+
+        for item in items:
+            # Emails são filtrados pela data de envio: cada um aparece uma vez, no dia do envio
+            sent = item.get(date_key) if date_key else None
+            item["extraction_date"] = str(sent)[:10] if sent else params["start_date"]
+        return items
+
+    def _extract_analytics(self, endpoint: str, date_start: datetime, date_stop: datetime) -> pd.DataFrame:
+        step = self.ANALYTICS_WINDOW_DAYS if self.ANALYTICS[endpoint][1] else 1
+        windows = []
+        current = date_start
+        while current <= date_stop:
+            end = min(current + timedelta(days=step - 1), date_stop)
+            windows.append((current, end))
+            current = end + timedelta(days=1)
+
+        pages = ordered_map(lambda w: self._analytics_window(endpoint, *w), windows, self.max_workers, name="rd_marketing")
+        all_data = [item for page in pages for item in page]
+        return bulk_flatten(all_data, sep=".", nested="python")
 
     def _extract_webhook_leads(self) -> pd.DataFrame:
         if not self.x_api_key or not self.alias:
@@ -141,8 +230,8 @@ class RDMarketingConnector(BaseConnector):
             
         headers = {"X-API-KEY": self.x_api_key, "accept": "application/json"}
         all_leads = []
-        offset = 0
-        limit = 500
+        offset = self.webhook_offset
+        limit = self.WEBHOOK_PAGE_SIZE
         
         while True:
             url = f"{self.webhook_proxy_url}/api/v1/raw-data/by-company"
@@ -153,42 +242,33 @@ class RDMarketingConnector(BaseConnector):
                 break
                 
             all_leads.extend(data["data"])
+            offset += len(data["data"])
             
             if len(data["data"]) < limit:
                 break
-            offset += limit
+
+        # Próxima execução continua daqui (o flow salva após a carga)
+        logging.info(f"RD Marketing: {len(all_leads)} leads do webhook (offset {self.webhook_offset} -> {offset})")
+        self.webhook_offset = offset
             
         if not all_leads:
             return pd.DataFrame()
             
-        # Achata os dados conforme o legado
-        flattened = [self._flatten_dict(l) for l in all_leads]
-        return pd.DataFrame(flattened)
-
-    def _flatten_dict(self, d: Dict[str, Any], parent_key: str = '', sep: str = '_') -> Dict[str, Any]:
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
-            elif isinstance(v, list):
-                if v:
-                    for i, item in enumerate(v):
-                        if isinstance(item, dict):
-                            items.extend(self._flatten_dict(item, f"{new_key}_{i + 1}", sep=sep).items())
-                        else:
-                            items.append((f"{new_key}_{i + 1}", item))
-                else:
-                    items.append((new_key, None))
-            else:
-                items.append((new_key, v))
-        return dict(items)
+        # Achata conforme o legado (listas indexadas a partir de 1), só nas colunas do DDL
+        flattener = PrunedFlattener.for_table(
+            self, "rd_marketing_webhook_leads", list_start=1, empty_list_as_none=True,
+        )
+        return flattener.frame(all_leads)
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         logging.info(f"RD Marketing: Extraindo dados para {self.alias or 'Global'}")
         
-        emails_df = self._extract_analytics("emails", "emails", date_start, date_stop)
-        conversions_df = self._extract_analytics("conversions", "conversions", date_start, date_stop)
+        # Token antes das threads; emails e conversões em paralelo
+        self._get_access_token()
+        emails_df, conversions_df = ordered_map(
+            lambda endpoint: self._extract_analytics(endpoint, date_start, date_stop),
+            ["emails", "conversions"], max_workers=2, name="rd_marketing",
+        )
         leads_df = self._extract_webhook_leads()
         
         return {
@@ -5,6 +5,8 @@ import unicodedata
 import re
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from connectors.instrumentation import span
+from connectors.json_codec import decode_response
 
 class RDCRMConnector:
     """
@@ -33,9 +35,10 @@ class RDCRMConnector:
             try:
                 response = requests.get(url, params=params, timeout=30)
                 if response.status_code == 200:
-                    return response.json()
+                    return decode_response(response)
                 elif response.status_code == 429:
-                    time.sleep(60 * (attempt + 1))
+                    with span("rate_limit_wait", provider="rdcrm"):
+                        time.sleep(60 * (attempt + 1))
                 else:
                     print(f"Erro na API RDCRM ({response.status_code}): {response.text}")
                     break
@@ -0,0 +1,329 @@
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from connectors.flatten import bulk_flatten
+
+_CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`\"\w.]+)\s*\(", re.IGNORECASE)
+_NON_COLUMN = ("INDEX", "PROJECTION", "CONSTRAINT", "PRIMARY")
+
+
+def _split_top_level(body: str) -> List[str]:
+    """Divide a lista de colunas por vírgulas fora de parênteses (ex: Decimal(10, 2))."""
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_ddl(ddl: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Extrai (tabela, [(coluna, tipo)]) de um CREATE TABLE do ClickHouse.
+    O tipo vai até DEFAULT/MATERIALIZED/CODEC/COMMENT/TTL, se houver.
+    """
+    match = _CREATE_TABLE.search(ddl)
+    if not match:
+        raise ValueError("DDL sem CREATE TABLE")
+    table = match.group(1).strip("`\"").split(".")[-1]
+
+    start = match.end()
+    depth, end = 1, start
+    while depth and end < len(ddl):
+        if ddl[end] == "(":
+            depth += 1
+        elif ddl[end] == ")":
+            depth -= 1
+        end += 1
+
+    columns = []
+    for definition in _split_top_level(ddl[start:end - 1]):
+        name, _, rest = definition.partition(" ")
+        if name.upper() in _NON_COLUMN:
+            continue
+        col_type = re.split(r"\s+(?:DEFAULT|MATERIALIZED|ALIAS|EPHEMERAL|CODEC|COMMENT|TTL)\b", rest.strip(), 1)[0]
+        columns.append((name.strip("`\""), col_type.strip()))
+    return table, columns
+
+
+_ORDER_BY = re.compile(r"\bORDER\s+BY\s+(.+)$", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_order_by(ddl: str) -> List[str]:
+    """Colunas simples do ORDER BY de um CREATE TABLE (expressões como toDate(x) ficam de fora)."""
+    match = _ORDER_BY.search(ddl)
+    if not match:
+        return []
+    expression = match.group(1).strip()
+    if expression.startswith("(") and expression.endswith(")"):
+        expression = expression[1:-1]
+    names = [part.strip("`\"") for part in _split_top_level(expression)]
+    return [name for name in names if re.fullmatch(r"\w+", name)]
+
+
+@lru_cache(maxsize=None)
+def _order_keys(ddl_list: Tuple[str, ...]) -> Dict[str, List[str]]:
+    return {parse_ddl(ddl)[0]: parse_order_by(ddl) for ddl in ddl_list}
+
+
+def table_order_by(connector, table_name: str) -> List[str]:
+    """Colunas da chave de ordenação da tabela (a chave de deduplicação da ReplacingMergeTree)."""
+    get_ddl = getattr(connector, "get_tables_ddl", None)
+    return _order_keys(tuple(get_ddl())).get(table_name, []) if get_ddl else []
+
+
+@lru_cache(maxsize=None)
+def _schemas(ddl_list: Tuple[str, ...]) -> Dict[str, List[Tuple[str, str]]]:
+    return dict(parse_ddl(ddl) for ddl in ddl_list)
+
+
+def table_schemas(connector) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Schemas declarados em connector.get_tables_ddl(), parseados uma vez por DDL. Conectores
+    sem DDL (tabelas criadas pelo ClickHouse no primeiro insert) não têm schema.
+    """
+    get_ddl = getattr(connector, "get_tables_ddl", None)
+    return _schemas(tuple(get_ddl())) if get_ddl else {}
+
+
+def table_columns(connector, table_name: str) -> List[str]:
+    return [name for name, _ in table_schemas(connector).get(table_name, [])]
+
+
+_WRAPPERS = re.compile(r"^(Nullable|LowCardinality)\((.*)\)$")
+_INT_TYPES = {f"{p}Int{b}": f"{p}Int{b}" for p in ("", "U") for b in (8, 16, 32, 64)}
+_BOOL_VALUES = {"true": True, "false": False, "1": True, "0": False, "t": True, "f": False,
+                "sim": True, "nao": False, "não": False}
+
+
+def unwrap_type(ch_type: str) -> Tuple[str, bool, bool]:
+    """`LowCardinality(Nullable(String))` -> ("String", nullable=True, low_cardinality=True)."""
+    nullable = low_cardinality = False
+    match = _WRAPPERS.match(ch_type.strip())
+    while match:
+        if match.group(1) == "Nullable":
+            nullable = True
+        else:
+            low_cardinality = True
+        ch_type = match.group(2).strip()
+        match = _WRAPPERS.match(ch_type)
+    return ch_type, nullable, low_cardinality
+
+
+def _json_default(value):
+    return str(value)
+
+
+def _to_string(s: pd.Series) -> pd.Series:
+    """Texto preservando nulos: listas/dicts viram JSON e inteiros em float64 (NaN) não ganham `.0`."""
+    if pd.api.types.is_float_dtype(s.dtype):
+        valid = s.dropna()
+        if valid.empty or (valid == np.trunc(valid)).all():
+            s = s.astype("Int64")
+    null = s.isna()
+    if pd.api.types.is_object_dtype(s.dtype):
+        nested = s.map(lambda v: isinstance(v, (dict, list)))
+        out = s.where(~nested, s[nested].map(lambda v: json.dumps(v, ensure_ascii=False, default=_json_default)))
+    else:
+        out = s
+    return out.astype(str).mask(null, None)
+
+
+def _to_datetime(s: pd.Series) -> pd.Series:
+    """Datas ISO em lote; formatos fora do ISO (ex: dd/mm/aaaa) são tentados só nas linhas que falharam."""
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        parsed = pd.to_datetime(s, utc=True)
+    elif pd.api.types.is_numeric_dtype(s.dtype):
+        # Epoch em ms (Hotmart, Eduzz) ou em segundos
+        unit = "ms" if s.abs().max() > 1e11 else "s"
+        parsed = pd.to_datetime(s, unit=unit, errors="coerce", utc=True)
+    else:
+        text = s.where(s.isna(), s.astype(str))
+        parsed = pd.to_datetime(text, format="ISO8601", errors="coerce", utc=True)
+        retry = parsed.isna() & text.notna() & (text != "")
+        if retry.any():
+            parsed[retry] = pd.to_datetime(text[retry], format="mixed", dayfirst=True, errors="coerce", utc=True)
+    return parsed.dt.tz_localize(None)
+
+
+def _to_bool(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return s.astype("boolean")
+    text = s.where(s.isna(), s.astype(str).str.strip().str.lower())
+    return text.map(_BOOL_VALUES).astype("boolean")
+
+
+class TableSchema:
+    """
+    Tipagem de um DataFrame pelo DDL da tabela (no lugar do `astype(str)` em todas as colunas).
+
+    Cada coluna é convertida em lote para o tipo do ClickHouse: String mantém nulos como nulos
+    (não "None") e serializa listas/dicts em JSON; Int*/UInt* viram inteiros nullable do pandas;
+    Float/Decimal, float64; DateTime/Date, datetime64 (ISO, epoch em s/ms ou dd/mm/aaaa); Bool,
+    boolean. Em colunas não-Nullable o nulo vira o default do tipo, como o ClickHouse faria.
+    Colunas LowCardinality viram categóricas (poucos valores distintos guardados uma vez).
+    Colunas fora do DDL são descartadas e a ordem final é a do DDL (insert por nome).
+    """
+
+    def __init__(self, table_name: str, columns: Iterable[Tuple[str, str]]):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.types = {name: unwrap_type(ch_type) for name, ch_type in self.columns}
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def for_columns(cls, table_name: str, columns: Tuple[Tuple[str, str], ...]) -> "TableSchema":
+        return cls(table_name, columns)
+
+    @classmethod
+    def for_table(cls, connector, table_name: str) -> "TableSchema":
+        return cls.for_columns(table_name, tuple(table_schemas(connector).get(table_name, [])))
+
+    def cast_column(self, s: pd.Series, ch_type: str, nullable: bool) -> pd.Series:
+        if ch_type in ("String", "UUID") or ch_type.startswith(("FixedString", "Enum", "JSON", "Object")):
+            out = _to_string(s)
+            return out if nullable else out.fillna("")
+        if ch_type in _INT_TYPES:
+            values = np.trunc(pd.to_numeric(s, errors="coerce"))
+            return values.astype(_INT_TYPES[ch_type]) if nullable else values.fillna(0).astype(ch_type.lower())
+        if ch_type.startswith(("Float", "Decimal")):
+            values = pd.to_numeric(s, errors="coerce").astype("float32" if ch_type == "Float32" else "float64")
+            return values if nullable else values.fillna(0.0)
+        if ch_type.startswith(("DateTime", "Date")):
+            values = _to_datetime(s)
+            return values if nullable else values.fillna(pd.Timestamp(0))
+        if ch_type == "Bool":
+            values = _to_bool(s)
+            return values if nullable else values.fillna(False)
+        return s  # Array, Map, Tuple...: mantidos como vieram
+
+    def cast_untyped(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Tabelas sem DDL (schema inferido pelo ClickHouse no primeiro insert, ex: Pipedrive):
+        só as colunas object viram texto, com nulos preservados e listas/dicts em JSON.
+        """
+        out = df.copy()
+        for name in df.select_dtypes(include=["object"]).columns:
+            out[name] = _to_string(df[name])
+        return out
+
+    def cast(self, df: pd.DataFrame) -> pd.DataFrame:
+        if not self.columns:
+            logging.debug(f"[Schema] {self.table_name} sem DDL; apenas colunas object normalizadas")
+            return self.cast_untyped(df)
+
+        if not df.index.is_unique:
+            df = df.reset_index(drop=True)
+        out = {}
+        for name, ch_type in self.columns:
+            if name not in df.columns:
+                continue
+            base, nullable, low_cardinality = self.types[name]
+            try:
+                out[name] = self.cast_column(df[name], base, nullable)
+                if low_cardinality:
+                    # Categórico no pandas -> dicionário no Parquet -> LowCardinality no ClickHouse
+                    out[name] = out[name].astype("category")
+            except (TypeError, ValueError, OverflowError) as e:
+                logging.warning(f"[Schema] {self.table_name}.{name}: falha ao converter para {ch_type} ({e})")
+                out[name] = _to_string(df[name])
+
+        extra = [c for c in df.columns if c not in out]
+        if extra:
+            logging.debug(f"[Schema] {self.table_name}: {len(extra)} colunas fora do DDL descartadas: {extra[:10]}")
+        return pd.DataFrame(out, index=df.index)
+
+
+class PrunedFlattener:
+    """
+    Achata registros JSON materializando apenas os caminhos que viram colunas da tabela.
+
+    Reproduz a convenção dos flatteners recursivos dos conectores (chave pai + sep + filha,
+    listas expandidas por índice), mas só desce em objetos/listas que são prefixo de alguma
+    coluna alvo: o resto do registro é ignorado sem ser percorrido. Compilado uma vez por
+    schema via `for_columns`. Quando nenhuma coluna depende da expansão por índice, o lote
+    inteiro é achatado de uma vez em Arrow (`bulk_flatten`), com o mesmo resultado.
+
+    - sep: separador entre chaves ("_" na maioria dos conectores)
+    - expand_lists: expande listas em `chave_<i>` (False mantém a lista como valor)
+    - list_start: índice do primeiro item expandido (0 Hotmart, 1 RD Marketing)
+    - empty_list_as_none: lista vazia vira `chave = None` (RD Marketing)
+    """
+
+    def __init__(self, columns: Iterable[str], sep: str = "_", expand_lists: bool = True,
+                 list_start: int = 0, empty_list_as_none: bool = False):
+        self.columns = list(dict.fromkeys(columns))
+        self.targets = frozenset(self.columns)
+        self.sep = sep
+        self.expand_lists = expand_lists
+        self.list_start = list_start
+        self.empty_list_as_none = empty_list_as_none
+        # Todo prefixo "a", "a_b" de uma coluna "a_b_c": caminhos em que vale a pena descer
+        self.prefixes = frozenset(
+            col[:i] for col in self.columns for i in range(1, len(col)) if col.startswith(sep, i)
+        )
+        # Colunas como `tags_0` ou listas vazias como None exigem o percurso registro a registro
+        self.bulk = not empty_list_as_none and not (
+            expand_lists and any(part.isdigit() for col in self.columns for part in col.split(sep))
+        )
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def for_columns(cls, columns: Tuple[str, ...], **options) -> "PrunedFlattener":
+        return cls(columns, **options)
+
+    @classmethod
+    def for_table(cls, connector, table_name: str, **options) -> "PrunedFlattener":
+        return cls.for_columns(tuple(table_columns(connector, table_name)), **options)
+
+    def _walk(self, node: dict, prefix: str, out: dict):
+        sep, targets, prefixes = self.sep, self.targets, self.prefixes
+        for key, value in node.items():
+            path = f"{prefix}{sep}{key}" if prefix else str(key)
+            if isinstance(value, dict):
+                if path in prefixes:
+                    self._walk(value, path, out)
+            elif isinstance(value, list) and self.expand_lists:
+                if not value:
+                    if self.empty_list_as_none and path in targets:
+                        out[path] = None
+                elif path in prefixes:
+                    for i, item in enumerate(value, self.list_start):
+                        item_path = f"{path}{sep}{i}"
+                        if isinstance(item, dict):
+                            if item_path in prefixes:
+                                self._walk(item, item_path, out)
+                        elif item_path in targets:
+                            out[item_path] = item
+            elif path in targets:
+                out[path] = value
+
+    def flatten(self, record: dict) -> dict:
+        out = {}
+        self._walk(record, "", out)
+        return out
+
+    def frame(self, records: List[dict]) -> pd.DataFrame:
+        """DataFrame só com as colunas da tabela presentes nos registros, na ordem do DDL."""
+        if self.bulk:
+            # Sem expansão por índice, listas só viram coluna quando mantidas como valor
+            nested = "drop" if self.expand_lists else "python"
+            return bulk_flatten(records, sep=self.sep, columns=self.columns, nested=nested)
+        rows = [self.flatten(r) for r in records]
+        if not rows:
+            return pd.DataFrame()
+        seen = set().union(*rows)
+        return pd.DataFrame(rows, columns=[c for c in self.columns if c in seen])
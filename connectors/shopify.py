@@ -5,6 +5,7 @@ import logging
 import re
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class ShopifyConnector(BaseConnector):
     def __init__(self, shop_name: str = None, access_token: str = None, api_version: str = None):
@@ -36,7 +37,7 @@ class ShopifyConnector(BaseConnector):
         while url:
             response = requests.get(url, headers=self._get_headers(), params=params)
             response.raise_for_status()
-            data = response.json()
+            data = decode_response(response)
             
             # O Shopify retorna o recurso como uma chave (ex: {'orders': [...]})
             resource_key = endpoint.split("/")[-1]
@@ -69,8 +70,8 @@ class ShopifyConnector(BaseConnector):
                 subtotal_price Float64,
                 total_tax Float64,
                 total_discounts Float64,
-                currency String,
-                financial_status String,
+                currency LowCardinality(String),
+                financial_status LowCardinality(String),
                 fulfillment_status String,
                 created_at DateTime,
                 updated_at DateTime,
@@ -5,6 +5,8 @@ import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.token_cache import token_cache
+from connectors.json_codec import decode_response
 
 
 class SigaviConnector(BaseConnector):
@@ -18,9 +20,15 @@ class SigaviConnector(BaseConnector):
         self.api_url = (api_url or settings.sigavi_api_url or "").rstrip("/")
         self.username = username or settings.sigavi_username
         self.password = password or settings.sigavi_password
-        self.token = None
 
-    def _authenticate(self):
+    @property
+    def _auth_key(self) -> tuple:
+        return (self.api_url, self.username, self.password)
+
+    def _get_token(self) -> str:
+        return token_cache.get("sigavi", self._auth_key, self._authenticate)
+
+    def _authenticate(self) -> tuple:
         url = f"{self.api_url}/Sigavi/api/Acesso/Token"
         payload = {
             "grant_type": "password",
@@ -30,15 +38,21 @@ class SigaviConnector(BaseConnector):
         resp = requests.post(url, data=payload, timeout=60)
         resp.raise_for_status()
         data = resp.json()
-        self.token = data.get("access_token") or data.get("token")
         logging.info("[Sigavi] Autenticado com sucesso.")
+        return data.get("access_token") or data.get("token"), data.get("expires_in")
 
     def _headers(self):
         return {
-            "Authorization": f"bearer {self.token}",
+            "Authorization": f"bearer {self._get_token()}",
             "Content-Type": "application/json",
         }
 
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """POST autenticado; com 401 renova o token em cache e repete uma vez."""
+        return token_cache.retry_unauthorized(
+            "sigavi", self._auth_key, lambda: requests.post(url, headers=self._headers(), **kwargs)
+        )
+
     def _fetch_paginated_post(self, endpoint: str) -> list:
         all_items = []
         page = 1
@@ -48,13 +62,13 @@ class SigaviConnector(BaseConnector):
             payload = {"pagina": page}
 
             try:
-                resp = requests.post(url, headers=self._headers(), json=payload, timeout=120)
+                resp = self._post(url, json=payload, timeout=120)
                 resp.raise_for_status()
             except requests.exceptions.RequestException as e:
                 logging.error(f"[Sigavi] Erro pagina {page}: {e}")
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
 
             # Extrair itens da resposta
             if isinstance(data, list):
@@ -89,12 +103,12 @@ class SigaviConnector(BaseConnector):
                 nome Nullable(String),
                 email Nullable(String),
                 telefone Nullable(String),
-                status Nullable(String),
+                status LowCardinality(Nullable(String)),
                 data_cadastro Nullable(String),
                 origem Nullable(String),
                 empreendimento Nullable(String),
                 corretor Nullable(String),
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -102,8 +116,8 @@ class SigaviConnector(BaseConnector):
         ]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
-        if not self.token:
-            self._authenticate()
+        # Autentica (ou usa o token em cache) antes das requisições: erro de login falha a task
+        self._get_token()
 
         items = self._fetch_paginated_post("api/crm/fac/lista")
         df = pd.DataFrame(items) if items else pd.DataFrame()
@@ -4,6 +4,7 @@ from datetime import datetime
 import logging
 from connectors.base import BaseConnector
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 class SilbeckConnector(BaseConnector):
     def __init__(self):
@@ -31,7 +32,7 @@ class SilbeckConnector(BaseConnector):
                 return []
                 
             response.raise_for_status()
-            data = response.json()
+            data = decode_response(response)
             
             # Ajustar conforme estrutura real (ex: data['items'] ou direto uma lista)
             if isinstance(data, list):
@@ -49,7 +50,7 @@ class SilbeckConnector(BaseConnector):
                 id String,
                 codigo_reserva String,
                 data_reserva DateTime,
-                status String,
+                status LowCardinality(String),
                 valor_total Float64,
                 cliente_nome String,
                 cliente_email String,
@@ -1,10 +1,11 @@
 import requests
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class SuperlogicaConnector(BaseConnector):
@@ -36,7 +37,7 @@ class SuperlogicaConnector(BaseConnector):
             except requests.exceptions.RequestException as e:
                 logging.error(f"[Superlogica] Erro {path} pagina={page}: {e}")
                 break
-            data = resp.json()
+            data = decode_response(resp)
             items = data if isinstance(data, list) else data.get(data_key, [])
             if not items:
                 break
@@ -74,7 +75,7 @@ class SuperlogicaConnector(BaseConnector):
             CREATE TABLE IF NOT EXISTS {t} (
                 id String,
                 data String,
-                project_id String DEFAULT '',
+                project_id LowCardinality(String) DEFAULT '',
                 updated_at DateTime DEFAULT now()
             ) ENGINE = ReplacingMergeTree(updated_at)
             ORDER BY id
@@ -86,7 +87,7 @@ class SuperlogicaConnector(BaseConnector):
             items = self._fetch_all_pages(cfg["path"], cfg["data_key"])
             if table_name == "superlogica_proprietarios" and items:
                 beneficiarios, contratos = self._flatten_proprietarios(items)
-                results["superlogica_proprietarios_beneficiarios"] = pd.DataFrame(beneficiarios) if beneficiarios else pd.DataFrame()
-                results["superlogica_proprietarios_contratos"] = pd.DataFrame(contratos) if contratos else pd.DataFrame()
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+                results["superlogica_proprietarios_beneficiarios"] = pack_records(beneficiarios)
+                results["superlogica_proprietarios_contratos"] = pack_records(contratos)
+            results[table_name] = pack_records(items)
         return results
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple, Union
+
+from config.settings import settings
+from connectors.instrumentation import span
+
+# Retorno do fetch: o token ou (token, expires_in em segundos)
+FetchResult = Union[str, Tuple[str, Optional[float]]]
+
+
+class TokenCache:
+    """
+    Tokens de autenticação compartilhados pelas tasks e execuções do worker, por provider +
+    credenciais.
+
+    `get` devolve o token em cache enquanto faltar mais que `refresh_margin` segundos para
+    expirar; senão chama `fetch` (uma única vez por chave, mesmo com várias threads pedindo
+    ao mesmo tempo) e guarda o novo token. Cada execução de flow roda num processo próprio,
+    então com `directory` (TOKEN_CACHE_DIR) o token e a expiração também ficam num arquivo
+    local do worker, um por chave, travado com flock durante a consulta/login: processos
+    concorrentes esperam o login em andamento em vez de logar de novo. Sem `directory` o
+    cache vale só para o processo. As credenciais entram só como hash na chave.
+    """
+
+    def __init__(self, default_ttl: int = None, refresh_margin: int = None, directory: str = None):
+        self.default_ttl = default_ttl or settings.token_cache_default_ttl
+        self.refresh_margin = refresh_margin if refresh_margin is not None else settings.token_cache_refresh_margin
+        self.directory = settings.token_cache_dir if directory is None else directory
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._used = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(provider: str, credentials: tuple) -> str:
+        digest = hashlib.sha256(repr(tuple(credentials)).encode("utf-8")).hexdigest()[:16]
+        return f"{provider}:{digest}"
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, entry) -> bool:
+        return bool(entry) and entry[1] - time.time() > self.refresh_margin
+
+    @contextmanager
+    def _stored(self, key: str):
+        """
+        Arquivo do token (`{provider}-{hash}.json`, 0600) travado com flock enquanto aberto.
+        Produz (entrada lida, função para gravar/apagar); sem diretório, (None, no-op).
+        """
+        if not self.directory:
+            yield None, lambda entry: None
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, f"{key.replace(':', '-')}.json"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            with os.fdopen(os.dup(fd), "r") as f:
+                raw = f.read()
+            try:
+                data = json.loads(raw) if raw else None
+                entry = (data["token"], float(data["expires_at"])) if data else None
+            except (ValueError, KeyError, TypeError):
+                entry = None
+
+            def write(new_entry):
+                body = json.dumps({"token": new_entry[0], "expires_at": new_entry[1]}) if new_entry else ""
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, body.encode("utf-8"), 0)
+
+            yield entry, write
+        finally:
+            os.close(fd)
+
+    def get(self, provider: str, credentials: tuple, fetch: Callable[[], FetchResult], ttl: int = None) -> str:
+        key = self._key(provider, credentials)
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if not self._fresh(entry):
+                with self._stored(key) as (stored, write):
+                    if self._fresh(stored):
+                        entry = self._entries[key] = stored
+                    else:
+                        with span("auth", provider=provider):
+                            result = fetch()
+                        token, expires_in = result if isinstance(result, tuple) else (result, None)
+                        if not token:
+                            raise ValueError(f"[{provider}] Autenticação não retornou token")
+                        expires_in = float(expires_in or ttl or self.default_ttl)
+                        entry = self._entries[key] = (token, time.time() + expires_in)
+                        write(entry)
+                        self.misses += 1
+                        logging.debug(f"[TokenCache] {provider}: novo token, expira em {int(expires_in)}s")
+                        self._remember(key, token)
+                        return token
+            self.hits += 1
+            self._remember(key, entry[0])
+            return entry[0]
+
+    def _remember(self, key: str, token: str):
+        """Último token entregue a esta thread por chave (o que a requisição em curso usou)."""
+        if not hasattr(self._used, "tokens"):
+            self._used.tokens = {}
+        self._used.tokens[key] = token
+
+    def invalidate(self, provider: str, credentials: tuple, token: str = None):
+        """
+        Descarta o token (ex: API respondeu 401 antes da expiração prevista). Com `token` (o que
+        recebeu o 401), não faz nada se o cache já tem outro: outra thread/processo já renovou.
+        """
+        key = self._key(provider, credentials)
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry and (token is None or entry[0] == token):
+                self._entries.pop(key, None)
+            with self._stored(key) as (stored, write):
+                if stored and (token is None or stored[0] == token):
+                    write(None)
+
+    def retry_unauthorized(self, provider: str, credentials: tuple, send: Callable[[], Any]):
+        """
+        Executa `send()`, que monta a requisição com o token do cache. Com 401 (token revogado
+        ou expirado antes do previsto) descarta esse token e repete uma vez, com um token novo.
+        """
+        key = self._key(provider, credentials)
+        resp = send()
+        if resp.status_code == 401:
+            logging.warning(f"[TokenCache] {provider}: 401, renovando o token")
+            self.invalidate(provider, credentials, token=getattr(self._used, "tokens", {}).get(key))
+            resp = send()
+        return resp
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Instância do processo; com TOKEN_CACHE_DIR os tokens valem para todas as execuções do worker
+token_cache = TokenCache()
@@ -2,10 +2,11 @@ import requests
 import re
 import time
 import logging
-import pandas as pd
 from datetime import datetime
 from connectors.base import BaseConnector
+from connectors.blob import blob_ddl, pack_records
 from config.settings import settings
+from connectors.json_codec import decode_response
 
 
 class VindiConnector(BaseConnector):
@@ -24,19 +25,6 @@ class VindiConnector(BaseConnector):
     def _auth(self):
         return (self.api_token, "")
 
-    @staticmethod
-    def _flatten_json(record: dict, prefix: str = "") -> dict:
-        flat = {}
-        for key, value in record.items():
-            new_key = f"{prefix}.{key}" if prefix else key
-            if isinstance(value, dict):
-                flat.update(VindiConnector._flatten_json(value, new_key))
-            elif isinstance(value, list):
-                flat[new_key] = str(value)
-            else:
-                flat[new_key] = value
-        return flat
-
     def _parse_link_header(self, link_header: str) -> dict:
         links = {}
         if not link_header:
@@ -61,17 +49,16 @@ class VindiConnector(BaseConnector):
                 logging.error(f"[Vindi] Erro {endpoint}: {e}")
                 break
 
-            data = resp.json()
+            data = decode_response(resp)
             items = data.get(endpoint, data.get("data", []))
             if not items:
                 break
 
             for item in items:
-                flat = self._flatten_json(item) if isinstance(item, dict) else item
-                item_id = flat.get("id", id(flat))
+                item_id = item.get("id", id(item))
                 if item_id not in seen_ids:
                     seen_ids.add(item_id)
-                    all_items.append(flat)
+                    all_items.append(item)
 
             links = self._parse_link_header(resp.headers.get("Link", ""))
             url = links.get("next")
@@ -82,16 +69,11 @@ class VindiConnector(BaseConnector):
         return all_items
 
     def get_tables_ddl(self) -> list:
-        return [f"""
-            CREATE TABLE IF NOT EXISTS {t} (
-                id String, data String,
-                project_id String DEFAULT '', updated_at DateTime DEFAULT now()
-            ) ENGINE = ReplacingMergeTree(updated_at) ORDER BY id
-            """ for t in self.ENDPOINTS]
+        return [blob_ddl(t) for t in self.ENDPOINTS]
 
     def extract(self, date_start: datetime, date_stop: datetime) -> dict:
         results = {}
         for table_name, endpoint in self.ENDPOINTS.items():
             items = self._fetch_all(endpoint)
-            results[table_name] = pd.DataFrame(items) if items else pd.DataFrame()
+            results[table_name] = pack_records(items)
         return results
@@ -1,14 +1,17 @@
 from prefect import flow, task
 from connectors.acert import AcertConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("acert")
 def extract_acert_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = AcertConnector(
         token=credentials.get("token") or credentials.get("acert_token"),
@@ -18,11 +21,10 @@ def extract_acert_data(date_start: datetime, date_stop: datetime, credentials: d
     data = connector.extract(date_start, date_stop)
 
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
 
     return data
 
@@ -36,6 +38,7 @@ def create_tables():
 
 
 @task
+@observed("acert")
 def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -53,7 +56,7 @@ def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
 
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
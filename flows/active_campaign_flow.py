@@ -1,13 +1,18 @@
 from prefect import flow, task
 from connectors.active_campaign import ActiveCampaignConnector
+from connectors.schema import TableSchema
+from connectors.http_cache import LookupCache
+from connectors.state import StateStore
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 import pandas as pd
 from datetime import datetime
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_active_campaign_task(credentials: dict):
+@observed("active_campaign")
+def extract_active_campaign_task(credentials: dict, full_refresh: bool = False):
     # ActiveCampaign requer account_name e api_token
     account = credentials.get("account_name")
     token = credentials.get("api_token") or credentials.get("token")
@@ -15,19 +20,21 @@ def extract_active_campaign_task(credentials: dict):
     if not account or not token:
         raise ValueError("Credenciais ActiveCampaign incompletas (account_name/api_token).")
         
-    connector = ActiveCampaignConnector(account_name=account, api_token=token)
+    company_id = credentials.get("project_id", "unknown")
+    state = StateStore("active_campaign", company_id)
+    cache = LookupCache(state, "active_campaign", refresh=full_refresh)
+    connector = ActiveCampaignConnector(account_name=account, api_token=token, cache=cache)
     data = connector.extract_all()
     
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df['project_id'] = company_id
-            for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].astype(str)
-                
-    return data
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
+
+    return data, state
 
 @task
+@observed("active_campaign")
 def load_ac_to_datalake(data_dict: dict, credentials: dict):
     lake = DatalakeConnector()
     ch = ClickHouseClient()
@@ -49,7 +56,7 @@ def load_ac_to_datalake(data_dict: dict, credentials: dict):
                 ch.insert_dataframe(table_name, df)
 
 @flow(name="ActiveCampaign to Datalake")
-def active_campaign_pipeline():
+def active_campaign_pipeline(full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     manager = GSheetsManager(sheet_id=SHEET_ID)
     clients = manager.get_tab_data(gid="0") 
@@ -63,8 +70,10 @@ def active_campaign_pipeline():
     for client in ac_clients:
         print(f"🚀 Iniciando ActiveCampaign para: {client.get('project_id')}")
         try:
-            results = extract_active_campaign_task(client)
+            results, state = extract_active_campaign_task(client, full_refresh=full_refresh)
             load_ac_to_datalake(results, client)
+            # Hash dos estágios só vale depois da carga
+            state.save()
         except Exception as e:
             print(f"❌ Erro no cliente {client.get('project_id')}: {e}")
 
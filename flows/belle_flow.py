@@ -1,30 +1,33 @@
 from prefect import flow, task
 from connectors.belle import BelleConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_belle_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("belle")
+def extract_and_load_belle(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = BelleConnector(
         token=credentials.get("token") or credentials.get("belle_token"),
         api_url=credentials.get("api_url") or credentials.get("belle_api_url"),
         establishments=credentials.get("establishments") or credentials.get("belle_establishments"),
     )
-    data = connector.extract(date_start, date_stop)
-
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
-        if not df.empty:
-            df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+    loader = BatchLoader("belle", company_id, date_stop)
+
+    def prepare_batch(table_name, df):
+        df["project_id"] = company_id
+        return TableSchema.for_table(connector, table_name).cast(df)
 
-    return data
+    # Carga começa assim que o primeiro lote chega, em paralelo ao download
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    return pipeline.run(connector.extract_iter(date_start, date_stop))
 
 
 @task
@@ -35,30 +38,6 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 
-@task
-def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-
-    company_name = credentials.get("project_id", "unknown")
-    date_path = dt_stop.strftime("%Y%m%d")
-
-    for table_name, df in data_dict.items():
-        if not df.empty:
-            bucket = "raw-data"
-            s3_key = f"belle/{company_name}/{table_name}_run_{date_path}.parquet"
-
-            print(f"[{table_name}] Upload Belle MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
-
-
 @flow(name="Belle to ClickHouse")
 def belle_pipeline(date_start: str = None, date_stop: str = None):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
@@ -88,8 +67,7 @@ def belle_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando Belle: {company}")
 
         try:
-            data = extract_belle_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            extract_and_load_belle(dt_start, dt_stop, credentials=client)
         except Exception as e:
             print(f"Falha ao rodar Belle para {company}: {e}")
 
@@ -1,28 +1,43 @@
 from prefect import flow, task
 from connectors.cvcrm_cvdw import CvcrmCvdwConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
+from connectors.fingerprint import RowFingerprints
+from connectors.state import PageCheckpoint, StateStore
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_cvcrm_cvdw_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("cvcrm_cvdw")
+def extract_and_load_cvcrm_cvdw(date_start: datetime, date_stop: datetime, credentials: dict, profile: bool = False,
+                                full_refresh: bool = False):
+    company_id = credentials.get("project_id", "unknown")
+    # Páginas já carregadas por uma tentativa anterior (retry da task ou rerun no mesmo dia)
+    checkpoint = PageCheckpoint(StateStore("cvcrm_cvdw", company_id), run=date_stop.strftime("%Y%m%d"))
     connector = CvcrmCvdwConnector(
         api_dominio=credentials.get("api_dominio") or credentials.get("cvcrm_api_dominio"),
         email=credentials.get("email") or credentials.get("cvcrm_email"),
         token=credentials.get("token") or credentials.get("cvcrm_token"),
+        checkpoint=checkpoint,
     )
-    data = connector.extract(date_start, date_stop)
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
-        if not df.empty:
-            df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
-    return data
+    fingerprints = RowFingerprints("cvcrm_cvdw", company_id, refresh=full_refresh, connector=connector)
+    loader = BatchLoader("cvcrm_cvdw", company_id, date_stop, checkpoint=checkpoint, fingerprints=fingerprints)
+
+    def prepare_batch(table_name, df):
+        df["project_id"] = company_id
+        return TableSchema.for_table(connector, table_name).cast(df)
+
+    # Carga começa assim que o primeiro lote (página) chega, em paralelo à extração
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    rows = pipeline.run(connector.extract_iter(date_start, date_stop))
+    fingerprints.save()
+    checkpoint.clear()
+    return rows
 
 
 @task
@@ -33,28 +48,9 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 
-@task
-def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-    company_name = credentials.get("project_id", "unknown")
-    date_path = dt_stop.strftime("%Y%m%d")
-    for table_name, df in data_dict.items():
-        if not df.empty:
-            bucket = "raw-data"
-            s3_key = f"cvcrm_cvdw/{company_name}/{table_name}_run_{date_path}.parquet"
-            print(f"[{table_name}] Upload CVCRM CVDW MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
-
-
 @flow(name="CVCRM CVDW to ClickHouse")
-def cvcrm_cvdw_pipeline(date_start: str = None, date_stop: str = None):
+def cvcrm_cvdw_pipeline(date_start: str = None, date_stop: str = None, profile: bool = False,
+                        full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_CVCRM_CVDW = "0"
     manager = GSheetsManager(sheet_id=SHEET_ID)
@@ -74,8 +70,8 @@ def cvcrm_cvdw_pipeline(date_start: str = None, date_stop: str = None):
         company = client.get("project_id", "Unknown")
         print(f"--> Processando CVCRM CVDW: {company}")
         try:
-            data = extract_cvcrm_cvdw_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            extract_and_load_cvcrm_cvdw(dt_start, dt_stop, credentials=client, profile=profile,
+                                        full_refresh=full_refresh)
         except Exception as e:
             print(f"Falha ao rodar CVCRM CVDW para {company}: {e}")
 
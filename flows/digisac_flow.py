@@ -1,27 +1,38 @@
 from prefect import flow, task
 from connectors.digisac import DigisacConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
+from connectors.fingerprint import RowFingerprints
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_digisac_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("digisac")
+def extract_and_load_digisac(date_start: datetime, date_stop: datetime, credentials: dict, profile: bool = False,
+                             full_refresh: bool = False):
     connector = DigisacConnector(
         api_url=credentials.get("api_url") or credentials.get("digisac_api_url"),
         token=credentials.get("token") or credentials.get("digisac_token"),
     )
-    data = connector.extract(date_start, date_stop)
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
-        if not df.empty:
-            df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
-    return data
+    # Só linhas novas/alteradas desde a última carga vão ao MinIO/ClickHouse
+    fingerprints = RowFingerprints("digisac", company_id, refresh=full_refresh, connector=connector)
+    loader = BatchLoader("digisac", company_id, date_stop, fingerprints=fingerprints)
+
+    def prepare_batch(table_name, df):
+        df["project_id"] = company_id
+        return TableSchema.for_table(connector, table_name).cast(df)
+
+    # Carga começa assim que o primeiro lote (página) chega, em paralelo à extração
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    rows = pipeline.run(connector.extract_iter(date_start, date_stop))
+    fingerprints.save()
+    return rows
 
 
 @task
@@ -32,28 +43,9 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 
-@task
-def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-    company_name = credentials.get("project_id", "unknown")
-    date_path = dt_stop.strftime("%Y%m%d")
-    for table_name, df in data_dict.items():
-        if not df.empty:
-            bucket = "raw-data"
-            s3_key = f"digisac/{company_name}/{table_name}_run_{date_path}.parquet"
-            print(f"[{table_name}] Upload Digisac MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
-
-
 @flow(name="Digisac to ClickHouse")
-def digisac_pipeline(date_start: str = None, date_stop: str = None):
+def digisac_pipeline(date_start: str = None, date_stop: str = None, profile: bool = False,
+                     full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_DIGISAC = "0"
     manager = GSheetsManager(sheet_id=SHEET_ID)
@@ -73,8 +65,8 @@ def digisac_pipeline(date_start: str = None, date_stop: str = None):
         company = client.get("project_id", "Unknown")
         print(f"--> Processando Digisac: {company}")
         try:
-            data = extract_digisac_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            extract_and_load_digisac(dt_start, dt_stop, credentials=client, profile=profile,
+                                     full_refresh=full_refresh)
         except Exception as e:
             print(f"Falha ao rodar Digisac para {company}: {e}")
 
@@ -1,13 +1,16 @@
 from prefect import flow, task
 from connectors.eduzz import EduzzConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("eduzz")
 def extract_eduzz_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = EduzzConnector(
         api_url=credentials.get("api_url") or credentials.get("eduzz_api_url"),
@@ -16,11 +19,10 @@ def extract_eduzz_data(date_start: datetime, date_stop: datetime, credentials: d
     data = connector.extract(date_start, date_stop)
 
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
 
     return data
 
@@ -34,6 +36,7 @@ def create_tables():
 
 
 @task
+@observed("eduzz")
 def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -51,7 +54,7 @@ def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
 
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
@@ -4,9 +4,11 @@ from connectors.clickhouse_client import ClickHouseClient
 from datetime import datetime, timedelta
 import pandas as pd
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from connectors.datalake import DatalakeConnector
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("google_ads")
 def extract_google_ads_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = GoogleAdsConnector(
         developer_token=credentials.get("developer_token"),
@@ -33,6 +35,7 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("google_ads")
 def load_to_clickhouse(data_dict: dict, credentials: dict, dt_start: datetime, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
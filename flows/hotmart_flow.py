@@ -1,28 +1,34 @@
 from prefect import flow, task
 from connectors.hotmart import HotmartConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
+from connectors.state import StateStore
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("hotmart")
 def extract_hotmart_data(date_start: datetime, date_stop: datetime, credentials: dict):
+    company_id = credentials.get("project_id", "unknown")
+    # Janelas de vendas já baixadas (um retry desta task só busca as que faltam)
+    state = StateStore("hotmart", company_id)
     connector = HotmartConnector(
         basic_auth=credentials.get("basic_auth") or credentials.get("hotmart_basic_auth"),
         days_to_fetch=int(credentials.get("days_to_fetch", 365)),
+        checkpoint=state,
     )
     data = connector.extract(date_start, date_stop)
 
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
 
-    return data
+    return data, state
 
 
 @task
@@ -34,6 +40,7 @@ def create_tables():
 
 
 @task
+@observed("hotmart")
 def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -51,7 +58,7 @@ def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
 
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
@@ -89,8 +96,12 @@ def hotmart_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando Hotmart: {company}")
 
         try:
-            data = extract_hotmart_data(dt_start, dt_stop, credentials=client)
+            data, state = extract_hotmart_data(dt_start, dt_stop, credentials=client)
             load_to_clickhouse(data, client, dt_stop)
+            # Carga feita: os checkpoints das janelas não são mais necessários
+            state.set("sales_windows", {})
+            state.save()
+            state.lake.delete_prefix(state.bucket, f"{state.prefix}/_windows/")
         except Exception as e:
             print(f"Falha ao rodar Hotmart para {company}: {e}")
 
@@ -1,36 +1,44 @@
 from prefect import flow, task
 from connectors.hubspot import HubSpotConnector
+from connectors.schema import TableSchema
+from connectors.http_cache import LookupCache
+from connectors.state import StateStore
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 import pandas as pd
 from datetime import datetime
 import os
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_hubspot_task(credentials: dict):
+@observed("hubspot")
+def extract_hubspot_task(credentials: dict, full_refresh: bool = False):
     access_token = credentials.get("api_token") or credentials.get("access_token")
     if not access_token:
         raise ValueError("HubSpot Access Token não encontrado nas credenciais.")
         
-    connector = HubSpotConnector(access_token=access_token)
+    company_id = credentials.get("project_id", "unknown")
+    state = StateStore("hubspot", company_id)
+    connector = HubSpotConnector(
+        access_token=access_token, cache=LookupCache(state, "hubspot", refresh=full_refresh)
+    )
     
     # Busca dinamicamente a partir de uma data se disponível
     start_date = credentials.get("date_start") or "2024-01-01"
     data = connector.extract_all(start_date=start_date)
     
     # Injetando ID do projeto
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df['project_id'] = company_id
-            # Limpeza de tipos object (JSON/List) para String (Clickhouse S3 exige consistencia)
-            for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].astype(str)
-                
-    return data
+            # Colunas object (JSON/List) viram texto com nulos preservados (Clickhouse S3 exige consistencia)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
+
+    return data, state
 
 @task
+@observed("hubspot")
 def load_hubspot_to_datalake(data_dict: dict, credentials: dict):
     lake = DatalakeConnector()
     ch = ClickHouseClient()
@@ -60,7 +68,7 @@ def load_hubspot_to_datalake(data_dict: dict, credentials: dict):
                 ch.insert_dataframe(table_name, df)
 
 @flow(name="HubSpot to Datalake")
-def hubspot_pipeline():
+def hubspot_pipeline(full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     # Adicione o GID da aba HubSpot se souber, senão o manager pode filtrar por conteúdo
     # Por padrão, usaremos o manager para pegar os clientes
@@ -79,8 +87,10 @@ def hubspot_pipeline():
     for client in hubspot_clients:
         print(f"🚀 Iniciando HubSpot para: {client.get('project_id')}")
         try:
-            data = extract_hubspot_task(client)
+            data, state = extract_hubspot_task(client, full_refresh=full_refresh)
             load_hubspot_to_datalake(data, client)
+            # Mapa de stages em cache só vale depois da carga
+            state.save()
         except Exception as e:
             print(f"❌ Erro no cliente {client.get('project_id')}: {e}")
 
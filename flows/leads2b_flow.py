@@ -6,8 +6,10 @@ from connectors.leads2b import Leads2bConnector
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("leads2b")
 def extract_leads2b_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = Leads2bConnector(token=credentials.get("leads2b_token"))
     data = connector.extract(date_start, date_stop)
@@ -26,6 +28,7 @@ def create_leads2b_tables():
     client.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("leads2b")
 def load_leads2b_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
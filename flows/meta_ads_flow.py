@@ -3,11 +3,13 @@ from connectors.meta_ads import MetaAdsConnector
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("meta_ads")
 def extract_meta_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = MetaAdsConnector(
         app_id=credentials.get("meta_app_id") or credentials.get("app_id") or "1617411648834739", # ID padrão do projeto Meta
@@ -32,6 +34,7 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("meta_ads")
 def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -1,28 +1,34 @@
 from prefect import flow, task
 from connectors.native import NativeConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
+from scripts.migrate_native_reports import pending_statements
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_native_data(date_start, date_stop, credentials):
+@observed("native")
+def extract_and_load_native(date_start, date_stop, credentials):
     connector = NativeConnector(
         api_url=credentials.get("api_url") or credentials.get("native_api_url"),
         username=credentials.get("username") or credentials.get("native_username"),
         password=credentials.get("password") or credentials.get("native_password"),
         report_ids=credentials.get("report_ids") or credentials.get("native_report_ids"),
     )
-    data = connector.extract(date_start, date_stop)
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
-        if not df.empty:
-            df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
-    return data
+    loader = BatchLoader("native", company_id, date_stop)
+
+    def prepare_batch(table_name, df):
+        df["project_id"] = company_id
+        return TableSchema.for_table(connector, table_name).cast(df)
+
+    # Carga começa assim que o primeiro lote chega, em paralelo ao download
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    return pipeline.run(connector.extract_iter(date_start, date_stop))
 
 @task
 def create_tables():
@@ -30,25 +36,9 @@ def create_tables():
     connector = NativeConnector()
     ch.create_database()
     ch.run_ddl(connector.get_tables_ddl())
-
-@task
-def load_to_clickhouse(data_dict, credentials, dt_stop):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-    company_name = credentials.get("project_id", "unknown")
-    date_path = dt_stop.strftime("%Y%m%d")
-    for table_name, df in data_dict.items():
-        if not df.empty:
-            bucket = "raw-data"
-            s3_key = f"native/{company_name}/{table_name}_run_{date_path}.parquet"
-            print(f"[{table_name}] Upload Native MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
+    # Tabela no layout antigo (report_id, data) rejeita os inserts com `id`
+    if pending_statements(ch):
+        raise RuntimeError("native_reports no layout antigo: rode python -m scripts.migrate_native_reports")
 
 @flow(name="Native to ClickHouse")
 def native_pipeline(date_start=None, date_stop=None):
@@ -71,8 +61,7 @@ def native_pipeline(date_start=None, date_stop=None):
         company = client.get("project_id", "Unknown")
         print(f"--> Processando Native: {company}")
         try:
-            data = extract_native_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            extract_and_load_native(dt_start, dt_stop, credentials=client)
         except Exception as e:
             print(f"Falha ao rodar Native para {company}: {e}")
 
@@ -1,26 +1,42 @@
 from prefect import flow, task
 from datetime import datetime, timedelta
-import logging
-import pandas as pd
 from connectors.omie import OmieConnector
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
+from connectors.fingerprint import RowFingerprints
+from connectors.schema import TableSchema
+from connectors.state import StateStore
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_omie_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("omie")
+def extract_and_load_omie(date_start: datetime, date_stop: datetime, credentials: dict, full_refresh: bool = False,
+                          backfill: bool = False):
+    company_name = credentials.get("project_id", "unknown-client")
+    # Watermarks por tabela da última carga completa (incremental); full_refresh ignora
+    state = StateStore("omie", company_name)
     connector = OmieConnector(
         app_key=credentials.get("omie_app_key"),
-        app_secret=credentials.get("omie_app_secret")
+        app_secret=credentials.get("omie_app_secret"),
+        watermarks=None if full_refresh else state.get("watermarks", {}),
+        backfill=backfill,
     )
-    data = connector.extract(date_start, date_stop)
-    
-    # Injetando infos adicionais de negócio
-    for df in data.values():
-         if not df.empty:
-             df['project_id'] = credentials.get("project_id", "unknown-client")
-             
-    return data
+    fingerprints = RowFingerprints("omie", company_name, lake=state.lake, refresh=full_refresh, connector=connector)
+    loader = BatchLoader("omie", company_name, date_stop, lake=state.lake, fingerprints=fingerprints)
+
+    def prepare_batch(table_name, df):
+        return TableSchema.for_table(connector, table_name).cast(df)
+
+    # Páginas carregadas em lotes conforme chegam, em paralelo à extração
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    rows = pipeline.run(connector.extract_iter(date_start, date_stop))
+
+    # Só avança a watermark depois da carga, e só das tabelas extraídas por completo
+    state.update("watermarks", connector.completed)
+    state.save()
+    fingerprints.save()
+    return rows
 
 @task
 def create_omie_tables():
@@ -28,33 +44,8 @@ def create_omie_tables():
     client = ClickHouseClient()
     client.run_ddl(connector.get_tables_ddl())
 
-@task
-def load_omie_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-    
-    company_name = credentials.get("project_id", "unknown-client")
-    date_path = dt_stop.strftime('%Y%m%d')
-
-    for table_name, df in data.items():
-        if not df.empty:
-            # Datalake
-            bucket = "raw-data"
-            s3_key = f"omie/{company_name}/{table_name}_run_{date_path}.parquet"
-            
-            print(f"[{table_name}] Upload OMIE MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-            
-            # ClickHouse Ingestion
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
-
 @flow(name="OMIE to ClickHouse")
-def omie_pipeline(date_start: str = None, date_stop: str = None):
+def omie_pipeline(date_start: str = None, date_stop: str = None, full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_OMIE = "723456189" # Exemplo, o usuário deve confirmar ou ajustar
 
@@ -66,6 +57,9 @@ def omie_pipeline(date_start: str = None, date_stop: str = None):
         print("Nenhum cliente válido encontrado para OMIE.")
         return
 
+    # date_start explícito (backfill) prevalece sobre as watermarks mais recentes
+    backfill = date_start is not None
+
     # Default: last 30 days for ERP
     if not date_start:
         date_start = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
@@ -82,8 +76,7 @@ def omie_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando OMIE: {company_name}")
         
         try:
-            data = extract_omie_data(dt_start, dt_stop, credentials=client)
-            load_omie_to_clickhouse(data, client, dt_stop)
+            extract_and_load_omie(dt_start, dt_stop, credentials=client, full_refresh=full_refresh, backfill=backfill)
         except Exception as e:
             print(f"Falha ao rodar OMIE para {company_name}: {e}")
 
@@ -6,8 +6,10 @@ from connectors.paytour import PayTourConnector
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("paytour")
 def extract_paytour_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = PayTourConnector(
         email=credentials.get("paytour_email"),
@@ -32,6 +34,7 @@ def create_paytour_tables():
     client.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("paytour")
 def load_paytour_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
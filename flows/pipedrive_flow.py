@@ -1,13 +1,17 @@
 from prefect import flow, task
 from connectors.pipedrive import PipedriveConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
+from connectors.state import StateStore
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 import pandas as pd
 from datetime import datetime
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_pipedrive_data(credentials: dict):
+@observed("pipedrive")
+def extract_pipedrive_data(credentials: dict, full_refresh: bool = False):
     # API credentials provided dynamically from the Google Sheet
     api_domain = credentials.get("api_base_url") 
     api_token = credentials.get("api_token")
@@ -15,19 +19,25 @@ def extract_pipedrive_data(credentials: dict):
     # Falback: Se na planilha estivesse como "developer_token" e afins
     if not api_token:
         api_token = credentials.get("developer_token")
-        
-    connector = PipedriveConnector(api_domain=api_domain, api_token=api_token)
+
+    # Watermarks (updated_since) e mapas de campos customizados do tenant
+    state = StateStore("pipedrive_v2", credentials.get("project_id", "unknown-client"))
+    connector = PipedriveConnector(
+        api_domain=api_domain, api_token=api_token,
+        watermarks=None if full_refresh else state.get("watermarks", {}),
+        field_cache=state.get("fields", {}),
+    )
     data = connector.extract_all()
     
     # Injetando infos adicionais de negócio
-    for df in data.values():
+    for table_name, df in data.items():
          if not df.empty:
              df['project_id'] = credentials.get("project_id", "unknown-client")
-             # Cast todas as colunas object para string pra evitar erro no pyarrow
-             for col in df.select_dtypes(include=['object']).columns:
-                 df[col] = df[col].astype(str)
-                 
-    return data
+             # Colunas object viram texto (nulos preservados, JSON em listas/dicts) pra evitar erro no pyarrow
+             data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
+
+    state.set("fields", connector.field_cache)
+    return data, connector.completed, state
 
 @task
 def create_tables():
@@ -37,13 +47,15 @@ def create_tables():
     pass
 
 @task
-def load_to_clickhouse(data_dict: dict, credentials: dict):
+@observed("pipedrive")
+def load_to_clickhouse(data_dict: dict, credentials: dict) -> set:
     ch = ClickHouseClient()
     lake = DatalakeConnector()
     
     # ID Cliente/Projeto 
     company_name = credentials.get("project_id", "unknown-client")
     date_path = datetime.now().strftime('%Y%m%d')
+    loaded = set()
 
     for table_name, df in data_dict.items():
         if not df.empty:
@@ -62,11 +74,15 @@ def load_to_clickhouse(data_dict: dict, credentials: dict):
                     # Vamos usar a engine nativa apenas como Fallback de velocidade.
                     # Usaremos o upload DWH nativo do Clickhouse Connect em memoria neste workflow pois o schema do pipedrive muda por cliente!
                     ch.insert_dataframe(table_name, df)
+                    loaded.add(table_name)
             except Exception as e:
                 print(f"[{table_name}] Erro: {e}")
+        else:
+            loaded.add(table_name)
+    return loaded
 
 @flow(name="Pipedrive to Datalake")
-def pipedrive_pipeline():
+def pipedrive_pipeline(full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     # IMPORTANTE: Esse é o GID provavel da aba "pipedrive_v2", nós verificamos que a aba Pipedrive_v2 existe.
     # Mas como o Manager ler a URL base, devemos buscar a aba correta. 
@@ -95,8 +111,11 @@ def pipedrive_pipeline():
         print(f"--> Processando Pipedrive cliente: {company_name}")
         
         try:
-            data = extract_pipedrive_data(credentials=client)
-            load_to_clickhouse(data, client)
+            data, completed, state = extract_pipedrive_data(credentials=client, full_refresh=full_refresh)
+            loaded = load_to_clickhouse(data, client)
+            # Watermark avança só nas tabelas extraídas sem erro e carregadas
+            state.update("watermarks", {t: ts for t, ts in completed.items() if t in loaded})
+            state.save()
         except Exception as e:
             print(f"Falha ao rodar cliente {company_name} Pipedrive: {e}")
     
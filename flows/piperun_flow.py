@@ -1,28 +1,35 @@
 from prefect import flow, task
 from connectors.piperun import PiperunConnector
+from connectors.http_cache import LookupCache
+from connectors.state import StateStore
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
+from connectors.fingerprint import RowFingerprints
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_piperun_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("piperun")
+def extract_piperun_data(date_start: datetime, date_stop: datetime, credentials: dict, full_refresh: bool = False):
+    company_id = credentials.get("project_id", "unknown")
+    state = StateStore("piperun", company_id)
     connector = PiperunConnector(
         api_url=credentials.get("api_url") or credentials.get("piperun_api_url"),
         api_token=credentials.get("api_token") or credentials.get("piperun_api_token"),
+        cache=LookupCache(state, "piperun", refresh=full_refresh),
     )
     data = connector.extract(date_start, date_stop)
 
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
 
-    return data
+    return data, state
 
 
 @task
@@ -34,13 +41,19 @@ def create_tables():
 
 
 @task
-def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
+@observed("piperun")
+def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime, full_refresh: bool = False):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
 
     company_name = credentials.get("project_id", "unknown")
     date_path = dt_stop.strftime("%Y%m%d")
 
+    # Recarga completa: só linhas novas/alteradas desde a última carga são enviadas
+    fingerprints = RowFingerprints("piperun", company_name, lake=lake, refresh=full_refresh,
+                                   connector=PiperunConnector())
+    data_dict = fingerprints.filter_all(data_dict)
+
     for table_name, df in data_dict.items():
         if not df.empty:
             bucket = "raw-data"
@@ -51,14 +64,17 @@ def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
 
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
+            fingerprints.commit(table_name, df)
+
+    fingerprints.save()
 
 
 @flow(name="Piperun to ClickHouse")
-def piperun_pipeline(date_start: str = None, date_stop: str = None):
+def piperun_pipeline(date_start: str = None, date_stop: str = None, full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_PIPERUN = "0"
 
@@ -86,8 +102,10 @@ def piperun_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando Piperun: {company}")
 
         try:
-            data = extract_piperun_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            data, state = extract_piperun_data(dt_start, dt_stop, credentials=client, full_refresh=full_refresh)
+            load_to_clickhouse(data, client, dt_stop, full_refresh=full_refresh)
+            # Hashes de lostReasons/origins só valem depois da carga
+            state.save()
         except Exception as e:
             print(f"Falha ao rodar Piperun para {company}: {e}")
 
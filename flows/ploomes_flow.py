@@ -1,27 +1,42 @@
 from prefect import flow, task
 from connectors.ploomes import PloomesConnector
+from connectors.http_cache import LookupCache
+from connectors.state import StateStore
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
-from connectors.datalake import DatalakeConnector
+from connectors.pipeline import BatchLoader, StagePipeline
+from connectors.fingerprint import RowFingerprints
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_ploomes_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("ploomes")
+def extract_and_load_ploomes(date_start: datetime, date_stop: datetime, credentials: dict, profile: bool = False,
+                             full_refresh: bool = False):
+    company_id = credentials.get("project_id", "unknown")
+    state = StateStore("ploomes", company_id)
     connector = PloomesConnector(
         user_key=credentials.get("user_key") or credentials.get("api_user_key") or credentials.get("ploomes_user_key"),
+        cache=LookupCache(state, "ploomes", refresh=full_refresh),
     )
-    data = connector.extract(date_start, date_stop)
+    # Só linhas novas/alteradas desde a última carga vão ao MinIO/ClickHouse
+    fingerprints = RowFingerprints("ploomes", company_id, refresh=full_refresh, connector=connector)
+    loader = BatchLoader("ploomes", company_id, date_stop, fingerprints=fingerprints)
 
-    company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
-        if not df.empty:
-            df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+    def prepare_batch(table_name, df):
+        df["project_id"] = company_id
+        return TableSchema.for_table(connector, table_name).cast(df)
 
-    return data
+    # Carga começa assim que o primeiro lote (página) chega, em paralelo à extração
+    pipeline = StagePipeline(loader.load, transform_fn=prepare_batch)
+    result = pipeline.run(connector.extract_iter(date_start, date_stop))
+    # Hashes das tabelas de referência e das linhas só valem depois da carga
+    state.save()
+    fingerprints.save()
+    return result
 
 
 @task
@@ -32,32 +47,9 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 
-@task
-def load_to_clickhouse(data_dict: dict, credentials: dict, dt_stop: datetime):
-    ch = ClickHouseClient()
-    lake = DatalakeConnector()
-
-    company_name = credentials.get("project_id", "unknown")
-    date_path = dt_stop.strftime("%Y%m%d")
-
-    for table_name, df in data_dict.items():
-        if not df.empty:
-            bucket = "raw-data"
-            s3_key = f"ploomes/{company_name}/{table_name}_run_{date_path}.parquet"
-
-            print(f"[{table_name}] Upload Ploomes MinIO ({len(df)} linhas) -> s3://{bucket}/{s3_key}")
-            s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
-
-            if s3_url:
-                try:
-                    ch.insert_from_s3(table_name, s3_url)
-                except Exception as err:
-                    print(f"[{table_name}] Fallback upload: {err}")
-                    ch.insert_dataframe(table_name, df)
-
-
 @flow(name="Ploomes to ClickHouse")
-def ploomes_pipeline(date_start: str = None, date_stop: str = None):
+def ploomes_pipeline(date_start: str = None, date_stop: str = None, profile: bool = False,
+                     full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_PLOOMES = "0"
 
@@ -88,8 +80,8 @@ def ploomes_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando Ploomes: {company}")
 
         try:
-            data = extract_ploomes_data(dt_start, dt_stop, credentials=client)
-            load_to_clickhouse(data, client, dt_stop)
+            extract_and_load_ploomes(dt_start, dt_stop, credentials=client, profile=profile,
+                                     full_refresh=full_refresh)
         except Exception as e:
             print(f"Falha ao rodar Ploomes para {company}: {e}")
 
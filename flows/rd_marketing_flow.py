@@ -3,18 +3,25 @@ from datetime import datetime, timedelta
 import logging
 import pandas as pd
 from connectors.rd_marketing import RDMarketingConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
+from connectors.state import StateStore
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
-def extract_rdmkt_data(date_start: datetime, date_stop: datetime, credentials: dict):
+@observed("rd_marketing")
+def extract_rdmkt_data(date_start: datetime, date_stop: datetime, credentials: dict, full_refresh: bool = False):
+    # Offset do webhook já lido nas execuções anteriores
+    state = StateStore("rd_marketing", credentials.get("project_id", "unknown-client"))
     connector = RDMarketingConnector(
         client_id=credentials.get("rd_client_id") or credentials.get("client_id"),
         client_secret=credentials.get("rd_client_secret") or credentials.get("client_secret"),
         refresh_token=credentials.get("rd_refresh_token") or credentials.get("refresh_token") or credentials.get("token"),
         x_api_key=credentials.get("rd_x_api_key") or credentials.get("x_api_key"),
-        alias=credentials.get("rd_company_alias") or credentials.get("alias")
+        alias=credentials.get("rd_company_alias") or credentials.get("alias"),
+        webhook_offset=0 if full_refresh else state.get("webhook_offset", 0),
     )
     data = connector.extract(date_start, date_stop)
     
@@ -22,11 +29,11 @@ def extract_rdmkt_data(date_start: datetime, date_stop: datetime, credentials: d
     for table_name, df in data.items():
          if not df.empty:
              df['project_id'] = credentials.get("project_id", "unknown-client")
-             # Cast todas as colunas object para string pra evitar erro no pyarrow/clickhouse
-             for col in df.select_dtypes(include=['object']).columns:
-                 df[col] = df[col].astype(str)
-             
-    return data
+             # Tipagem pelo DDL (nulos preservados, números/datas nativos no Parquet)
+             data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
+
+    state.set("webhook_offset", connector.webhook_offset)
+    return data, state
 
 @task
 def create_rdmkt_tables():
@@ -35,6 +42,7 @@ def create_rdmkt_tables():
     client.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("rd_marketing")
 def load_rdmkt_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -54,13 +62,13 @@ def load_rdmkt_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
             # ClickHouse Ingestion
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
 
 @flow(name="RD Marketing to ClickHouse")
-def rd_marketing_pipeline(date_start: str = None, date_stop: str = None):
+def rd_marketing_pipeline(date_start: str = None, date_stop: str = None, full_refresh: bool = False):
     SHEET_ID = "1ZA4rVPpHqDNvdw7t1gajgoCeV1uAaIM_sdI90BUCKIE"
     GID_RDMKT = "1479848665" # Atualizado conforme URL do usuário
 
@@ -88,8 +96,10 @@ def rd_marketing_pipeline(date_start: str = None, date_stop: str = None):
         print(f"--> Processando RD Marketing: {company_name}")
         
         try:
-            data = extract_rdmkt_data(dt_start, dt_stop, credentials=client)
+            data, state = extract_rdmkt_data(dt_start, dt_stop, credentials=client, full_refresh=full_refresh)
             load_rdmkt_to_clickhouse(data, client, dt_stop)
+            # Só avança o offset do webhook depois da carga
+            state.save()
         except Exception as e:
             print(f"Falha ao rodar RD Marketing para {company_name}: {e}")
 
@@ -1,12 +1,15 @@
 from prefect import flow, task
 from connectors.rdcrm import RDCRMConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 import pandas as pd
 from datetime import datetime, timedelta
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("rdcrm")
 def extract_rdcrm_task(credentials: dict):
     token = credentials.get("api_token") or credentials.get("token")
     if not token:
@@ -25,12 +28,12 @@ def extract_rdcrm_task(credentials: dict):
     for name, df in data.items():
         if not df.empty:
             df['project_id'] = company_id
-            for col in df.select_dtypes(include=['object']).columns:
-                df[col] = df[col].astype(str)
-                
+            data[name] = TableSchema.for_table(connector, name).cast(df)
+
     return data
 
 @task
+@observed("rdcrm")
 def load_rdcrm_to_datalake(data_dict: dict, credentials: dict):
     lake = DatalakeConnector()
     ch = ClickHouseClient()
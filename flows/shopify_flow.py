@@ -6,8 +6,10 @@ from connectors.shopify import ShopifyConnector
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("shopify")
 def extract_shopify_data(date_start: datetime, date_stop: datetime, credentials: dict):
     connector = ShopifyConnector(
         shop_name=credentials.get("shopify_shop_name"),
@@ -30,6 +32,7 @@ def create_shopify_tables():
     client.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("shopify")
 def load_shopify_to_clickhouse(data: dict, credentials: dict, dt_stop: datetime):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -3,8 +3,10 @@ from datetime import datetime, timedelta
 import logging
 from connectors.silbeck import SilbeckConnector
 from connectors.clickhouse_client import ClickHouseClient
+from scripts.observability import observed
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("silbeck")
 def extract_silbeck_data(date_start: datetime, date_stop: datetime):
     connector = SilbeckConnector()
     return connector.extract(date_start, date_stop)
@@ -16,6 +18,7 @@ def create_silbeck_tables():
     client.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("silbeck")
 def load_silbeck_to_clickhouse(data: dict):
     client = ClickHouseClient()
     for table_name, df in data.items():
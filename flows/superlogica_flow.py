@@ -1,13 +1,16 @@
 from prefect import flow, task
 from connectors.superlogica import SuperlogicaConnector
+from connectors.schema import TableSchema
 from connectors.clickhouse_client import ClickHouseClient
 from connectors.datalake import DatalakeConnector
 from scripts.gsheets_manager import GSheetsManager
+from scripts.observability import observed
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 
 @task(retries=3, retry_delay_seconds=60)
+@observed("superlogica")
 def extract_superlogica_data(date_start, date_stop, credentials):
     connector = SuperlogicaConnector(
         app_token=credentials.get("app_token") or credentials.get("superlogica_app_token"),
@@ -16,11 +19,10 @@ def extract_superlogica_data(date_start, date_stop, credentials):
     )
     data = connector.extract(date_start, date_stop)
     company_id = credentials.get("project_id", "unknown")
-    for df in data.values():
+    for table_name, df in data.items():
         if not df.empty:
             df["project_id"] = company_id
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].astype(str)
+            data[table_name] = TableSchema.for_table(connector, table_name).cast(df)
     return data
 
 @task
@@ -31,6 +33,7 @@ def create_tables():
     ch.run_ddl(connector.get_tables_ddl())
 
 @task
+@observed("superlogica")
 def load_to_clickhouse(data_dict, credentials, dt_stop):
     ch = ClickHouseClient()
     lake = DatalakeConnector()
@@ -44,7 +47,7 @@ def load_to_clickhouse(data_dict, credentials, dt_stop):
             s3_url = lake.push_dataframe_to_parquet(df, bucket, s3_key)
             if s3_url:
                 try:
-                    ch.insert_from_s3(table_name, s3_url)
+                    ch.insert_from_s3(table_name, s3_url, columns=list(df.columns))
                 except Exception as err:
                     print(f"[{table_name}] Fallback upload: {err}")
                     ch.insert_dataframe(table_name, df)
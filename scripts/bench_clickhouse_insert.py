@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from connectors.clickhouse_client import ClickHouseClient
+from connectors.datalake import DatalakeConnector
+
+TABLE = "bench_insert"
+
+DDL = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        id Int64,
+        project_id LowCardinality(String),
+        nome String,
+        email Nullable(String),
+        status LowCardinality(String),
+        valor Float64,
+        parcelas Int32,
+        ativo Bool,
+        created_at DateTime64(6),
+        updated_at DateTime DEFAULT now()
+    ) ENGINE = MergeTree
+    ORDER BY id
+"""
+
+
+def synthetic_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Tabela no formato típico de um conector (ids, textos, status, valores, datas)."""
+    rnd = np.random.default_rng(seed)
+    ids = pd.Series(np.arange(rows, dtype="int64"))
+    email = "cliente" + ids.astype(str) + "@example.com"
+    email[rnd.random(rows) < 0.1] = None
+    return pd.DataFrame({
+        "id": ids,
+        "project_id": "bench",
+        "nome": "Cliente " + ids.astype(str),
+        "email": email,
+        "status": rnd.choice(["APPROVED", "REFUNDED", "CANCELED", "WAITING"], rows),
+        "valor": rnd.random(rows) * 1000,
+        "parcelas": rnd.integers(1, 13, rows, dtype="int32"),
+        "ativo": rnd.random(rows) < 0.5,
+        "created_at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rnd.integers(0, 86400 * 365, rows), unit="s"),
+    })
+
+
+def _as_object(df: pd.DataFrame) -> pd.DataFrame:
+    """Textos como object (numpy), o que o insert_df recebe dos conectores hoje."""
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.StringDtype) or df[c].dtype == object})
+
+
+def _as_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    return df.convert_dtypes(dtype_backend="pyarrow")
+
+
+def _count(ch: ClickHouseClient) -> int:
+    return ch.client.command(f"SELECT count() FROM {TABLE}")
+
+
+def _run(ch: ClickHouseClient, fn, rows: int, repeat: int) -> tuple:
+    best, ok = float("inf"), True
+    for _ in range(repeat):
+        ch.client.command(f"TRUNCATE TABLE {TABLE}")
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        ok = ok and _count(ch) == rows
+    return best, ok
+
+
+def bench(ch: ClickHouseClient, lake: DatalakeConnector, rows: int, repeat: int, block_rows: int,
+          compressions: list, bucket: str) -> list:
+    base = synthetic_frame(rows)
+    as_object, as_arrow = _as_object(base), _as_arrow(base)
+    s3_key = f"bench/{TABLE}_{rows}.parquet"
+
+    def from_s3():
+        url = lake.push_dataframe_to_parquet(as_arrow, bucket, s3_key)
+        ch.insert_from_s3(TABLE, url, columns=list(as_arrow.columns))
+
+    cases = [("insert_df", lambda: ch.client.insert_df(TABLE, as_object))]
+    for compression in compressions:
+        codec = "" if compression == "none" else compression
+        cases.append((
+            f"insert_arrow[{compression}]",
+            lambda codec=codec: ch.insert_arrow(TABLE, as_arrow, block_rows=block_rows, compression=codec),
+        ))
+    cases.append(("insert_from_s3 (upload+ingest)", from_s3))
+
+    results, baseline = [], None
+    for label, fn in cases:
+        seconds, ok = _run(ch, fn, rows, repeat)
+        baseline = baseline or seconds
+        results.append({
+            "rows": rows, "method": label, "seconds": round(seconds, 3),
+            "rows_s": int(rows / seconds) if seconds else None,
+            "speedup": round(baseline / seconds, 2) if seconds else None,
+            "ok": ok,
+        })
+    lake.delete_prefix(bucket, s3_key)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara insert_df, insert_arrow e insert_from_s3 no ClickHouse configurado (.env)."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--block-rows", type=int, default=None, help="Linhas por INSERT no insert_arrow")
+    parser.add_argument("--compression", nargs="+", default=["lz4", "zstd", "none"],
+                        help="Compressão do buffer IPC no insert_arrow (lz4, zstd, none)")
+    parser.add_argument("--bucket", default="raw-data")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="Não apaga a tabela de teste ao final")
+    args = parser.parse_args()
+
+    ch, lake = ClickHouseClient(), DatalakeConnector()
+    ch.client.command(DDL)
+    try:
+        print(f"{'linhas':>10} {'metodo':<32} {'s':>9} {'linhas/s':>11} {'x':>6} {'ok':>4}")
+        for rows in args.rows:
+            for r in bench(ch, lake, rows, args.repeat, args.block_rows, args.compression, args.bucket):
+                print(f"{r['rows']:>10} {r['method']:<32} {r['seconds']:>9} {r['rows_s']:>11} "
+                      f"{r['speedup']:>6} {str(r['ok']):>4}")
+    finally:
+        if not args.keep:
+            ch.client.command(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from connectors.flatten import bulk_flatten
+from connectors.schema import PrunedFlattener
+from scripts.http_fixtures import FIXTURES_DIR, load_fixtures
+
+
+def legacy_flatten(nested: dict, prefix: str = "", sep: str = "_") -> dict:
+    """Flattener recursivo antigo (Hotmart/Piperun/Vindi): um laço Python por chave."""
+    flat = {}
+    for key, value in nested.items():
+        new_key = f"{prefix}{sep}{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(legacy_flatten(value, new_key, sep))
+        elif isinstance(value, list):
+            flat[new_key] = str(value)
+        else:
+            flat[new_key] = value
+    return flat
+
+
+def _records_from_fixtures(provider: str, fixtures_dir: str) -> list:
+    records = []
+    for interaction in load_fixtures(provider, fixtures_dir):
+        body = interaction.get("body")
+        if interaction.get("body_format") != "json":
+            continue
+        if isinstance(body, dict):
+            lists = [v for v in body.values() if isinstance(v, list) and v and isinstance(v[0], dict)]
+            body = max(lists, key=len) if lists else []
+        records.extend(r for r in body if isinstance(r, dict))
+    return records
+
+
+def _synthetic_records(count: int) -> list:
+    """Registros no formato de uma venda da Hotmart (objetos aninhados + listas)."""
+    return [
+        {
+            "transaction": f"HP{i:08d}",
+            "product": {"id": i % 50, "name": f"Curso {i % 50}", "ucode": f"u-{i % 50}"},
+            "buyer": {"name": "Comprador Exemplo", "email": f"comprador{i}@example.com", "ucode": f"b-{i}"},
+            "producer": {"name": "Produtor", "ucode": "p-1"},
+            "purchase": {
+                "status": "APPROVED" if i % 3 else "REFUNDED",
+                "order_date": 1704067200000 + i * 1000,
+                "approved_date": 1704067260000 + i * 1000,
+                "price": {"value": 197.0 + i % 10, "currency_code": "BRL"},
+                "payment": {"method": "CREDIT_CARD", "installments_number": 1 + i % 12, "type": "CREDIT_CARD"},
+                "offer": {"code": f"of{i % 7}", "payment_mode": "UNIQUE"},
+                "commission_as": "PRODUCER",
+                "is_subscription": bool(i % 2),
+            },
+            "tags": ["a", "b"],
+        }
+        for i in range(count)
+    ]
+
+
+def _leaf_columns(records: list, keep: float) -> list:
+    columns = list(dict.fromkeys(k for r in records[:100] for k in legacy_flatten(r)))
+    return columns[: max(1, int(len(columns) * keep))]
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(name: str, records: list, repeat: int, keep: float) -> list:
+    columns = _leaf_columns(records, keep)
+    pruned = PrunedFlattener(columns, expand_lists=False)
+    walk = PrunedFlattener(columns, expand_lists=False)
+    walk.bulk = False
+
+    cases = [
+        ("legado + DataFrame", lambda: pd.DataFrame([legacy_flatten(r) for r in records])[columns]),
+        ("json_normalize", lambda: pd.json_normalize(records, sep="_")),
+        ("PrunedFlattener (walk)", lambda: walk.frame(records)),
+        ("PrunedFlattener (bulk)", lambda: pruned.frame(records)),
+        ("bulk_flatten[arrow]", lambda: bulk_flatten(records)),
+        ("bulk_flatten[json]", lambda: bulk_flatten(records, nested="json")),
+    ]
+
+    results, baseline = [], None
+    for label, fn in cases:
+        seconds = _time(fn, repeat)
+        baseline = baseline or seconds
+        results.append({
+            "source": name, "flattener": label, "records": len(records), "columns": len(columns),
+            "seconds": round(seconds, 4),
+            "rows_s": int(len(records) / seconds) if seconds else None,
+            "speedup": round(baseline / seconds, 2) if seconds else None,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os flatteners legados com connectors/flatten.py.")
+    parser.add_argument("providers", nargs="*", help="Fixtures gravados (fixtures/<provider>.json)")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--synthetic", type=int, default=0, help="Registros sintéticos (formato Hotmart)")
+    parser.add_argument("--keep", type=float, default=1.0, help="Fração das colunas mantidas (simula o DDL)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sources = [(p, _records_from_fixtures(p, args.fixtures_dir)) for p in args.providers]
+    if args.synthetic or not sources:
+        sources.append((f"synthetic_{args.synthetic or 20000}", _synthetic_records(args.synthetic or 20000)))
+
+    print(f"{'fonte':<20} {'flattener':<26} {'registros':>10} {'cols':>5} {'s':>8} {'reg/s':>10} {'x':>6}")
+    for name, records in sources:
+        if not records:
+            print(f"{name:<20} sem registros JSON no fixture")
+            continue
+        for r in bench(name, records, args.repeat, args.keep):
+            print(f"{r['source']:<20} {r['flattener']:<26} {r['records']:>10} {r['columns']:>5} "
+                  f"{r['seconds']:>8} {r['rows_s']:>10} {r['speedup']:>6}")
+
+
+if __name__ == "__main__":
+    main()
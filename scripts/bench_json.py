@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import argparse
+import requests
+
+sys.path.append(os.getcwd())
+
+from connectors import json_codec
+from scripts.http_fixtures import FIXTURES_DIR, load_fixtures
+
+
+def _response(payload: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp._content = payload
+    resp.status_code = 200
+    resp.encoding = "utf-8"
+    return resp
+
+
+def _list_key(body) -> str:
+    """Chave do envelope que contém a maior lista de registros (data, value, dados...)."""
+    if not isinstance(body, dict):
+        return None
+    lists = [(len(v), k) for k, v in body.items() if isinstance(v, list) and v and isinstance(v[0], dict)]
+    return max(lists)[1] if lists else None
+
+
+def _pages_from_fixtures(provider: str, fixtures_dir: str) -> list:
+    pages = []
+    for interaction in load_fixtures(provider, fixtures_dir):
+        if interaction.get("body_format") == "json":
+            pages.append(json.dumps(interaction["body"], ensure_ascii=False).encode("utf-8"))
+    return pages
+
+
+def _synthetic_pages(records: int, pages: int) -> list:
+    record = {
+        "id": 0, "nome": "Cliente Exemplo", "email": "cliente@example.com", "valor": 1234.56,
+        "ativo": True, "data_cadastro": "2024-01-01T10:00:00", "tags": ["a", "b"],
+        "endereco": {"cidade": "São Paulo", "uf": "SP", "cep": "01000-000"},
+    }
+    body = {"dados": [dict(record, id=i) for i in range(records)], "total_de_paginas": pages}
+    return [json.dumps(body, ensure_ascii=False).encode("utf-8")] * pages
+
+
+def _time(fn, pages: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            fn(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(name: str, pages: list, repeat: int) -> list:
+    total_mb = sum(len(p) for p in pages) / (1024 ** 2)
+    first = json.loads(pages[0])
+    list_key = _list_key(first)
+
+    cases = [("resp.json()", lambda p: _response(p).json())]
+    for backend in ("orjson", "msgspec"):
+        if json_codec._available(backend):
+            cases.append((f"decode_response[{backend}]", lambda p, b=backend: json_codec.decode_response(_response(p), b)))
+    if list_key:
+        fields = list(first[list_key][0].keys())
+        cases.append((f"decode_columns[{len(fields)} campos]",
+                      lambda p: json_codec.decode_columns(p, fields, list_key)))
+        half = fields[: max(1, len(fields) // 2)]
+        cases.append((f"decode_columns[{len(half)} campos]",
+                      lambda p: json_codec.decode_columns(p, half, list_key)))
+
+    results, baseline = [], None
+    for label, fn in cases:
+        seconds = _time(fn, pages, repeat)
+        baseline = baseline or seconds
+        results.append({
+            "source": name, "decoder": label, "pages": len(pages), "mb": round(total_mb, 2),
+            "seconds": round(seconds, 4), "mb_s": round(total_mb / seconds, 1) if seconds else None,
+            "speedup": round(baseline / seconds, 2) if seconds else None,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara resp.json() com os decoders de connectors/json_codec.py.")
+    parser.add_argument("providers", nargs="*", help="Fixtures gravados (fixtures/<provider>.json)")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--synthetic", type=int, default=0, help="Registros por página sintética (sem fixtures)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sources = [(p, _pages_from_fixtures(p, args.fixtures_dir)) for p in args.providers]
+    if args.synthetic or not sources:
+        sources.append((f"synthetic_{args.synthetic or 500}", _synthetic_pages(args.synthetic or 500, args.pages)))
+
+    print(f"Backend padrão: {json_codec.BACKEND}")
+    print(f"{'fonte':<22} {'decoder':<28} {'MB':>8} {'s':>8} {'MB/s':>8} {'x':>6}")
+    for name, pages in sources:
+        if not pages:
+            print(f"{name:<22} sem páginas JSON no fixture")
+            continue
+        for r in bench(name, pages, args.repeat):
+            print(f"{r['source']:<22} {r['decoder']:<28} {r['mb']:>8} {r['seconds']:>8} {r['mb_s']:>8} {r['speedup']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from connectors.pipedrive import FieldTranslationPlan, PipedriveConnector
+from scripts.http_fixtures import FIXTURES_DIR, load_fixtures
+
+
+def _clean_text_data(value):
+    if isinstance(value, str):
+        value = re.sub(r'\r?\n+', ' ', value)
+        value = re.sub(r'\s+', ' ', value.strip())
+    return value
+
+
+def legacy_flatten(data: list, field_map: dict, options_map: dict, is_lead: bool = False) -> pd.DataFrame:
+    """Tradução antiga (_flatten_custom_fields): laço por chave de cada registro + DataFrame."""
+    flattened = []
+    for item in data:
+        flat_item = {}
+        for k, v in item.items():
+            if k != 'custom_fields' and type(v) not in (dict, list):
+                flat_item[k] = _clean_text_data(v)
+        if isinstance(item.get('custom_fields'), dict):
+            for key, value in item['custom_fields'].items():
+                if key in options_map and value is not None:
+                    value = options_map[key].get(str(value), value)
+                flat_item[field_map.get(key, key)] = _clean_text_data(value)
+        if is_lead:
+            sha1_keys = [k for k in item.keys() if len(k) == 40 and all(c in '0123456789abcdef' for c in str(k).lower())]
+            for key in sha1_keys:
+                if key in field_map:
+                    value = item[key]
+                    if key in options_map and value is not None:
+                        value = options_map[key].get(str(value), value)
+                    flat_item[field_map[key]] = _clean_text_data(value)
+        flattened.append(flat_item)
+    return pd.DataFrame(flattened)
+
+
+def _from_fixtures(provider: str, fixtures_dir: str) -> tuple:
+    """Campos (dealFields) e negócios (deals) gravados de um tenant real."""
+    fields, deals = [], []
+    for interaction in load_fixtures(provider, fixtures_dir):
+        body = interaction.get("body")
+        if interaction.get("body_format") != "json" or not isinstance(body, dict):
+            continue
+        path = interaction.get("path", "")
+        if path.endswith("/dealFields"):
+            fields.extend(body.get("data") or [])
+        elif path.endswith("/deals"):
+            deals.extend(body.get("data") or [])
+    return fields, deals
+
+
+def _synthetic(count: int, custom: int = 40, seed: int = 7) -> tuple:
+    """Tenant sintético: `custom` campos customizados (1/3 enum) e `count` negócios no formato v2."""
+    rnd = random.Random(seed)
+    fields = []
+    for i in range(custom):
+        key = f"{i:040x}"
+        field = {"key": key, "name": f"Campo Customizado {i} (Área)", "field_type": "varchar"}
+        if i % 3 == 0:
+            field.update(field_type="enum", options=[{"id": j, "label": f"Opção {j}"} for j in range(1, 30)])
+        fields.append(field)
+
+    deals = []
+    for n in range(count):
+        values = {}
+        for i, field in enumerate(fields):
+            if rnd.random() < 0.3:
+                values[field["key"]] = None
+            elif field["field_type"] == "enum":
+                values[field["key"]] = rnd.randint(1, 29)
+            elif i % 7 == 1:
+                values[field["key"]] = {"value": rnd.random() * 1000, "currency": "BRL"}
+            else:
+                values[field["key"]] = f"  texto {n}\r\n linha  {i} "
+        deals.append({
+            "id": n, "title": f"Negócio {n}\n(origem site)", "value": rnd.random() * 10000,
+            "currency": "BRL", "status": "open", "stage_id": n % 8, "owner_id": 100 + n % 20,
+            "add_time": "2024-01-01T10:00:00Z", "update_time": "2024-06-01T10:00:00Z",
+            "label_ids": [1, 2], "custom_fields": values,
+        })
+    return fields, deals
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(name: str, fields: list, deals: list, repeat: int) -> list:
+    field_map, options_map = PipedriveConnector("bench", "")._create_field_mappings(fields)
+    plan = FieldTranslationPlan(field_map, options_map)
+
+    legacy = legacy_flatten(deals, field_map, options_map)
+    compiled = plan.apply(deals)
+    same = legacy.astype(str).equals(compiled[legacy.columns].astype(str)) if set(legacy.columns) == set(compiled.columns) else False
+
+    cases = [
+        ("legado (por registro)", lambda: legacy_flatten(deals, field_map, options_map)),
+        ("FieldTranslationPlan", lambda: plan.apply(deals)),
+    ]
+    results, baseline = [], None
+    for label, fn in cases:
+        seconds = _time(fn, repeat)
+        baseline = baseline or seconds
+        results.append({
+            "source": name, "case": label, "deals": len(deals), "fields": len(fields),
+            "seconds": round(seconds, 4),
+            "rows_s": int(len(deals) / seconds) if seconds else None,
+            "speedup": round(baseline / seconds, 2) if seconds else None,
+            "same": same,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a tradução de campos customizados do Pipedrive (legado x plano compilado).")
+    parser.add_argument("providers", nargs="*", help="Fixtures gravados do Pipedrive (fixtures/<provider>.json)")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--synthetic", type=int, default=0, help="Negócios sintéticos (sem fixtures)")
+    parser.add_argument("--custom-fields", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sources = [(p, *_from_fixtures(p, args.fixtures_dir)) for p in args.providers]
+    if args.synthetic or not sources:
+        count = args.synthetic or 100000
+        sources.append((f"synthetic_{count}", *_synthetic(count, args.custom_fields)))
+
+    print(f"{'fonte':<18} {'caso':<24} {'deals':>8} {'campos':>7} {'s':>8} {'deals/s':>9} {'x':>6} {'igual':>6}")
+    for name, fields, deals in sources:
+        if not deals:
+            print(f"{name:<18} sem deals no fixture")
+            continue
+        for r in bench(name, fields, deals, args.repeat):
+            print(f"{r['source']:<18} {r['case']:<24} {r['deals']:>8} {r['fields']:>7} "
+                  f"{r['seconds']:>8} {r['rows_s']:>9} {r['speedup']:>6} {str(r['same']):>6}")
+
+
+if __name__ == "__main__":
+    main()
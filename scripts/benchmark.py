@@ -0,0 +1,445 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from contextlib import nullcontext
+from unittest.mock import patch
+from datetime import datetime, timedelta
+
+import psutil
+import pandas as pd
+
+sys.path.append(os.getcwd())
+
+from connectors.pipeline import BatchLoader
+from connectors.schema import TableSchema, parse_ddl
+from scripts.http_fixtures import FIXTURES_DIR, fixture_path, load_fixtures
+from scripts.mock_api_server import MockApiServer
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = "bench_results"
+
+
+def _cvcrm_cvdw(url):
+    from connectors.cvcrm_cvdw import CvcrmCvdwConnector
+    connector = CvcrmCvdwConnector(api_dominio="bench", email="bench", token="bench")
+    connector.base_url = f"{url}/api/v1"
+    return connector
+
+
+def _ploomes(url):
+    from connectors.ploomes import PloomesConnector
+    connector = PloomesConnector(user_key="bench")
+    connector.BASE_URL = url
+    return connector
+
+
+def _digisac(url):
+    from connectors.digisac import DigisacConnector
+    return DigisacConnector(api_url=url, token="bench")
+
+
+def _groner(url):
+    from connectors.groner import GronerConnector
+    return GronerConnector(api_url=url, token="bench")
+
+
+def _belle(url):
+    from connectors.belle import BelleConnector
+    return BelleConnector(token="bench", api_url=f"{url}/api/release/controller/IntegracaoExterna/v1.0")
+
+
+def _evo(url):
+    from connectors.evo import EvoConnector
+    return EvoConnector(username="bench", password="bench", api_url=url)
+
+
+def _imobzi(url):
+    from connectors.imobzi import ImobziConnector
+    return ImobziConnector(api_secret="bench", api_url=url)
+
+
+def _moskit(url):
+    from connectors.moskit import MoskitConnector
+    return MoskitConnector(api_key="bench", api_url=url)
+
+
+def _piperun(url):
+    from connectors.piperun import PiperunConnector
+    return PiperunConnector(api_url=f"{url}/v1", api_token="bench")
+
+
+def _vindi(url):
+    from connectors.vindi import VindiConnector
+    return VindiConnector(api_token="bench", api_url=f"{url}/api/v1")
+
+
+# fixture -> fábrica do conector apontando para o servidor de replay
+CONNECTORS = {
+    "cvcrm_cvdw": _cvcrm_cvdw,
+    "ploomes": _ploomes,
+    "digisac": _digisac,
+    "groner": _groner,
+    "belle": _belle,
+    "evo": _evo,
+    "imobzi": _imobzi,
+    "moskit": _moskit,
+    "piperun": _piperun,
+    "vindi": _vindi,
+}
+
+
+class PeakRssSampler:
+    """Amostra o RSS do processo em background e guarda o pico observado."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        return False
+
+
+class StageTimer:
+    """Tempo, linhas e bytes acumulados por estágio do benchmark."""
+
+    def __init__(self, names):
+        self.seconds = {n: 0.0 for n in names}
+        self.rows = {n: 0 for n in names}
+        self.bytes = {n: 0 for n in names}
+
+    def add(self, name: str, seconds: float, rows: int, nbytes: int = 0):
+        self.seconds[name] += seconds
+        self.rows[name] += rows
+        self.bytes[name] += nbytes
+
+
+class LocalDatalake:
+    """
+    Substituto local do MinIO para o BatchLoader: mesmo push_dataframe_to_parquet do
+    DatalakeConnector, gravando bucket/key num diretório. Mede a codificação Parquet
+    (estágio parquet) e a gravação (upload) separadamente; a URL devolvida é o caminho local.
+    """
+
+    def __init__(self, root: str, timer: StageTimer):
+        self.root = root
+        self.timer = timer
+
+    def push_dataframe_to_parquet(self, df: pd.DataFrame, bucket_name: str, s3_key: str) -> str:
+        if df.empty:
+            return ""
+        t0 = time.perf_counter()
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False, engine="pyarrow")
+        payload = buffer.getvalue()
+        self.timer.add("parquet", time.perf_counter() - t0, len(df), len(payload))
+
+        t0 = time.perf_counter()
+        path = os.path.join(self.root, bucket_name, s3_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(payload)
+        self.timer.add("upload", time.perf_counter() - t0, len(df), len(payload))
+        return path
+
+
+def _in_database(ddl: str, database: str) -> str:
+    """DDL do conector criando a tabela no banco do benchmark (`CREATE TABLE db.tabela`)."""
+    return re.sub(r"(CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?)", rf"\1{database}.", ddl, count=1, flags=re.IGNORECASE)
+
+
+class NullIngest:
+    """Cliente do BatchLoader sem ingestão (--ingest none ou chDB ausente)."""
+
+    timer = None
+
+    def prepare(self, connector):
+        pass
+
+    def insert_from_s3(self, table_name: str, s3_url_path: str, columns: list = None):
+        pass
+
+    def insert_dataframe(self, table_name: str, df: pd.DataFrame):
+        pass
+
+
+class ChdbIngest:
+    """
+    Ingestão num ClickHouse embarcado (chDB) com as tabelas do DDL real do conector: o
+    insert_from_s3 do BatchLoader lê o Parquet local com file(), por nome de coluna.
+    """
+
+    DATABASE = "bench"
+
+    def __init__(self, path: str):
+        from chdb import session
+        self.session = session.Session(path)
+        self.session.query(f"CREATE DATABASE IF NOT EXISTS {self.DATABASE}")
+        self.timer = None
+        self._created = set()
+
+    def prepare(self, connector):
+        for ddl in connector.get_tables_ddl():
+            table, _ = parse_ddl(ddl)
+            self.session.query(f"DROP TABLE IF EXISTS {self.DATABASE}.{table}")
+            self.session.query(_in_database(ddl, self.DATABASE))
+            self._created.add(table)
+
+    def insert_from_s3(self, table_name: str, s3_url_path: str, columns: list = None):
+        t0 = time.perf_counter()
+        source = f"file('{s3_url_path}', 'Parquet')"
+        if table_name not in self._created:
+            # Tabela fora do DDL: criada pelo primeiro lote, como no ClickHouse
+            self.session.query(
+                f"CREATE TABLE {self.DATABASE}.{table_name} ENGINE = MergeTree ORDER BY tuple() AS SELECT * FROM {source}"
+            )
+            self._created.add(table_name)
+        else:
+            names = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+            target = f"{self.DATABASE}.{table_name}" + (f" ({names})" if columns else "")
+            self.session.query(f"INSERT INTO {target} SELECT {names} FROM {source}")
+        self.timer.add("ingest", time.perf_counter() - t0, 0, os.path.getsize(s3_url_path))
+
+    def insert_dataframe(self, table_name: str, df: pd.DataFrame):
+        raise RuntimeError(f"[{table_name}] insert por Parquet falhou no chDB")
+
+
+class ClickHouseIngest:
+    """
+    Ingestão num ClickHouse local (settings do .env) no banco `bench_pipeline`, com as tabelas
+    do DDL real. O Parquet gravado vai ao servidor por INSERT ... FORMAT Parquet, a mesma
+    decodificação do insert_from_s3 de produção sem a ida ao MinIO; o fallback do BatchLoader
+    usa o insert_dataframe real (Arrow ou insert_df).
+    """
+
+    DATABASE = "bench_pipeline"
+
+    def __init__(self):
+        from connectors.clickhouse_client import ClickHouseClient
+        self.ch = ClickHouseClient()
+        self.ch.client.command(f"CREATE DATABASE IF NOT EXISTS {self.DATABASE}")
+        self.timer = None
+        self._created = set()
+
+    def prepare(self, connector):
+        for ddl in connector.get_tables_ddl():
+            table, _ = parse_ddl(ddl)
+            self.ch.client.command(f"DROP TABLE IF EXISTS {self.DATABASE}.{table}")
+            self.ch.client.command(_in_database(ddl, self.DATABASE))
+            self._created.add(table)
+
+    def insert_from_s3(self, table_name: str, s3_url_path: str, columns: list = None):
+        if table_name not in self._created:
+            logger.warning("%s fora do DDL do conector: ingestão ignorada", table_name)
+            return
+        t0 = time.perf_counter()
+        with open(s3_url_path, "rb") as f:
+            payload = f.read()
+        self.ch.client.raw_insert(f"{self.DATABASE}.{table_name}", columns, payload, fmt="Parquet")
+        self.timer.add("ingest", time.perf_counter() - t0, 0, len(payload))
+
+    def insert_dataframe(self, table_name: str, df: pd.DataFrame):
+        t0 = time.perf_counter()
+        self.ch.insert_dataframe(f"{self.DATABASE}.{table_name}", df)
+        self.timer.add("ingest", time.perf_counter() - t0, 0)
+
+
+def _stage(seconds: float, rows: int, nbytes: int) -> dict:
+    return {
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "bytes": nbytes,
+        "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None,
+        "mb_per_s": round(nbytes / 1024 / 1024 / seconds, 3) if seconds > 0 else None,
+    }
+
+
+def run_connector(name: str, args, workdir: str, ingest) -> dict:
+    """
+    Executa extract -> TableSchema.cast -> BatchLoader (Parquet, upload, insert) para um
+    conector, como nos flows, e retorna as métricas por estágio.
+    """
+    server = MockApiServer(
+        load_fixtures(name, args.fixtures_dir), latency_ms=args.latency_ms,
+        pages=args.pages, rate_limit_every=args.rate_limit_every,
+    )
+    timer = StageTimer(("extract", "transform", "parquet", "upload", "ingest"))
+    lake = LocalDatalake(os.path.join(workdir, "lake"), timer)
+    ingest.timer = timer
+    dt_stop = datetime.now()
+    dt_start = dt_stop - timedelta(days=args.days)
+    parts = 0
+
+    # --no-throttle remove os time.sleep anti-ban dos paginadores (a latência do replay continua)
+    throttle = patch("time.sleep", lambda seconds: None) if args.no_throttle else nullcontext()
+
+    with server, throttle, PeakRssSampler() as rss:
+        connector = CONNECTORS[name](server.url)
+        ingest.prepare(connector)
+        loader = BatchLoader(name, "bench", dt_stop, ch=ingest, lake=lake)
+        started = time.perf_counter()
+        batches = connector.extract_iter(dt_start, dt_stop)
+        while True:
+            t0 = time.perf_counter()
+            batch = next(batches, None)
+            elapsed = time.perf_counter() - t0
+            if batch is None:
+                timer.add("extract", elapsed, 0)
+                break
+            table_name, df = batch
+            timer.add("extract", elapsed, len(df))
+            if df.empty:
+                continue
+
+            # Mesmo preparo dos flows: project_id + tipos do DDL
+            t0 = time.perf_counter()
+            schema = TableSchema.for_table(connector, table_name)
+            if "project_id" in schema.types:
+                df["project_id"] = "bench"
+            df = schema.cast(df)
+            timer.add("transform", time.perf_counter() - t0, len(df))
+
+            loader.load(table_name, df)
+            if not isinstance(ingest, NullIngest):
+                timer.rows["ingest"] += len(df)
+            parts += 1
+        total = time.perf_counter() - started
+        timer.bytes["extract"] = server.stats["bytes_sent"]
+        stats = dict(server.stats)
+
+    measured = ("extract", "transform", "parquet", "upload") + (() if isinstance(ingest, NullIngest) else ("ingest",))
+    stages = {k: _stage(timer.seconds[k], timer.rows[k], timer.bytes[k]) for k in measured}
+    return {
+        "total_seconds": round(total, 4),
+        "rows": timer.rows["extract"],
+        "parts": parts,
+        "peak_rss_mb": round(rss.peak / 1024 / 1024, 1),
+        "requests": stats["requests"],
+        "rate_limited": stats["rate_limited"],
+        "unmatched_requests": stats["unmatched"],
+        "stages": stages,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Compara throughput por estágio com um resultado anterior; retorna regressões acima do limiar."""
+    regressions = []
+    for name, result in current["connectors"].items():
+        previous = baseline.get("connectors", {}).get(name)
+        if not previous or "stages" not in result or "stages" not in previous:
+            continue
+        for stage, metrics in result["stages"].items():
+            before = previous["stages"].get(stage, {}).get("rows_per_s")
+            after = metrics.get("rows_per_s")
+            if not before or not after:
+                continue
+            delta = (after - before) / before
+            marker = "REGRESSAO" if delta < -threshold else ""
+            print(f"  {name:<12} {stage:<8} {before:>12.1f} -> {after:>12.1f} rows/s ({delta:+.1%}) {marker}")
+            if delta < -threshold:
+                regressions.append({"connector": name, "stage": stage, "before": before, "after": after})
+        if previous.get("peak_rss_mb") and result.get("peak_rss_mb"):
+            print(f"  {name:<12} peak RSS {previous['peak_rss_mb']} MB -> {result['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta extract -> parquet -> ClickHouse com APIs em replay.")
+    parser.add_argument("connectors", nargs="*", help=f"Conectores (default: todos com fixture). Opções: {', '.join(CONNECTORS)}")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--pages", type=int, default=None, help="Sintetiza N páginas por rota paginada")
+    parser.add_argument("--rate-limit-every", type=int, default=None)
+    parser.add_argument("--no-throttle", action="store_true", help="Ignora os sleeps entre páginas dos conectores")
+    parser.add_argument("--days", type=int, default=30, help="Janela de datas passada ao conector")
+    parser.add_argument("--ingest", choices=["auto", "chdb", "clickhouse", "none"], default="auto",
+                        help="auto: chDB se instalado, senão pula a ingestão")
+    parser.add_argument("--output", default=None, help=f"Arquivo JSON de saída (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Queda de throughput considerada regressão")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    names = args.connectors or [n for n in CONNECTORS if os.path.exists(fixture_path(n, args.fixtures_dir))]
+    if not names:
+        print(f"Nenhum fixture encontrado em {args.fixtures_dir}/. Grave com scripts.http_fixtures.HttpRecorder.")
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    ingest = NullIngest()
+    if args.ingest in ("auto", "chdb"):
+        try:
+            ingest = ChdbIngest(os.path.join(workdir, "chdb"))
+        except ImportError:
+            if args.ingest == "chdb":
+                raise
+            print("chDB não instalado: estágio de ingestão ignorado (use --ingest clickhouse para um servidor local).")
+    elif args.ingest == "clickhouse":
+        ingest = ClickHouseIngest()
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "params": {k: v for k, v in vars(args).items() if k not in ("connectors", "output", "compare")},
+        "connectors": {},
+    }
+    try:
+        for name in names:
+            print(f"--> Benchmark {name}")
+            try:
+                result = run_connector(name, args, workdir, ingest)
+            except Exception as e:
+                logger.exception("Falha no benchmark de %s", name)
+                result = {"error": str(e)}
+            results["connectors"][name] = result
+            if "stages" in result:
+                for stage, m in result["stages"].items():
+                    print(f"    {stage:<8} {m['seconds']:>8.3f}s {m['rows_per_s'] or 0:>12.1f} rows/s {m['mb_per_s'] or 0:>8.3f} MB/s")
+                print(f"    requests={result['requests']} peak_rss={result['peak_rss_mb']}MB rows={result['rows']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados salvos em {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparação com {args.compare}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressão(ões) acima de {args.threshold:.0%}")
+            return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
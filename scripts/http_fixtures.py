@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qsl
+import requests
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = "fixtures"
+
+# Chaves (query, headers, body) cujo valor nunca deve ir para o fixture
+SECRET_KEY_PATTERN = re.compile(
+    r"(token|secret|password|passwd|senha|api[_-]?key|app[_-]?key|apikey|authorization|cookie)",
+    re.IGNORECASE,
+)
+# Chaves de paginação que contêm "token" mas não são credenciais (page_token, next_page_token,
+# x-moskit-listing-next-page-token, cursor...): precisam ir intactas para o replay paginar
+PAGINATION_KEY_PATTERN = re.compile(r"(page[_-]?token|cursor|continuation)", re.IGNORECASE)
+SCRUBBED = "***"
+
+# Headers de resposta relevantes para paginação/rate limit
+KEPT_RESPONSE_HEADERS = {"content-type", "link", "retry-after", "x-moskit-listing-next-page-token"}
+
+
+def _is_secret(key) -> bool:
+    key = str(key)
+    return bool(SECRET_KEY_PATTERN.search(key)) and not PAGINATION_KEY_PATTERN.search(key)
+
+
+def _scrub(value):
+    """Remove recursivamente valores de chaves sensíveis em dicts/listas."""
+    if isinstance(value, dict):
+        return {
+            k: (SCRUBBED if _is_secret(k) else _scrub(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub(v) for v in value]
+    return value
+
+
+def _scrub_pairs(pairs) -> dict:
+    return {k: (SCRUBBED if _is_secret(k) else v) for k, v in pairs}
+
+
+def fixture_path(provider: str, fixtures_dir: str = FIXTURES_DIR) -> str:
+    return os.path.join(fixtures_dir, f"{provider}.json")
+
+
+def load_fixtures(provider: str, fixtures_dir: str = FIXTURES_DIR) -> list:
+    """Carrega as interações gravadas de um provedor."""
+    with open(fixture_path(provider, fixtures_dir), encoding="utf-8") as f:
+        return json.load(f)["interactions"]
+
+
+class HttpRecorder:
+    """
+    Grava as respostas reais de um provedor em um arquivo de fixture, com segredos removidos.
+
+    Intercepta requests.Session.request (usado também por requests.get/post), então
+    funciona com qualquer conector sem alteração:
+
+        with HttpRecorder("cvcrm_cvdw"):
+            CvcrmCvdwConnector(...).extract(dt_start, dt_stop)
+
+    O arquivo resultante (fixtures/<provider>.json) é consumido pelo MockApiServer.
+    Atenção: segredos são removidos, mas dados de clientes (PII) permanecem no fixture.
+    """
+
+    def __init__(self, provider: str, fixtures_dir: str = FIXTURES_DIR, max_interactions: int = None):
+        self.provider = provider
+        self.fixtures_dir = fixtures_dir
+        self.max_interactions = max_interactions
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._original = None
+
+    def _record(self, method: str, url: str, kwargs: dict, resp: requests.Response, elapsed: float):
+        if self.max_interactions and len(self.interactions) >= self.max_interactions:
+            return
+
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        if isinstance(kwargs.get("params"), dict):
+            query.update({k: v for k, v in kwargs["params"].items() if v is not None})
+
+        body = kwargs.get("json")
+        if body is None and isinstance(kwargs.get("data"), dict):
+            body = kwargs["data"]
+
+        try:
+            resp_body = resp.json()
+            body_format = "json"
+        except ValueError:
+            resp_body = resp.text
+            body_format = "text"
+
+        interaction = {
+            "method": method.upper(),
+            "origin": f"{parts.scheme}://{parts.netloc}",
+            "path": parts.path,
+            "query": _scrub_pairs((str(k), str(v)) for k, v in query.items()),
+            "request_body": _scrub(body),
+            "status": resp.status_code,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() in KEPT_RESPONSE_HEADERS},
+            "body_format": body_format,
+            "body": _scrub(resp_body) if body_format == "json" else resp_body,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def __enter__(self):
+        recorder = self
+        original = requests.sessions.Session.request
+        self._original = original
+
+        def recording_request(session, method, url, **kwargs):
+            start = time.perf_counter()
+            resp = original(session, method, url, **kwargs)
+            try:
+                recorder._record(method, url, kwargs, resp, time.perf_counter() - start)
+            except Exception as e:
+                logger.warning("Falha ao gravar interação %s %s: %s", method, url, e)
+            return resp
+
+        requests.sessions.Session.request = recording_request
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        requests.sessions.Session.request = self._original
+        self.save()
+        return False
+
+    def save(self) -> str:
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        path = fixture_path(self.provider, self.fixtures_dir)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"provider": self.provider, "interactions": self.interactions}, f, ensure_ascii=False)
+        logger.info("Fixture gravado: %s (%d interações)", path, len(self.interactions))
+        return path
@@ -0,0 +1,247 @@
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import psutil
+import requests
+
+from connectors import instrumentation
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
+except ImportError:  # exportador é opcional: sem a lib os flows seguem sem métricas
+    CollectorRegistry = Counter = Gauge = Histogram = multiprocess = start_http_server = None
+
+# Buckets em segundos: de chamadas rápidas de API até cargas grandes no ClickHouse
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_started = False
+_metrics = {}
+_original_request = None
+
+# Intervalo de atualização dos gauges de processo no modo multiprocesso (segundos)
+GAUGE_INTERVAL = 5
+
+
+def _multiproc_dir() -> str:
+    """
+    Diretório compartilhado do modo multiprocesso do prometheus-client. Definido no worker
+    (docker-compose), faz cada execução de flow gravar suas métricas ali para o exportador
+    único do worker (`python -m scripts.metrics_exporter`) agregar.
+    """
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir") or ""
+
+
+def _build_metrics():
+    return {
+        "http_seconds": Histogram(
+            "pipeline_http_request_seconds", "Latência das requisições HTTP aos provedores",
+            ["host", "method", "status"], buckets=LATENCY_BUCKETS,
+        ),
+        "stage_seconds": Histogram(
+            "pipeline_stage_seconds", "Duração dos estágios instrumentados (spans)",
+            ["flow", "stage", "status"], buckets=LATENCY_BUCKETS,
+        ),
+        "page_seconds": Histogram(
+            "pipeline_extract_page_seconds", "Latência por página extraída (requisição + decode)",
+            ["provider"], buckets=LATENCY_BUCKETS,
+        ),
+        "rows_extracted": Counter(
+            "pipeline_rows_extracted", "Linhas extraídas dos provedores", ["flow", "provider"],
+        ),
+        "bytes_uploaded": Counter(
+            "pipeline_bytes_uploaded", "Bytes enviados ao MinIO (Parquet)", ["flow"],
+        ),
+        "clickhouse_seconds": Histogram(
+            "pipeline_clickhouse_insert_seconds", "Latência das cargas no ClickHouse",
+            ["flow", "method"], buckets=LATENCY_BUCKETS,
+        ),
+        "rate_limit_wait": Counter(
+            "pipeline_rate_limit_wait_seconds", "Tempo aguardando rate limit dos provedores", ["provider"],
+        ),
+        "http_cache": Counter(
+            "pipeline_http_cache_requests", "Consultas ao cache de endpoints de referência (LookupCache)",
+            ["provider", "result"],
+        ),
+        "fingerprint_rows": Counter(
+            "pipeline_fingerprint_rows", "Linhas comparadas com a carga anterior (RowFingerprints)",
+            ["flow", "result"],
+        ),
+        # livesum: soma dos processos de flow vivos (ignorado fora do modo multiprocesso)
+        "rss": Gauge("pipeline_process_rss_bytes", "Memória residente dos processos de flow",
+                     multiprocess_mode="livesum"),
+        "cpu": Gauge("pipeline_process_cpu_percent", "CPU dos processos de flow desde a última coleta",
+                     multiprocess_mode="livesum"),
+        "active_spans": Gauge("pipeline_active_spans", "Estágios em andamento", multiprocess_mode="livesum"),
+    }
+
+
+def _on_span(s: instrumentation.Span):
+    """Listener da instrumentação: converte cada span finalizado em métricas."""
+    attrs = s.attrs
+    flow = str(attrs.get("flow", ""))
+    seconds = s.duration_ms / 1000
+
+    _metrics["stage_seconds"].labels(flow, s.name, s.status).observe(seconds)
+
+    if s.name == "extract_page":
+        provider = str(attrs.get("provider", ""))
+        _metrics["page_seconds"].labels(provider).observe(seconds)
+        if attrs.get("rows"):
+            _metrics["rows_extracted"].labels(flow, provider).inc(attrs["rows"])
+    elif s.name == "s3_upload" and s.status == "ok":
+        _metrics["bytes_uploaded"].labels(flow).inc(attrs.get("bytes") or 0)
+    elif s.name in ("clickhouse_insert", "clickhouse_insert_arrow", "clickhouse_ingest"):
+        _metrics["clickhouse_seconds"].labels(flow, s.name).observe(seconds)
+    elif s.name == "rate_limit_wait":
+        _metrics["rate_limit_wait"].labels(str(attrs.get("provider", ""))).inc(seconds)
+    elif s.name == "fingerprint":
+        skipped = attrs.get("skipped") or 0
+        _metrics["fingerprint_rows"].labels(flow, "skipped").inc(skipped)
+        _metrics["fingerprint_rows"].labels(flow, "loaded").inc((attrs.get("rows") or 0) - skipped)
+    elif s.name == "http_cache":
+        _metrics["http_cache"].labels(str(attrs.get("provider", "")), str(attrs.get("result", ""))).inc()
+
+
+def _instrument_requests():
+    """
+    Mede todas as requisições feitas via requests (requests.get/post usam Session.request),
+    cobrindo os conectores sem alterá-los. Rótulo por host do provedor.
+    """
+    global _original_request
+    if _original_request is not None:
+        return
+    original = requests.sessions.Session.request
+    _original_request = original
+    histogram = _metrics["http_seconds"]
+
+    def timed_request(session, method, url, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            resp = original(session, method, url, **kwargs)
+            status = f"{resp.status_code // 100}xx"
+            return resp
+        finally:
+            histogram.labels(urlsplit(url).hostname or "", method.upper(), status).observe(
+                time.perf_counter() - start
+            )
+
+    requests.sessions.Session.request = timed_request
+
+
+def _update_process_gauges(process: psutil.Process):
+    """set_function não existe no modo multiprocesso: os gauges são atualizados por esta thread."""
+    while True:
+        try:
+            _metrics["rss"].set(process.memory_info().rss)
+            _metrics["cpu"].set(process.cpu_percent(interval=None))
+            _metrics["active_spans"].set(len(instrumentation.active_spans()))
+        except psutil.Error:
+            pass
+        time.sleep(GAUGE_INTERVAL)
+
+
+def enable_metrics() -> bool:
+    """
+    Registra as métricas e o listener dos spans neste processo (idempotente), sem abrir porta.
+    Retorna False se prometheus-client não estiver instalado.
+    """
+    if Counter is None:
+        logger.warning("[Metrics] prometheus-client não instalado; métricas desativadas")
+        return False
+
+    with _lock:
+        if _metrics:
+            return True
+        multiproc = _multiproc_dir()
+        if multiproc:
+            os.makedirs(multiproc, exist_ok=True)
+        _metrics.update(_build_metrics())
+        process = psutil.Process()
+        process.cpu_percent(interval=None)  # primeira leitura só inicializa o contador
+        if multiproc:
+            threading.Thread(target=_update_process_gauges, args=(process,), name="metrics-gauges",
+                             daemon=True).start()
+        else:
+            _metrics["rss"].set_function(lambda: process.memory_info().rss)
+            # interval=None não bloqueia: mede desde a coleta anterior do Prometheus
+            _metrics["cpu"].set_function(lambda: process.cpu_percent(interval=None))
+            _metrics["active_spans"].set_function(lambda: len(instrumentation.active_spans()))
+        instrumentation.add_listener(_on_span)
+        _instrument_requests()
+    return True
+
+
+def start_metrics_server(port: int = None) -> bool:
+    """
+    Ativa as métricas neste processo. No worker (PROMETHEUS_MULTIPROC_DIR definido) só grava
+    no diretório compartilhado: quem serve /metrics é o exportador do worker, que continua no
+    ar entre execuções e agrega execuções concorrentes. Sem o diretório (execução local),
+    sobe o endpoint neste processo. Idempotente; retorna False se prometheus-client não
+    estiver instalado ou a porta estiver ocupada — o flow segue normalmente.
+    """
+    global _started
+    port = settings.metrics_port if port is None else port
+    if not port or not enable_metrics():
+        return False
+    if _multiproc_dir():
+        return True
+
+    with _lock:
+        if _started:
+            return True
+        try:
+            start_http_server(port)
+        except OSError as e:
+            logger.warning(f"[Metrics] Porta {port} indisponível: {e}")
+            return False
+        _started = True
+
+    logger.info(f"[Metrics] Exportador Prometheus em :{port}/metrics")
+    return True
+
+
+def _mark_dead_processes(path: str):
+    """Descarta os gauges `livesum` de processos de flow que já terminaram."""
+    for name in os.listdir(path):
+        if not (name.startswith("gauge_live") and name.endswith(".db")):
+            continue
+        pid = name[:-3].rsplit("_", 1)[-1]
+        if pid.isdigit() and not psutil.pid_exists(int(pid)):
+            multiprocess.mark_process_dead(int(pid), path)
+
+
+def serve_worker(port: int = None):
+    """
+    Exportador do worker: um único /metrics para todas as execuções de flow do container,
+    agregando os arquivos do modo multiprocesso. Iniciado junto com o worker (docker-compose).
+    """
+    path = _multiproc_dir()
+    if not path or start_http_server is None:
+        raise SystemExit("[Metrics] Defina PROMETHEUS_MULTIPROC_DIR e instale prometheus-client")
+    port = settings.metrics_port if port is None else port
+
+    # Arquivos de uma vida anterior do container não valem mais
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    start_http_server(port, registry=registry)
+    logger.info(f"[Metrics] Exportador do worker em :{port}/metrics (dir {path})")
+    while True:
+        time.sleep(30)
+        _mark_dead_processes(path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve_worker()
@@ -0,0 +1,61 @@
+import os
+import sys
+import inspect
+import logging
+import argparse
+import importlib
+import pkgutil
+
+sys.path.append(os.getcwd())
+
+import connectors
+from connectors.base import BaseConnector
+from connectors.clickhouse_client import ClickHouseClient
+
+
+def connector_classes(names: list = None) -> dict:
+    """Conectores do pacote `connectors` (nome do módulo -> classes BaseConnector definidas nele)."""
+    found = {}
+    for module_info in pkgutil.iter_modules(connectors.__path__):
+        if names and module_info.name not in names:
+            continue
+        try:
+            module = importlib.import_module(f"connectors.{module_info.name}")
+        except ImportError as e:
+            logging.warning(f"[LowCardinality] {module_info.name} ignorado: {e}")
+            continue
+        classes = [
+            cls for _, cls in inspect.getmembers(module, inspect.isclass)
+            if issubclass(cls, BaseConnector) and cls is not BaseConnector and cls.__module__ == module.__name__
+        ]
+        if classes:
+            found[module_info.name] = classes
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migração única das colunas declaradas LowCardinality nos DDLs (ALTER TABLE ... MODIFY COLUMN)."
+    )
+    parser.add_argument("connectors", nargs="*", help="Módulos de conectores (default: todos)")
+    parser.add_argument("--dry-run", action="store_true", help="Só lista os ALTERs, sem executar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ch = ClickHouseClient()
+    total = 0
+    for name, classes in connector_classes(args.connectors).items():
+        for cls in classes:
+            try:
+                ddl_list = cls().get_tables_ddl()
+            except Exception as e:
+                logging.warning(f"[LowCardinality] {cls.__name__} sem DDL: {e}")
+                continue
+            statements = ch.migrate_low_cardinality(ddl_list, dry_run=args.dry_run)
+            total += len(statements)
+            logging.info(f"[LowCardinality] {name}: {len(statements)} ALTERs")
+    logging.info(f"[LowCardinality] {total} ALTERs {'planejados' if args.dry_run else 'executados'}")
+
+
+if __name__ == "__main__":
+    main()
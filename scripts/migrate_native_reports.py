@@ -0,0 +1,51 @@
+import os
+import sys
+import logging
+import argparse
+
+sys.path.append(os.getcwd())
+
+from config.settings import settings
+from connectors.clickhouse_client import ClickHouseClient
+
+TABLE = "native_reports"
+
+# Layout antigo: (report_id, data) ORDER BY report_id, uma linha por report. O atual guarda
+# um registro por linha; `id` entra como primeira coluna e no fim da chave de ordenação
+# (o ClickHouse só aceita estender o ORDER BY com coluna criada no mesmo ALTER).
+MIGRATION = f"ALTER TABLE {TABLE} ADD COLUMN id String FIRST, MODIFY ORDER BY (report_id, id)"
+
+
+def pending_statements(ch: ClickHouseClient) -> list:
+    """ALTERs que faltam para `native_reports` chegar ao layout (id, report_id, data)."""
+    columns = {row[0] for row in ch.client.query(
+        "SELECT name FROM system.columns WHERE database = {db:String} AND table = {table:String}",
+        parameters={"db": settings.clickhouse_database, "table": TABLE},
+    ).result_rows}
+    if not columns or "id" in columns:
+        return []
+    return [MIGRATION]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migração única de native_reports para um registro por linha (id, report_id, data)."
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Só lista os ALTERs, sem executar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ch = ClickHouseClient()
+    statements = pending_statements(ch)
+    for statement in statements:
+        if args.dry_run:
+            logging.info(f"[dry-run] {statement}")
+            continue
+        ch.client.command(statement)
+        logging.info(f"[Native] {statement}")
+    if not statements:
+        logging.info(f"[Native] {TABLE} já está no layout atual (ou ainda não existe)")
+
+
+if __name__ == "__main__":
+    main()
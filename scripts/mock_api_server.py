@@ -0,0 +1,265 @@
+import re
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+sys.path.append(os.getcwd())
+
+from scripts.http_fixtures import load_fixtures, FIXTURES_DIR, SCRUBBED, PAGINATION_KEY_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros de página (query ou body) usados pelos paginadores dos conectores
+PAGE_PARAMS = ("page", "pagina", "pageNumber", "currentPage")
+# Campos de "total de páginas" devolvidos pelos provedores
+TOTAL_PAGE_FIELDS = ("total_de_paginas", "total_paginas", "lastPage", "PaginaTotal", "totalPages", "NumerodePaginas")
+# Parâmetros de cursor/offset (além de page_token, cursor...): o replay exige o valor gravado
+CURSOR_PARAMS = ("$skip", "skip", "offset", "start", "after", "starting_after")
+# URL absoluta em corpo/headers de resposta (ex: @odata.nextLink, header Link)
+ABSOLUTE_URL = re.compile(r"(https?://[^/\s\"'<>]+)(/[^\s\"'<>?#]*)?")
+
+
+def _is_cursor(key: str) -> bool:
+    return key in CURSOR_PARAMS or bool(PAGINATION_KEY_PATTERN.search(key))
+
+
+class MockApiServer:
+    """
+    Servidor HTTP local que reproduz fixtures gravados pelo HttpRecorder.
+
+    - latency_ms: atraso artificial por resposta (simula a rede do provedor)
+    - pages: sintetiza N páginas a partir da primeira página gravada de cada rota,
+      reescrevendo os campos de total de páginas (paginadores page-based)
+    - rate_limit_every: devolve 429 a cada N requisições (testa o backoff)
+
+    Paginação por cursor/token/offset é reproduzida como gravada: a requisição precisa trazer
+    o cursor de uma interação gravada (cursor desconhecido responde 404 e conta em `unmatched`;
+    `pages` não sintetiza páginas de cursor). URLs absolutas do provedor nas respostas (links
+    de próxima página) são reescritas para o servidor local.
+
+    Uso:
+        with MockApiServer(load_fixtures("cvcrm_cvdw"), latency_ms=200, pages=20) as server:
+            connector.base_url = f"{server.url}/api/v1"
+            connector.extract(dt_start, dt_stop)
+            print(server.stats)
+    """
+
+    def __init__(self, interactions: list, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0,
+                 pages: int = None, rate_limit_every: int = None, rate_limit_retry_after: int = 0):
+        self.interactions = interactions
+        self.latency_ms = latency_ms
+        self.pages = pages
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_retry_after = rate_limit_retry_after
+        self.stats = {"requests": 0, "rate_limited": 0, "unmatched": 0, "bytes_sent": 0}
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._origins = {i["origin"] for i in interactions if i.get("origin")}
+        for interaction in interactions:
+            if interaction.get("status", 200) >= 400:
+                continue
+            key = (interaction["method"], interaction["path"])
+            self._routes.setdefault(key, []).append(interaction)
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _page_number(params: dict):
+        for name in PAGE_PARAMS:
+            if name in params:
+                try:
+                    return int(params[name])
+                except (TypeError, ValueError):
+                    return None
+        return None
+
+    @staticmethod
+    def _cursor(params: dict) -> dict:
+        return {k: str(v) for k, v in params.items() if _is_cursor(k)}
+
+    def _match(self, method: str, path: str, params: dict) -> dict:
+        candidates = self._routes.get((method, path))
+        if not candidates:
+            return None
+
+        # Cursor/offset precisa bater com o gravado; sem cursor vale só a primeira página
+        cursor = self._cursor(params)
+        candidates = [c for c in candidates if self._cursor({**c["query"], **(c.get("request_body") or {})}) == cursor]
+        if not candidates:
+            return None
+
+        page = self._page_number(params)
+        if page is not None:
+            recorded = [(self._page_number({**c["query"], **(c.get("request_body") or {})}), c) for c in candidates]
+            exact = [c for p, c in recorded if p == page]
+            if exact:
+                return exact[0]
+            if self.pages:
+                # Página não gravada: reaproveita a primeira página gravada (sempre cheia)
+                return min(((p or 0, c) for p, c in recorded), key=lambda pc: pc[0])[1]
+
+        def score(c):
+            return sum(1 for k, v in c["query"].items() if v != SCRUBBED and params.get(k) == v)
+
+        return max(candidates, key=score)
+
+    def _rewrite_pages(self, body, page: int):
+        """Ajusta os campos de paginação para que o cliente percorra `self.pages` páginas."""
+        if not isinstance(body, dict):
+            return body
+        body = dict(body)
+        for key, value in body.items():
+            if key in TOTAL_PAGE_FIELDS:
+                body[key] = self.pages
+            elif key == "hasNextPage":
+                body[key] = page < self.pages
+            elif isinstance(value, dict):
+                body[key] = self._rewrite_pages(value, page)
+        return body
+
+    def _local_urls(self, text: str) -> str:
+        """Reescreve URLs do provedor (origem gravada ou caminho de uma rota) para o servidor local."""
+        paths = {path for _, path in self._routes}
+
+        def replace(match):
+            origin, path = match.group(1), match.group(2) or ""
+            if origin in self._origins or path in paths:
+                return self.url + path
+            return match.group(0)
+
+        return ABSOLUTE_URL.sub(replace, text)
+
+    def _respond(self, handler: BaseHTTPRequestHandler):
+        parts = urlsplit(handler.path)
+        params = dict(parse_qsl(parts.query))
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length:
+            raw = handler.rfile.read(length)
+            try:
+                body = json.loads(raw)
+                if isinstance(body, dict):
+                    params.update({k: v for k, v in body.items() if not isinstance(v, (dict, list))})
+            except ValueError:
+                pass
+
+        with self._lock:
+            self.stats["requests"] += 1
+            count = self.stats["requests"]
+
+        if self.latency_ms:
+            # Event.wait em vez de time.sleep: o benchmark pode desligar os sleeps dos conectores
+            threading.Event().wait(self.latency_ms / 1000)
+
+        if self.rate_limit_every and count % self.rate_limit_every == 0:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            handler.send_response(429)
+            handler.send_header("Retry-After", str(self.rate_limit_retry_after))
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        interaction = self._match(handler.command, parts.path, params)
+        if interaction is None:
+            with self._lock:
+                self.stats["unmatched"] += 1
+            logger.warning("Sem fixture para %s %s", handler.command, parts.path)
+            payload = b'{"error": "no fixture"}'
+            handler.send_response(404)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            return
+
+        body = interaction["body"]
+        page = self._page_number(params)
+        if interaction.get("body_format") == "json":
+            if self.pages and page is not None:
+                body = self._rewrite_pages(body, page)
+            payload = self._local_urls(json.dumps(body, ensure_ascii=False)).encode("utf-8")
+        else:
+            payload = self._local_urls(str(body)).encode("utf-8")
+
+        handler.send_response(interaction.get("status", 200))
+        for name, value in interaction.get("headers", {}).items():
+            if name.lower() != "content-length":
+                handler.send_header(name, self._local_urls(value))
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+        with self._lock:
+            self.stats["bytes_sent"] += len(payload)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._respond(self)
+
+            def do_POST(self):
+                server._respond(self)
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt, *args)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-api", daemon=True)
+        self._thread.start()
+        logger.info("Mock API em %s (%d rotas)", self.url, len(self._routes))
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que reproduz fixtures de APIs gravados.")
+    parser.add_argument("provider", help="Nome do fixture (fixtures/<provider>.json)")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--pages", type=int, default=None)
+    parser.add_argument("--rate-limit-every", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockApiServer(
+        load_fixtures(args.provider, args.fixtures_dir), port=args.port, latency_ms=args.latency_ms,
+        pages=args.pages, rate_limit_every=args.rate_limit_every,
+    )
+    server.start()
+    print(f"Mock API de {args.provider} em {server.url} (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"Estatísticas: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
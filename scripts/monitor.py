@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 import psutil
 from datetime import datetime
 
@@ -17,11 +18,14 @@ class ResourceMonitor:
     DISK_THRESHOLD_PERCENT = 90
 
     @staticmethod
-    def get_metrics() -> dict:
-        """Coleta métricas atuais do sistema."""
+    def get_metrics(cpu_interval: float = 1) -> dict:
+        """
+        Coleta métricas atuais do sistema.
+        cpu_interval=None não bloqueia (CPU desde a chamada anterior), útil em coletas frequentes.
+        """
         mem = psutil.virtual_memory()
         disk = psutil.disk_usage("/")
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = psutil.cpu_percent(interval=cpu_interval)
 
         return {
             "timestamp": datetime.now().isoformat(),
@@ -91,3 +95,144 @@ class ResourceMonitor:
                 alert["resource"], alert["value"], alert["threshold"], alert["detail"],
             )
         return metrics, alerts
+
+
+class ResourceSampler:
+    """
+    Amostra memória (RSS) e CPU do processo em background durante uma execução,
+    atribuindo o consumo ao estágio ativo (cliente / tabela / estágio) segundo os
+    spans de connectors.instrumentation.
+
+    - CPU: medida por thread e atribuída ao span mais interno aberto naquela thread
+    - RSS: é do processo; o pico é registrado em todos os estágios ativos no momento
+
+        sampler = ResourceSampler()
+        with instrumentation.bind(flow="x", client="y"), sampler:
+            pipeline.run(...)
+        sampler.store(lake, "raw-data", "x/y/_profiles")
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.started_at = None
+        self.finished_at = None
+        self.peak_rss = 0
+        self.peak_system_memory_percent = 0.0
+        self.samples = 0
+        self.stages = {}
+        self._thread_cpu = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _stage_key(s) -> tuple:
+        attrs = s.attrs
+        table = attrs.get("table_name") or attrs.get("endpoint") or ""
+        return str(attrs.get("client", "")), str(table), s.name
+
+    def _stage(self, key: tuple) -> dict:
+        stage = self.stages.get(key)
+        if stage is None:
+            stage = self.stages[key] = {"peak_rss": 0, "cpu_seconds": 0.0, "samples": 0}
+        return stage
+
+    def sample(self):
+        from connectors.instrumentation import active_spans
+
+        try:
+            rss = self.process.memory_info().rss
+            threads = {t.id: t.user_time + t.system_time for t in self.process.threads()}
+        except psutil.Error:
+            return
+        self.samples += 1
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_system_memory_percent = max(self.peak_system_memory_percent, psutil.virtual_memory().percent)
+
+        # Span mais interno por thread (active_spans vem ordenado do mais antigo ao mais novo)
+        innermost = {}
+        for s in active_spans():
+            innermost[s.thread_id] = s
+            stage = self._stage(self._stage_key(s))
+            stage["peak_rss"] = max(stage["peak_rss"], rss)
+            stage["samples"] += 1
+
+        for tid, cpu in threads.items():
+            delta = cpu - self._thread_cpu.get(tid, cpu)
+            self._thread_cpu[tid] = cpu
+            if delta <= 0:
+                continue
+            s = innermost.get(tid)
+            key = self._stage_key(s) if s else ("", "", "untracked")
+            self._stage(key)["cpu_seconds"] += delta
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.started_at = datetime.now()
+        self._thread_cpu = {t.id: t.user_time + t.system_time for t in self.process.threads()}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+        self.finished_at = datetime.now()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def profile(self) -> dict:
+        """Perfil da execução: picos e CPU por cliente/tabela/estágio (maior pico primeiro)."""
+        mb = 1024 ** 2
+        stages = [
+            {
+                "client": client, "table": table, "stage": stage,
+                "peak_rss_mb": round(v["peak_rss"] / mb, 1),
+                "cpu_seconds": round(v["cpu_seconds"], 3),
+                "samples": v["samples"],
+            }
+            for (client, table, stage), v in self.stages.items()
+        ]
+        stages.sort(key=lambda st: (st["peak_rss_mb"], st["cpu_seconds"]), reverse=True)
+        return {
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "interval_s": self.interval,
+            "samples": self.samples,
+            "peak_rss_mb": round(self.peak_rss / mb, 1),
+            "peak_system_memory_percent": self.peak_system_memory_percent,
+            "memory_total_gb": round(psutil.virtual_memory().total / (1024 ** 3), 2),
+            "cpu_seconds": round(sum(st["cpu_seconds"] for st in stages), 3),
+            "stages": stages,
+        }
+
+    def store(self, lake, bucket: str, prefix: str) -> str:
+        """Loga o resumo e grava o perfil no MinIO ao lado dos arquivos da execução."""
+        profile = self.profile()
+        top = profile["stages"][0] if profile["stages"] else None
+        logger.info(
+            "Resources %s: pico RSS=%sMB CPU=%ss%s", prefix, profile["peak_rss_mb"], profile["cpu_seconds"],
+            f' (maior: {top["table"]}/{top["stage"]} {top["peak_rss_mb"]}MB)' if top else "",
+        )
+        if profile["peak_system_memory_percent"] > ResourceMonitor.MEMORY_THRESHOLD_PERCENT:
+            logger.warning(
+                "RESOURCE ALERT: memória do worker chegou a %s%% durante %s",
+                profile["peak_system_memory_percent"], prefix,
+            )
+        key = f"{prefix}/resources_{self.started_at:%Y%m%d_%H%M%S}.json"
+        try:
+            return lake.push_json(profile, bucket, key)
+        except Exception as e:
+            logger.warning("Falha ao gravar perfil de recursos %s: %s", key, e)
+            return ""
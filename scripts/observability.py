@@ -0,0 +1,59 @@
+import inspect
+import functools
+from contextlib import contextmanager
+
+from connectors import instrumentation
+from config.settings import settings
+from connectors.datalake import DatalakeConnector
+from scripts.metrics_exporter import start_metrics_server
+from scripts.monitor import ResourceSampler
+from scripts.profiler import profile_run
+
+PROFILES_BUCKET = "raw-data"
+
+
+@contextmanager
+def observe_task(source: str, company_name: str, profile: bool = False):
+    """
+    Instrumentação padrão de uma task de extração/carga: ativa as métricas do processo
+    (exportadas pelo worker), vincula flow/client aos spans do bloco, amostra CPU/memória
+    por estágio e, com `profile` ou PROFILE_RUNS=true, perfila as pilhas. No fim persiste
+    os spans e grava os perfis em `{source}/{cliente}/_profiles/`.
+    """
+    start_metrics_server()
+    lake = DatalakeConnector()
+    prefix = f"{source}/{company_name}/_profiles"
+    sampler = ResourceSampler()
+    try:
+        with instrumentation.bind(flow=source, client=company_name), sampler, \
+                profile_run(profile or settings.profile_runs, lake, PROFILES_BUCKET, prefix):
+            yield
+    finally:
+        instrumentation.flush()
+        sampler.store(lake, PROFILES_BUCKET, prefix)
+
+
+def observed(source: str):
+    """
+    Decorator das tasks dos flows (abaixo do @task), para que toda task tenha a mesma
+    instrumentação sem copiar o bloco em cada flow. O cliente vem de `credentials["project_id"]`
+    e o profiling do argumento `profile` da task, quando existir.
+
+        @task(retries=3, retry_delay_seconds=60)
+        @observed("hotmart")
+        def extract_hotmart_data(date_start, date_stop, credentials): ...
+    """
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            credentials = arguments.get("credentials")
+            company_name = credentials.get("project_id", "unknown") if isinstance(credentials, dict) else "default"
+            with observe_task(source, company_name, profile=bool(arguments.get("profile"))):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
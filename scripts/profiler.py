@@ -0,0 +1,181 @@
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Categorias por trecho de caminho do módulo, avaliadas da folha para a raiz da pilha
+CATEGORIES = (
+    ("json", ("/json/", "orjson", "msgspec", "ijson")),
+    ("http", ("/requests/", "/urllib3/", "/http/client", "/ssl.py", "/socket.py")),
+    ("pandas", ("/pandas/",)),
+    ("pyarrow", ("/pyarrow/",)),
+    ("clickhouse", ("/clickhouse_connect/",)),
+    ("s3", ("/boto3/", "/botocore/", "/s3transfer/")),
+)
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem de todas as threads da execução (wall clock), sem dependências:
+    a cada `interval` captura as pilhas via sys._current_frames. Como mede tempo de parede,
+    esperas de rede aparecem (categoria "http"), não só CPU.
+
+    Considera a thread que iniciou o profiler e as threads criadas durante a execução
+    (ex: produtor do StagePipeline), ignorando threads de fundo já existentes.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()  # (thread, pilha) -> segundos
+        self.samples = 0
+        self.started_at = None
+        self.duration_s = 0.0
+        self._t0 = self._last = 0.0
+        self._ignored = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _frame_key(frame) -> tuple:
+        code = frame.f_code
+        return code.co_name, code.co_filename, code.co_firstlineno
+
+    def _sample(self):
+        # Peso = tempo real desde a amostra anterior (com o GIL ocupado o intervalo estica)
+        now = time.perf_counter()
+        weight, self._last = now - self._last, now
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in self._ignored:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_key(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[(names.get(ident, str(ident)), tuple(stack))] += weight
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started_at = datetime.now()
+        self._t0 = self._last = time.perf_counter()
+        current = threading.get_ident()
+        self._ignored = {t.ident for t in threading.enumerate() if t.ident != current}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        self._ignored.add(self._thread.ident)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self._t0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    @staticmethod
+    def _category(stack: tuple) -> str:
+        for name, filename, _ in reversed(stack):
+            if "flatten" in name:
+                return "flatten"
+            path = filename.replace("\\", "/")
+            for category, markers in CATEGORIES:
+                if any(m in path for m in markers):
+                    return category
+        return "other"
+
+    def summary(self, top: int = 15) -> dict:
+        """Tempo estimado (s) por categoria e por função (self = na folha, total = na pilha)."""
+        self_time, total_time, categories = Counter(), Counter(), Counter()
+        for (_, stack), seconds in self.stacks.items():
+            if not stack:
+                continue
+            name, filename, line = stack[-1]
+            self_time[f"{name} ({filename}:{line})"] += seconds
+            for name, filename, line in set(stack):
+                total_time[f"{name} ({filename}:{line})"] += seconds
+            categories[self._category(stack)] += seconds
+        return {
+            "categories": {k: round(v, 3) for k, v in categories.most_common()},
+            "self": [(k, round(v, 3)) for k, v in self_time.most_common(top)],
+            "total": [(k, round(v, 3)) for k, v in total_time.most_common(top)],
+        }
+
+    def to_speedscope(self, name: str) -> dict:
+        """Exporta no formato 'sampled' do speedscope (https://www.speedscope.app), um perfil por thread."""
+        frames, index = [], {}
+        by_thread = {}
+        for (thread, stack), seconds in self.stacks.items():
+            ids = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                ids.append(index[key])
+            samples, weights = by_thread.setdefault(thread, ([], []))
+            samples.append(ids)
+            weights.append(seconds)
+
+        profiles = [
+            {
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": round(sum(weights), 6),
+                "samples": samples, "weights": weights,
+            }
+            for thread, (samples, weights) in by_thread.items()
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "teste-pipeline sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+@contextmanager
+def profile_run(enabled: bool, lake, bucket: str, prefix: str, interval: float = 0.005):
+    """
+    Perfila o bloco quando `enabled` (parâmetro `profile` dos flows ou PROFILE_RUNS=true),
+    loga o resumo por categoria/função e grava `{prefix}/profile_{ts}.speedscope.json` no MinIO.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        summary = profiler.summary()
+        logger.info(
+            "Profile %s (%.1fs, %d amostras) por categoria: %s",
+            prefix, profiler.duration_s, profiler.samples, summary["categories"],
+        )
+        for func, seconds in summary["self"]:
+            logger.info("  self %8.3fs  %s", seconds, func)
+
+        key = f"{prefix}/profile_{profiler.started_at:%Y%m%d_%H%M%S}.speedscope.json"
+        try:
+            url = lake.push_json(profiler.to_speedscope(prefix), bucket, key)
+            logger.info("Profile gravado em %s (abrir em https://www.speedscope.app)", url)
+        except Exception as e:
+            logger.warning("Falha ao gravar profile %s: %s", key, e)